@@ -0,0 +1,365 @@
+"""
+💬 AFI v4.0 - Cache de Respostas do RAG
+Respostas persistentes para perguntas repetidas no chat e no query engine
+
+A chave combina a pergunta normalizada, os ids dos chunks recuperados e a
+versão do índice. Assim uma pergunta repetida só pula a geração do Ollama se
+o contexto recuperado for o mesmo, e qualquer reconstrução do índice (que
+gera novos ids de nós) invalida as respostas antigas automaticamente. As
+entradas expiram por TTL e o cache é podado por quantidade e tamanho (LRU).
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from config import ANSWER_CACHE_CONFIG
+from bm25_index import normalizar
+
+try:
+    from llama_index.core.retrievers import BaseRetriever
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+
+def normalizar_pergunta(prompt: str) -> str:
+    """Minúsculas, sem acentos, espaços colapsados e sem pontuação final"""
+    texto = re.sub(r"\s+", " ", normalizar(prompt)).strip()
+    return texto.rstrip("?!.… ")
+
+
+def versao_indice(index) -> str:
+    """Versão do índice: hash dos ids de nós (muda a cada reconstrução/atualização)"""
+    h = hashlib.sha1()
+    for node_id in sorted(index.index_struct.nodes_dict.values()):
+        h.update(node_id.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def versao_indices(indices) -> str:
+    """Versão de um índice ou de uma lista deles (um por shard)"""
+    if not isinstance(indices, (list, tuple)):
+        return versao_indice(indices)
+    versoes = [versao_indice(index) for index in indices]
+    if len(versoes) == 1:
+        return versoes[0]
+    return hashlib.sha1(",".join(versoes).encode("utf-8")).hexdigest()[:16]
+
+
+class CacheRespostas:
+    """
+    🗄️ Cache de respostas em SQLite com TTL e poda LRU
+    """
+
+    def __init__(self, caminho: Optional[str] = None, ttl_segundos: Optional[float] = None,
+                 max_entradas: Optional[int] = None, tamanho_maximo_mb: Optional[float] = None):
+        self.caminho = caminho or ANSWER_CACHE_CONFIG["arquivo"]
+        self.ttl_segundos = ttl_segundos or ANSWER_CACHE_CONFIG["ttl_horas"] * 3600
+        self.max_entradas = max_entradas or ANSWER_CACHE_CONFIG["max_entradas"]
+        self.tamanho_maximo_bytes = int(
+            (tamanho_maximo_mb or ANSWER_CACHE_CONFIG["tamanho_maximo_mb"]) * 1024 * 1024
+        )
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " chave TEXT PRIMARY KEY, versao_indice TEXT NOT NULL, pergunta TEXT NOT NULL,"
+            " resposta TEXT NOT NULL, tamanho INTEGER NOT NULL,"
+            " criado_em REAL NOT NULL, ultimo_uso REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_respostas_uso ON respostas(ultimo_uso)")
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def montar_chave(prompt: str, chunk_ids: Iterable[str], versao: str, contexto: str = "") -> str:
+        partes = [versao, normalizar_pergunta(prompt), ",".join(sorted(chunk_ids)), contexto]
+        return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+    def get(self, chave: str) -> Optional[str]:
+        """Retorna a resposta em cache (ou None se ausente/expirada)"""
+        agora = time.time()
+        with self._lock:
+            linha = self._db.execute(
+                "SELECT resposta, criado_em FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha and agora - linha[1] <= self.ttl_segundos:
+                self._db.execute("UPDATE respostas SET ultimo_uso = ? WHERE chave = ?", (agora, chave))
+                self._db.commit()
+                self.hits += 1
+                return linha[0]
+            if linha:
+                self._db.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, chave: str, pergunta: str, resposta: str, versao: str):
+        """Guarda uma resposta e poda o cache se passar dos limites"""
+        agora = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chave, versao, pergunta, resposta, len(resposta.encode("utf-8")), agora, agora),
+            )
+            self._podar(agora)
+            self._db.commit()
+
+    def _podar(self, agora: float):
+        self._db.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl_segundos,))
+        total, tamanho = self._db.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()
+        while total > self.max_entradas or tamanho > self.tamanho_maximo_bytes:
+            # Remover as menos usadas em blocos de 10% para não podar a cada put
+            excesso = max(total - self.max_entradas, 1, total // 10)
+            self._db.execute(
+                "DELETE FROM respostas WHERE chave IN "
+                "(SELECT chave FROM respostas ORDER BY ultimo_uso ASC LIMIT ?)", (excesso,)
+            )
+            total, tamanho = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+
+    def limpar(self):
+        with self._lock:
+            self._db.execute("DELETE FROM respostas")
+            self._db.commit()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            total, tamanho = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+        consultas = self.hits + self.misses
+        return {
+            'entradas': total,
+            'tamanho_bytes': tamanho,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / consultas, 3) if consultas else 0.0,
+        }
+
+
+_cache_global = None
+_cache_global_lock = threading.Lock()
+
+
+def obter_cache_respostas() -> CacheRespostas:
+    """Cache de respostas compartilhado pelo processo (criado sob demanda)"""
+    global _cache_global
+    with _cache_global_lock:
+        if _cache_global is None:
+            _cache_global = CacheRespostas()
+        return _cache_global
+
+
+class RespostaCacheada:
+    """Resposta vinda do cache, com a mesma interface textual das respostas do LlamaIndex"""
+
+    def __init__(self, texto: str, source_nodes: Optional[List] = None):
+        self.response = texto
+        self.source_nodes = source_nodes or []
+        self.from_cache = True
+
+    @property
+    def response_gen(self) -> Iterator[str]:
+        """Mesma interface das respostas em streaming: o texto inteiro em um trecho"""
+        yield self.response
+
+    def __str__(self) -> str:
+        return self.response
+
+
+class RespostaEmStreaming:
+    """Repassa os trechos de um stream e guarda a resposta completa no cache ao final"""
+
+    def __init__(self, resposta, ao_terminar: Callable[[str], None]):
+        self._resposta = resposta
+        self._ao_terminar = ao_terminar
+        self.source_nodes = getattr(resposta, "source_nodes", [])
+
+    @property
+    def response_gen(self) -> Iterator[str]:
+        trechos = []
+        for trecho in self._resposta.response_gen:
+            trechos.append(trecho)
+            yield trecho
+        if trechos:
+            self._ao_terminar("".join(trechos))
+
+
+class QueryEngineComCache:
+    """
+    ⚡ Query engine que só chama o LLM quando a resposta não está em cache
+
+    A recuperação roda sempre (é barata e define a chave); a síntese com o
+    Ollama só acontece em caso de miss.
+    """
+
+    def __init__(self, query_engine, versao: str, cache: Optional[CacheRespostas] = None):
+        self._query_engine = query_engine
+        self.versao = versao
+        self.cache = cache or obter_cache_respostas()
+
+    def query(self, prompt: str):
+        from llama_index.core.schema import QueryBundle
+
+        bundle = QueryBundle(prompt)
+        nodes = self._query_engine.retrieve(bundle)
+        chave = self.cache.montar_chave(prompt, [n.node.node_id for n in nodes], self.versao)
+
+        texto = self.cache.get(chave)
+        if texto is not None:
+            return RespostaCacheada(texto, nodes)
+
+        resposta = self._query_engine.synthesize(bundle, nodes)
+        self.cache.put(chave, prompt, str(resposta), self.versao)
+        return resposta
+
+    def stream_query(self, prompt: str):
+        """Como ``query``, mas com ``response_gen``: o miss sai token a token e vai para o cache ao final"""
+        from llama_index.core.schema import QueryBundle
+
+        bundle = QueryBundle(prompt)
+        nodes = self._query_engine.retrieve(bundle)
+        chave = self.cache.montar_chave(prompt, [n.node.node_id for n in nodes], self.versao)
+
+        texto = self.cache.get(chave)
+        if texto is not None:
+            return RespostaCacheada(texto, nodes)
+
+        return RespostaEmStreaming(
+            _sintetizar_em_streaming(bundle, nodes),
+            lambda completo: self.cache.put(chave, prompt, completo, self.versao),
+        )
+
+    def __getattr__(self, nome):
+        return getattr(self._query_engine, nome)
+
+
+def _sintetizar_em_streaming(bundle, nodes):
+    from llama_index.core import get_response_synthesizer
+
+    return get_response_synthesizer(streaming=True).synthesize(bundle, nodes)
+
+
+def consultar_em_streaming(query_engine, prompt: str):
+    """
+    Consulta ao query engine do RAG com a resposta em streaming
+
+    Returns:
+        Resposta com ``response_gen`` (um só trecho quando vem do cache de respostas)
+    """
+    if isinstance(query_engine, QueryEngineComCache):
+        return query_engine.stream_query(prompt)
+    from llama_index.core.schema import QueryBundle
+
+    bundle = QueryBundle(prompt)
+    return _sintetizar_em_streaming(bundle, query_engine.retrieve(bundle))
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class RetrieverReaproveitavel(BaseRetriever):
+        """
+        Retriever do chat engine que aceita nós já recuperados
+
+        O ``ChatEngineComCache`` recupera os nós para montar a chave; num miss
+        eles são entregues aqui e a chamada seguinte do chat engine para a
+        mesma pergunta (na mesma thread) os reaproveita em vez de buscar de novo.
+        """
+
+        def __init__(self, retriever):
+            super().__init__()
+            self._interno = retriever
+            self._local = threading.local()
+
+        def reaproveitar(self, prompt: str, nodes: List):
+            self._local.pendente = (prompt, nodes)
+
+        def _retrieve(self, query_bundle):
+            pendente = getattr(self._local, "pendente", None)
+            self._local.pendente = None
+            if pendente is not None and pendente[0] == query_bundle.query_str:
+                return list(pendente[1])
+            return self._interno.retrieve(query_bundle)
+
+
+class ChatEngineComCache:
+    """
+    ⚡ Chat engine com cache de respostas
+
+    A resposta depende da conversa, então o histórico atual entra na chave:
+    na prática, a primeira pergunta de cada conversa é a que mais acerta.
+    Em caso de hit, pergunta e resposta são registradas na memória para a
+    conversa seguir normalmente. ``retriever`` é o ``RetrieverReaproveitavel``
+    do próprio chat engine: num miss a busca não é repetida.
+    """
+
+    def __init__(self, chat_engine, retriever, versao: str, cache: Optional[CacheRespostas] = None):
+        self._chat_engine = chat_engine
+        self._retriever = retriever
+        self.versao = versao
+        self.cache = cache or obter_cache_respostas()
+
+    def _contexto_conversa(self) -> str:
+        historico = self._chat_engine.chat_history
+        if not historico:
+            return ""
+        h = hashlib.sha1()
+        for mensagem in historico:
+            h.update(f"{mensagem.role}:{normalizar_pergunta(str(mensagem.content or ''))}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def _registrar_na_memoria(self, prompt: str, texto: str):
+        from llama_index.core.llms import ChatMessage, MessageRole
+
+        memoria = self._chat_engine._memory
+        memoria.put(ChatMessage(role=MessageRole.USER, content=prompt))
+        memoria.put(ChatMessage(role=MessageRole.ASSISTANT, content=texto))
+
+    def chat(self, prompt: str):
+        nodes = self._retriever.retrieve(prompt)
+        chave = self.cache.montar_chave(
+            prompt, [n.node.node_id for n in nodes], self.versao, self._contexto_conversa()
+        )
+
+        texto = self.cache.get(chave)
+        if texto is not None:
+            self._registrar_na_memoria(prompt, texto)
+            return RespostaCacheada(texto, nodes)
+
+        self._retriever.reaproveitar(prompt, nodes)
+        resposta = self._chat_engine.chat(prompt)
+        self.cache.put(chave, prompt, str(resposta), self.versao)
+        return resposta
+
+    def stream_chat(self, prompt: str):
+        """Como ``chat``, mas com ``response_gen``: o miss sai token a token e vai para o cache ao final"""
+        nodes = self._retriever.retrieve(prompt)
+        chave = self.cache.montar_chave(
+            prompt, [n.node.node_id for n in nodes], self.versao, self._contexto_conversa()
+        )
+
+        texto = self.cache.get(chave)
+        if texto is not None:
+            self._registrar_na_memoria(prompt, texto)
+            return RespostaCacheada(texto, nodes)
+
+        self._retriever.reaproveitar(prompt, nodes)
+        return RespostaEmStreaming(
+            self._chat_engine.stream_chat(prompt),
+            lambda completo: self.cache.put(chave, prompt, completo, self.versao),
+        )
+
+    def __getattr__(self, nome):
+        return getattr(self._chat_engine, nome)
@@ -2,15 +2,26 @@ import streamlit as st
 import time
 import os
 from pathlib import Path
-from config import SERVER_CONFIG, get_server_port, get_server_url
+from config import (SERVER_CONFIG, RAG_CONFIG, ANSWER_CACHE_CONFIG, OLLAMA_CONFIG, MODELS_CONFIG,
+                    get_server_port, get_server_url)
 from environment import load_settings
-from core_logic import verificar_conexao_ollama, carregar_memoria, processar_prompt_geral
+from core_logic import carregar_memoria, conversar, processar_prompt_geral
 from streamlit_chat import message
 from streamlit_option_menu import option_menu
-from llama_index.core import Settings, VectorStoreIndex, SimpleDirectoryReader
+from llama_index.core import Settings
 from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core.memory import ChatMemoryBuffer
+from embedding_engine import criar_modelo_embedding, obter_relatorio_throughput
+from chunker import criar_chunker
+from index_manager import GerenciadorIndice, MODO_PRINCIPAL, MODO_REFERENCIA, MODO_LOCAL
+from answer_cache import obter_cache_respostas
+from semantic_cache import obter_cache_semantico
+from llm_cache import obter_cache_geracoes
+from frases_pool import obter_pool_frases
+from llm_streaming import MedidorStream, relatorio_streaming
+from llm_gateway import obter_gateway_llm
+from ollama_client import obter_cliente_ollama, obter_monitor_ollama
+from model_residency import obter_gerenciador_modelos
 
 # 🔍 NOVA IMPORTAÇÃO: File System Watcher
 try:
@@ -23,132 +34,136 @@ except ImportError:
 SETTINGS = load_settings()
 NO_DEPS_MODE = SETTINGS.no_deps
 
+# Modelo de embedding do índice principal (mudança força reconstrução do índice salvo)
+MODELO_EMBEDDING_SISTEMA = "BAAI/bge-small-en-v1.5"
+
 # =================================================================================
 # CONTROLE DE ESTADO DE INICIALIZAÇÃO - SISTEMA ROBUSTO
 # =================================================================================
 if "system_ready" not in st.session_state:
     st.session_state.system_ready = False
-# Removido: inicialização manual do query_engine agora é feita via @st.cache_resource
+# A base de conhecimento é do GerenciadorIndice; a sessão guarda só o chat engine e sua memória
 if "chat_engine" not in st.session_state:
     st.session_state.chat_engine = None
+if "chat_engine_geracao" not in st.session_state:
+    st.session_state.chat_engine_geracao = 0
+if "chat_memory" not in st.session_state:
+    st.session_state.chat_memory = None
+if "usar_chat_engine" not in st.session_state:
+    st.session_state.usar_chat_engine = False
 # 🔍 NOVO: Estado do File Watcher
 if "watcher_initialized" not in st.session_state:
     st.session_state.watcher_initialized = False
 
-@st.cache_resource
-def setup_sistema_ia():
-    """Configuração inicial do sistema de IA"""
-    try:
-        # Configurar embedding
-        embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        Settings.embed_model = embed_model
-        
-        # Configurar LLM padrão
-        llm = Ollama(model="llava-llama3", request_timeout=120.0)
-        Settings.llm = llm
-        
-        return True
-    except Exception as e:
-        st.code(f"Erro na configuração do sistema: {str(e)}")
-        return False
+def configurar_modelos():
+    """
+    Modelos do LlamaIndex usados pela base de conhecimento
 
-def inicializar_rag(pasta_memoria="memoria"):
-    """Inicializa o motor RAG uma única vez - Padrão Singleton"""
-    import traceback
-    
+    Roda na thread do gerenciador (carregar o modelo de embedding leva alguns
+    segundos), então a interface aparece antes de os modelos estarem prontos.
+    """
+    print("DEBUG: Configurando Settings do LlamaIndex...")
+    Settings.embed_model = criar_modelo_embedding(MODELO_EMBEDDING_SISTEMA)
+    # keep_alive do gerenciador de residência: o modelo do RAG não sai da memória a cada pausa
+    gerenciador_modelos = obter_gerenciador_modelos()
+    extras = {"keep_alive": gerenciador_modelos.keep_alive_para(MODELS_CONFIG["rag"])} if gerenciador_modelos else {}
+    # Mesmo timeout de leitura do /api/generate que o gateway usa
+    Settings.llm = Ollama(model=MODELS_CONFIG["rag"], base_url=OLLAMA_CONFIG["url"],
+                          request_timeout=float(OLLAMA_CONFIG["timeouts"]["/api/generate"]), **extras)
+    # Chunking por seções/sentenças com chunk_size e chunk_overlap do RAG_CONFIG
+    Settings.node_parser = criar_chunker()
+
+def formatar_segundos(segundos) -> str:
+    """Duração curta para a interface (ex.: 1m20s)"""
+    segundos = int(segundos)
+    return f"{segundos // 60}m{segundos % 60:02d}s" if segundos >= 60 else f"{segundos}s"
+
+def exibir_progresso_indexacao():
+    """Andamento da inicialização/indexação em segundo plano (sidebar)"""
+    status = gerenciador_indice.get_status()
+    progresso = status['progresso']
+    if progresso['fase'] == "parado":
+        if status['shards']:
+            st.caption(f"📚 Base pronta: {status['chunks']} chunks")
+        elif status['ultimo_erro']:
+            st.caption(f"⚠️ Base indisponível: {status['ultimo_erro']}")
+        return
+
+    st.caption(f"🔄 Base de conhecimento: {progresso['fase']}...")
+    if progresso['arquivos_total']:
+        st.progress(min(1.0, progresso['arquivos_embedados'] / progresso['arquivos_total']))
+        eta = f" · ETA {formatar_segundos(progresso['eta_s'])}" if progresso['eta_s'] is not None else ""
+        st.caption(f"📄 {progresso['arquivos_lidos']}/{progresso['arquivos_total']} arquivos lidos · "
+                   f"🧩 {progresso['chunks_embedados']} chunks{eta}")
+    if not status['shards']:
+        st.caption("💬 Enquanto isso, o chat responde direto pelo Ollama.")
+
+# Atualiza só o bloco de progresso a cada 2s (Streamlit >= 1.37); versões antigas atualizam a cada interação
+if hasattr(st, "fragment"):
+    exibir_progresso_indexacao = st.fragment(run_every=2)(exibir_progresso_indexacao)
+
+def obter_chat_engine():
+    """
+    Chat engine da sessão ligado à base ativa
+
+    Quando o gerenciador troca a base, o chat engine é recriado sobre a nova
+    base reaproveitando a memória da conversa.
+    """
+    if not st.session_state.usar_chat_engine:
+        return None
+    base = gerenciador_indice.base
+    if base is None:
+        return None
+    if st.session_state.chat_engine is None or st.session_state.chat_engine_geracao != base.geracao:
+        if st.session_state.chat_memory is None:
+            st.session_state.chat_memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
+        st.session_state.chat_engine = gerenciador_indice.criar_chat_engine(st.session_state.chat_memory, base)
+        st.session_state.chat_engine_geracao = base.geracao
+    return st.session_state.chat_engine
+
+def exibir_resposta(area, resposta, intervalo: float = 0.05) -> str:
+    """
+    Mostra a resposta na área do chat, token a token quando vier em streaming
+
+    Args:
+        area: Placeholder do Streamlit (st.empty())
+        resposta: Texto pronto ou iterável de trechos
+        intervalo: Segundos mínimos entre redesenhos do markdown
+
+    Returns:
+        str: Texto completo exibido
+    """
+    if isinstance(resposta, str):
+        area.markdown(resposta)
+        return resposta
+
+    medidor = MedidorStream(resposta)
+    texto = ""
+    ultimo_desenho = 0.0
     try:
-        print("DEBUG: Inicializando o motor RAG...")
-        
-        # Primeiro, processar arquivos de mídia (vídeos, imagens)
-        print("DEBUG: Processando arquivos de mídia...")
-        carregar_memoria(pasta_memoria)
-        
-        # Verificar se a pasta existe e tem arquivos
-        if not os.path.exists(pasta_memoria):
-            print(f"DEBUG: Pasta não encontrada: {pasta_memoria}")
-            return None, None
-            
-        print(f"DEBUG: Pasta encontrada: {pasta_memoria}")
-        
-        # Carregar documentos da pasta (excluindo vídeos se pydub não funcionar)
-        print("DEBUG: Carregando documentos...")
-        
-        # Filtrar arquivos para evitar problemas com vídeos
-        import glob
-        arquivos_validos = []
-        extensoes_video = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
-        
-        for arquivo in glob.glob(os.path.join(pasta_memoria, "*")):
-            if os.path.isfile(arquivo):
-                extensao = os.path.splitext(arquivo)[1].lower()
-                if extensao in extensoes_video:
-                    print(f"DEBUG: Pulando arquivo de vídeo: {os.path.basename(arquivo)}")
-                    continue
-                arquivos_validos.append(arquivo)
-        
-        print(f"DEBUG: {len(arquivos_validos)} arquivos válidos encontrados")
-        
-        if not arquivos_validos:
-            print("DEBUG: Nenhum arquivo válido encontrado (apenas vídeos)")
-            return None, None
-        
-        # Carregar apenas arquivos válidos
-        documents = SimpleDirectoryReader(input_files=arquivos_validos).load_data()
-        
-        if not documents:
-            print(f"DEBUG: Nenhum documento carregado da pasta: {pasta_memoria}")
-            return None, None
-            
-        print(f"DEBUG: {len(documents)} documentos carregados com sucesso!")
-        
-        # Criar índice
-        print("DEBUG: Criando índice vetorial...")
-        index = VectorStoreIndex.from_documents(documents)
-        
-        # Criar query engine
-        print("DEBUG: Criando query engine...")
-        query_engine = index.as_query_engine()
-        
-        # 🧠 NOVA FUNCIONALIDADE: Criar ChatEngine com memória conversacional
-        print("DEBUG: Criando ChatEngine com memória conversacional...")
-        memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
-        chat_engine = index.as_chat_engine(
-            chat_mode="context",
-            memory=memory,
-            system_prompt=(
-                "Você é o AFI (Assistente Finiti Inteligente), um assistente especializado em engenharia, "
-                "construção e equipamentos da empresa Finiti. Você tem acesso à base de conhecimento da empresa "
-                "e pode manter conversas contextuais. Sempre se lembre do contexto anterior da conversa. "
-                "Quando o usuário se referir a 'isso', 'aquilo', ou usar pronomes, considere o contexto da conversa anterior."
-            )
-        )
-        
-        print("DEBUG: Motor RAG e ChatEngine inicializados com sucesso!")
-        return query_engine, chat_engine
-        
+        for trecho in medidor:
+            texto += trecho
+            agora = time.monotonic()
+            if agora - ultimo_desenho >= intervalo:
+                area.markdown(texto + "▌")
+                ultimo_desenho = agora
     except Exception as e:
-        # DIAGNÓSTICO DETALHADO - CAPTURANDO O ERRO COMPLETO
-        print("=" * 60)
-        print("--- ERRO DETALHADO AO INICIALIZAR O RAG ---")
-        print(f"Tipo do erro: {type(e).__name__}")
-        print(f"Mensagem: {str(e)}")
-        print("Traceback completo:")
-        traceback.print_exc()
-        print("=" * 60)
-        return None, None
-
-def criar_query_engine(pasta_memoria="memoria"):
-    """Função mantida para compatibilidade - usa inicializar_rag()"""
-    query_engine, chat_engine = inicializar_rag(pasta_memoria)
-    return query_engine
+        texto += f"\n\n⚠️ Resposta interrompida: {str(e)}"
+    area.markdown(texto)
+
+    if medidor.ttft is not None:
+        st.caption(f"⚡ 1º token em {medidor.ttft:.2f}s · {medidor.tokens_por_segundo:.1f} tokens/s")
+    return texto
 
 def verificar_status_sistema():
     """Verifica o status de todos os componentes do sistema"""
+    # Estado em cache do monitor de saúde: nenhuma requisição ao Ollama por rerun
+    saude_ollama = obter_monitor_ollama().get_status()
     status = {
-        'ollama': verificar_conexao_ollama(),
+        'ollama': saude_ollama['online'],
         'rag': query_engine is not None,
-        'chat_engine': st.session_state.chat_engine is not None,
-        'models_count': 1 if verificar_conexao_ollama() else 0
+        'chat_engine': st.session_state.usar_chat_engine and query_engine is not None,
+        'models_count': len(saude_ollama['modelos']) if saude_ollama['online'] else 0
     }
     return status
 
@@ -198,86 +213,33 @@ st.markdown(css, unsafe_allow_html=True)
 # ARQUITETURA DE INICIALIZAÇÃO DEFINITIVA - SISTEMA ROBUSTO E À PROVA DE FALHAS
 # =================================================================================
 
-@st.cache_resource(show_spinner='Inicializando o cérebro do AFI... Este processo pode levar um momento.')
+@st.cache_resource(show_spinner=False)
 def inicializar_sistema(pasta_memoria="memoria"):
     """
     Função de inicialização definitiva do sistema AFI.
-    Carrega TODA a lógica pesada de forma robusta e confiável.
-    Retorna o query_engine pronto para uso.
+    Cria o gerenciador da base de conhecimento, que passa a ser o único dono
+    do índice, e agenda em segundo plano o carregamento dos modelos e a
+    construção da base. Retorna na hora: a interface fica disponível
+    enquanto isso e o chat usa o Ollama direto até a base ficar pronta.
     """
-    import traceback
-    
-    try:
-        print("DEBUG: Inicializando sistema AFI com arquitetura robusta...")
-        
-        # Configurar Settings do LlamaIndex
-        print("DEBUG: Configurando Settings do LlamaIndex...")
-        Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
-        Settings.llm = Ollama(model="llama3.2", request_timeout=120.0)
-        
-        # Processar arquivos de mídia
-        print("DEBUG: Processando arquivos de mídia...")
-        carregar_memoria(pasta_memoria)
-        
-        # Verificar se a pasta existe
-        if not os.path.exists(pasta_memoria):
-            print(f"DEBUG: Pasta não encontrada: {pasta_memoria}")
-            return None
-            
-        print(f"DEBUG: Pasta encontrada: {pasta_memoria}")
-        
-        # Filtrar arquivos válidos (excluindo vídeos)
-        import glob
-        arquivos_validos = []
-        extensoes_video = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
-        
-        for arquivo in glob.glob(os.path.join(pasta_memoria, "*")):
-            if os.path.isfile(arquivo):
-                extensao = os.path.splitext(arquivo)[1].lower()
-                if extensao in extensoes_video:
-                    print(f"DEBUG: Pulando arquivo de vídeo: {os.path.basename(arquivo)}")
-                    continue
-                arquivos_validos.append(arquivo)
-        
-        print(f"DEBUG: {len(arquivos_validos)} arquivos válidos encontrados")
-        
-        if not arquivos_validos:
-            print("DEBUG: Nenhum arquivo válido encontrado")
-            return None
-        
-        # Criar SimpleDirectoryReader com arquivos válidos
-        print("DEBUG: Criando SimpleDirectoryReader...")
-        documents = SimpleDirectoryReader(input_files=arquivos_validos).load_data()
-        
-        if not documents:
-            print(f"DEBUG: Nenhum documento carregado da pasta: {pasta_memoria}")
-            return None
-            
-        print(f"DEBUG: {len(documents)} documentos carregados com sucesso!")
-        
-        # Criar VectorStoreIndex
-        print("DEBUG: Criando VectorStoreIndex...")
-        index = VectorStoreIndex.from_documents(documents)
-        
-        # Criar query_engine
-        print("DEBUG: Criando query_engine...")
-        query_engine = index.as_query_engine()
-        
-        print("DEBUG: Sistema AFI inicializado com sucesso!")
-        return query_engine
-        
-    except Exception as e:
-        print("=" * 60)
-        print("--- ERRO CRÍTICO NA INICIALIZAÇÃO DO SISTEMA ---")
-        print(f"Tipo do erro: {type(e).__name__}")
-        print(f"Mensagem: {str(e)}")
-        print("Traceback completo:")
-        traceback.print_exc()
-        print("=" * 60)
-        return None
+    print("DEBUG: Inicializando sistema AFI com arquitetura robusta...")
+    gerenciador = GerenciadorIndice(MODELO_EMBEDDING_SISTEMA, preparar_pasta=carregar_memoria,
+                                    inicializar=configurar_modelos)
+    gerenciador.reconstruir(pasta_memoria, MODO_PRINCIPAL)
+    # Estoque de frases do estúdio: enche quando o Ollama estiver ocioso
+    obter_pool_frases()
+    # Modelos do chat e do RAG carregados antes da primeira pergunta (e o do chat fixado na memória)
+    gerenciador_modelos = obter_gerenciador_modelos()
+    if gerenciador_modelos is not None:
+        gerenciador_modelos.iniciar()
+    return gerenciador
 
-# Carrega ou obtém do cache o motor RAG. A aplicação só continua depois que esta linha for concluída.
-query_engine = inicializar_sistema()
+# Obtém do cache o gerenciador (não espera a base de conhecimento ficar pronta)
+gerenciador_indice = inicializar_sistema()
+# Snapshot da base ativa para esta execução do script (trocas em segundo plano valem na próxima)
+base_ativa = gerenciador_indice.base
+query_engine = base_ativa.query_engine if base_ativa else None
+versao_base = base_ativa.versao if base_ativa else None
 
 # =================================================================================
 # SEQUÊNCIA DE INICIALIZAÇÃO ROBUSTA - SISTEMA SEMPRE PRONTO
@@ -288,24 +250,9 @@ if not st.session_state.system_ready:
     st.title("🏗️ AFI v3.0 - Assistente Finiti Inteligente")
     st.markdown("### 🧠 Inicializando o cérebro do AFI...")
     
-    with st.spinner("Conectando memórias e IAs... Por favor, aguarde."):
-        try:
-            # Configurar sistema de IA
-            sistema_ok = setup_sistema_ia()
-            
-            if sistema_ok:
-                # Sinaliza que o sistema está pronto
-                st.session_state.system_ready = True
-                
-                # Força o recarregamento do script
-                st.rerun()
-            else:
-                st.error("❌ Erro na inicialização do sistema de IA")
-                st.stop()
-                
-        except Exception as e:
-            st.error(f"❌ Erro durante inicialização: {str(e)}")
-            st.stop()
+    # Modelos e base de conhecimento carregam em segundo plano (progresso na sidebar)
+    st.session_state.system_ready = True
+    st.rerun()
 
 else:
     if NO_DEPS_MODE:
@@ -331,6 +278,8 @@ else:
         if NO_DEPS_MODE:
             st.warning("Modo Simulado ativo. Saidas sao arquivos dummy.")
 
+        exibir_progresso_indexacao()
+
         # Menu de navegação
         st.session_state.view = option_menu(
             menu_title=None,
@@ -362,22 +311,27 @@ else:
             
             # Lógica para obter e exibir a resposta da IA
             with st.chat_message("assistant", avatar="🏗️"):
-                with st.spinner("Pensando..."):
-                    # 🧠 NOVA LÓGICA: Usar ChatEngine com memória conversacional quando disponível
-                    if st.session_state.chat_engine:
-                        try:
-                            # Usar ChatEngine que mantém contexto da conversa
-                            resposta = st.session_state.chat_engine.chat(prompt)
-                            resposta_texto = str(resposta)
-                        except Exception as e:
-                            # Fallback para o sistema antigo se ChatEngine falhar
-                            resposta_texto = processar_prompt_geral(prompt, query_engine)
-                            st.warning("⚠️ Usando modo compatibilidade (sem memória conversacional)")
-                    else:
-                        # Fallback para o sistema antigo
-                        resposta_texto = processar_prompt_geral(prompt, query_engine)
-                    
-                    st.markdown(resposta_texto)
+                area_resposta = st.empty()
+                area_resposta.markdown("⏳ Pensando...")
+                # 🧠 NOVA LÓGICA: Usar ChatEngine com memória conversacional quando disponível
+                chat_engine = obter_chat_engine()
+                if chat_engine:
+                    try:
+                        # Usar ChatEngine que mantém contexto da conversa (tokens exibidos à medida que chegam)
+                        resposta_texto = exibir_resposta(area_resposta, conversar(chat_engine, prompt, stream=True))
+                    except Exception as e:
+                        # Fallback para o sistema antigo se ChatEngine falhar
+                        resposta_texto = exibir_resposta(
+                            area_resposta,
+                            processar_prompt_geral(prompt, query_engine, stream=True, versao_base=versao_base)
+                        )
+                        st.warning("⚠️ Usando modo compatibilidade (sem memória conversacional)")
+                else:
+                    # Fallback para o sistema antigo
+                    resposta_texto = exibir_resposta(
+                        area_resposta,
+                        processar_prompt_geral(prompt, query_engine, stream=True, versao_base=versao_base)
+                    )
             
             # Adiciona a resposta da IA ao histórico
             st.session_state.messages.append({"role": "assistant", "content": resposta_texto})
@@ -416,10 +370,109 @@ else:
             # Status do RAG usando a nova variável global
             if query_engine:
                 st.success("RAG: Ativo ✅")
+            elif gerenciador_indice.get_status()['progresso']['fase'] != "parado":
+                st.info("RAG: Carregando em segundo plano ⏳")
             else:
                 st.error("RAG: Inativo ❌")
                 
             st.code(f"Modelos Disponíveis: {status['models_count']}")
+            
+            # Throughput do motor de embeddings (acumulado desde o start)
+            relatorio_embeddings = obter_relatorio_throughput(Settings.embed_model)
+            if relatorio_embeddings and relatorio_embeddings['chunks']:
+                st.code(
+                    f"Embeddings: {relatorio_embeddings['chunks_por_segundo']} chunks/s "
+                    f"({relatorio_embeddings['chunks']} chunks em {relatorio_embeddings['lotes']} lotes)"
+                )
+            elif hasattr(Settings.embed_model, "get_status"):
+                # Embeddings pelo servidor local: mostra o lote compartilhado entre os processos
+                try:
+                    status_servidor = Settings.embed_model.get_status()
+                    st.code(
+                        f"Servidor de embeddings: {status_servidor['textos_por_segundo']} textos/s, "
+                        f"{status_servidor['pedidos_por_lote']} pedidos por lote"
+                    )
+                except Exception:
+                    st.warning("⚠️ Servidor de embeddings não responde")
+
+            # Latência percebida no chat (tempo até o 1º token e velocidade de geração)
+            status_streaming = relatorio_streaming.get_status()
+            if status_streaming['respostas']:
+                st.code(
+                    f"Streaming: TTFT p50 {status_streaming['ttft_s_p50']}s / p95 {status_streaming['ttft_s_p95']}s, "
+                    f"{status_streaming['tokens_por_segundo_medio']} tokens/s "
+                    f"({status_streaming['respostas']} respostas)"
+                )
+
+            # Fila do gateway do LLM: quanto cada classe esperou por uma vaga
+            status_gateway = obter_gateway_llm().get_status()
+            if status_gateway['coalescidas']:
+                st.code(f"LLM: {status_gateway['coalescidas']} gerações economizadas (pedidos idênticos simultâneos)")
+            for nome, status_prioridade in status_gateway['prioridades'].items():
+                if status_prioridade['concedidas'] or status_prioridade['na_fila']:
+                    st.code(
+                        f"LLM {nome}: espera p50 {status_prioridade['espera_s_p50']}s / "
+                        f"p95 {status_prioridade['espera_s_p95']}s, {status_prioridade['na_fila']} na fila, "
+                        f"{status_prioridade['canceladas']} desistências"
+                    )
+
+            # Modelos na memória do Ollama e quanto custaram as cargas frias
+            gerenciador_modelos = obter_gerenciador_modelos()
+            if gerenciador_modelos is not None:
+                status_modelos = gerenciador_modelos.get_status()
+                residentes = status_modelos['residentes']
+                st.code(
+                    f"Modelos carregados: {', '.join(residentes) if residentes else 'nenhum'} "
+                    f"(fixados: {', '.join(status_modelos['fixados']) or 'nenhum'}) · "
+                    f"{status_modelos['cargas_frias']} cargas frias, {status_modelos['custo_cargas_s']}s no total"
+                )
+
+            # Chamadas HTTP ao Ollama pela sessão compartilhada
+            for endpoint, status_endpoint in obter_cliente_ollama().get_status().items():
+                st.code(
+                    f"Ollama {endpoint}: {status_endpoint['requisicoes']} requisições, "
+                    f"{status_endpoint['erros']} erros, {status_endpoint['repeticoes']} repetições, "
+                    f"p50 {status_endpoint['latencia_s_p50']}s / p95 {status_endpoint['latencia_s_p95']}s"
+                )
+
+            # Cache de respostas do RAG (hits evitam uma geração inteira no Ollama)
+            if ANSWER_CACHE_CONFIG["habilitado"]:
+                status_respostas = obter_cache_respostas().get_status()
+                st.code(
+                    f"Cache de respostas: {status_respostas['entradas']} entradas, "
+                    f"{status_respostas['hits']} hits / {status_respostas['misses']} misses "
+                    f"(hit rate {status_respostas['hit_rate']:.0%})"
+                )
+
+            # Cache de gerações (frases de marketing do guardião e do estúdio)
+            cache_geracoes = obter_cache_geracoes()
+            if cache_geracoes is not None:
+                status_geracoes = cache_geracoes.get_status()
+                st.code(
+                    f"Cache de gerações: {status_geracoes['entradas']} respostas de {status_geracoes['prompts']} prompts, "
+                    f"{status_geracoes['hits']} hits / {status_geracoes['misses']} misses"
+                )
+
+            # Estoque de frases de marketing (faltas = vídeos que esperaram geração ao vivo)
+            pool_frases = obter_pool_frases()
+            if pool_frases is not None:
+                status_frases = pool_frases.get_status()
+                st.code(
+                    f"Estoque de frases: {sum(status_frases['por_tipo'].values())} prontas, "
+                    f"{status_frases['retiradas']} usadas, {status_frases['faltas']} faltas"
+                )
+
+            # Cache semântico (perguntas parecidas): dados para calibrar o limiar
+            cache_semantico = obter_cache_semantico()
+            if cache_semantico:
+                status_semantico = cache_semantico.get_status()
+                st.code(
+                    f"Cache semântico (limiar {status_semantico['limiar']}): "
+                    f"hit rate {status_semantico['hit_rate']:.0%}, "
+                    f"{status_semantico['quase_hits']} quase-hits, "
+                    f"busca p95 {status_semantico['busca_ms_p95']} ms, "
+                    f"miss p50 {status_semantico['miss_ms_p50']} ms"
+                )
 
     # TELA DE GERENCIAMENTO DE CONHECIMENTO
     elif st.session_state.view == 'Conhecimento':
@@ -440,26 +493,13 @@ else:
             
             if st.button("🔗 Indexar por Referência", use_container_width=True):
                 if pasta_servidor and os.path.isdir(pasta_servidor):
-                    try:
-                        with st.spinner("🔗 Indexando arquivos por referência... Aguarde."):
-                            # 🔗 USAR NOVA FUNÇÃO DE INDEXAÇÃO POR REFERÊNCIA
-                            query_engine, chat_engine = indexar_por_referencia(pasta_servidor)
-                            
-                            if query_engine and chat_engine:
-                                # Atualizar apenas o chat_engine (query_engine é gerenciado pelo cache)
-                                st.session_state.chat_engine = chat_engine
-                                
-                                st.success(f"✅ Pasta indexada por referência com sucesso!")
-                                st.info(f"📂 **Fonte:** {pasta_servidor}")
-                                st.info("🧠 **Memória conversacional ativa!**")
-                                st.warning("⚠️ Para usar a nova base, reinicie a aplicação para limpar o cache.")
-                                
-                                # Mostrar estatísticas
-                                st.balloons()
-                            else:
-                                st.warning(f"⚠️ Pasta processada, mas nenhum documento válido encontrado!")
-                    except Exception as e:
-                        st.error(f"❌ Erro ao indexar por referência: {str(e)}")
+                    # 🔗 Indexação por referência em segundo plano: a base atual segue respondendo
+                    gerenciador_indice.reconstruir(pasta_servidor, MODO_REFERENCIA)
+                    st.session_state.usar_chat_engine = True
+                    
+                    st.success("✅ Indexação por referência iniciada em segundo plano!")
+                    st.info(f"📂 **Fonte:** {pasta_servidor}")
+                    st.info("🧠 **Memória conversacional ativa!** A nova base entra em uso assim que ficar pronta.")
                 elif pasta_servidor:
                     st.error("❌ Caminho inválido ou diretório não encontrado!")
                 else:
@@ -481,18 +521,10 @@ else:
         
             if st.button("📁 Indexar Pasta Local", use_container_width=True):
                 if pasta_local and os.path.isdir(pasta_local):
-                    try:
-                        # Usar função tradicional
-                        query_engine_local, chat_engine = inicializar_rag(pasta_local)
-                        if query_engine_local and chat_engine:
-                            st.session_state.chat_engine = chat_engine
-                            st.success(f"✅ Pasta local indexada com sucesso!")
-                            st.info(f"📂 Pasta: {pasta_local}")
-                            st.warning("⚠️ Para usar a nova base, reinicie a aplicação para limpar o cache.")
-                        else:
-                            st.warning(f"⚠️ Pasta indexada, mas nenhum documento encontrado!")
-                    except Exception as e:
-                        st.error(f"❌ Erro ao indexar: {str(e)}")
+                    gerenciador_indice.reconstruir(pasta_local, MODO_LOCAL)
+                    st.session_state.usar_chat_engine = True
+                    st.success("✅ Indexação da pasta local iniciada em segundo plano!")
+                    st.info(f"📂 Pasta: {pasta_local}")
                 elif pasta_local:
                     st.error("❌ Caminho inválido ou diretório não encontrado!")
                 else:
@@ -502,13 +534,28 @@ else:
              st.subheader("📊 Status da Base de Conhecimento")
              
              # Status dos engines
-             if st.session_state.chat_engine:
+             if st.session_state.usar_chat_engine and query_engine:
                  st.success("🧠 **ChatEngine:** Ativo (com memória conversacional)")
              elif query_engine:
                  st.warning("🔍 **QueryEngine:** Ativo (sem memória conversacional)")
              else:
                  st.error("❌ **Nenhum engine ativo**")
              
+             # Base ativa e reconstruções em segundo plano
+             status_base = gerenciador_indice.get_status()
+             if status_base['shards']:
+                 st.write(f"📚 **Base ativa:** {len(status_base['shards'])} shard(s), "
+                          f"{status_base['chunks']} chunks, geração {status_base['geracao']}")
+                 for shard in status_base['shards']:
+                     st.code(f"📂 {shard['fonte']} ({shard['modo']}, {shard['chunks']} chunks, {shard['criado_em']})")
+             if status_base['construindo']:
+                 st.info(f"🔄 Atualizando o shard de `{status_base['construindo']}`... "
+                         f"as consultas continuam na base atual.")
+                 if st.button("🔃 Atualizar status"):
+                     st.rerun()
+             elif status_base['ultimo_erro']:
+                 st.warning(f"⚠️ Última indexação não trocou a base: {status_base['ultimo_erro']}")
+             
              # 🔍 NOVA SEÇÃO: File System Watcher
              st.markdown("---")
              st.subheader("👁️ File System Watcher")
@@ -517,7 +564,8 @@ else:
                  # Inicializar o watcher service se ainda não foi feito
                  if not st.session_state.watcher_initialized:
                      try:
-                         inicializar_watcher_service()
+                         # Mudanças numa pasta monitorada reconstroem só o shard dela
+                         inicializar_watcher_service(gerenciador_indice.reconstruir_pasta_alterada)
                          st.session_state.watcher_initialized = True
                          st.toast("✅ File System Watcher inicializado!", icon="👁️")
                      except Exception as e:
@@ -528,7 +576,7 @@ else:
                      st.success("👁️ **Watcher:** Ativo (monitorando)")
                      
                      # Mostrar pastas monitoradas
-                     pastas_monitoradas = afi_watcher_service.get_watched_folders()
+                     pastas_monitoradas = afi_watcher_service.get_status()['watched_folders']
                      if pastas_monitoradas:
                          st.write("📁 **Pastas monitoradas:**")
                          for pasta in pastas_monitoradas:
@@ -541,14 +589,14 @@ else:
                      
                      with col_watcher1:
                          if st.button("⏸️ Parar Watcher", use_container_width=True):
-                             afi_watcher_service.stop()
+                             afi_watcher_service.stop_service()
                              st.success("⏸️ Watcher parado!")
                              st.rerun()
                      
                      with col_watcher2:
                          if st.button("🔄 Reiniciar Watcher", use_container_width=True):
-                             afi_watcher_service.stop()
-                             afi_watcher_service.start()
+                             afi_watcher_service.stop_service()
+                             afi_watcher_service.start_service()
                              st.success("🔄 Watcher reiniciado!")
                              st.rerun()
                      
@@ -564,7 +612,9 @@ else:
                      if st.button("➕ Adicionar Pasta", use_container_width=True):
                          if nova_pasta and os.path.isdir(nova_pasta):
                              try:
-                                 afi_watcher_service.add_folder(nova_pasta)
+                                 afi_watcher_service.add_watch_folder(nova_pasta)
+                                 # Cada pasta monitorada é um shard próprio da base
+                                 gerenciador_indice.reconstruir(nova_pasta, MODO_REFERENCIA)
                                  st.success(f"✅ Pasta adicionada ao monitoramento!")
                                  st.info(f"📂 {nova_pasta}")
                                  st.rerun()
@@ -580,7 +630,7 @@ else:
                      
                      if st.button("▶️ Iniciar Watcher", use_container_width=True):
                          try:
-                             afi_watcher_service.start()
+                             afi_watcher_service.start_service()
                              st.success("▶️ Watcher iniciado!")
                              st.rerun()
                          except Exception as e:
@@ -612,10 +662,17 @@ else:
              # Botão para limpar memória
              st.markdown("---")
              if st.button("🗑️ Limpar Base de Conhecimento", use_container_width=True):
-                 # Limpar apenas o chat_engine (query_engine é gerenciado pelo cache)
+                 # Encerrar a conversa e voltar para a base principal (pasta memoria/)
+                 st.session_state.usar_chat_engine = False
                  st.session_state.chat_engine = None
-                 st.success("✅ Base de conhecimento limpa!")
-                 st.info("💡 Para limpar completamente, reinicie a aplicação.")
+                 st.session_state.chat_memory = None
+                 base = gerenciador_indice.base
+                 for shard in (base.shards if base else ()):
+                     if shard.modo != MODO_PRINCIPAL:
+                         gerenciador_indice.remover_shard(shard.fonte)
+                 if base is None or not any(s.modo == MODO_PRINCIPAL for s in base.shards):
+                     gerenciador_indice.reconstruir("memoria", MODO_PRINCIPAL)
+                 st.success("✅ Base de conhecimento limpa! Voltando à base principal em segundo plano.")
                  st.rerun()
 
     # TELA DO ESTÚDIO DE IA
@@ -769,103 +826,3 @@ with st.sidebar:
     st.info(f"🔗 **URL:** {get_server_url()}")
     st.markdown("---")
     st.markdown("**📝 Nota:** Este sistema usa sempre a porta 8507 para evitar confusão.")
-
-
-def indexar_por_referencia(caminho_diretorio):
-    """
-    🔗 NOVA FUNCIONALIDADE: Indexação por referência
-    Indexa arquivos diretamente de seus locais originais sem copiá-los
-    """
-    import traceback
-    
-    try:
-        print(f"DEBUG: Iniciando indexação por referência de: {caminho_diretorio}")
-        
-        # Verificar se o diretório existe
-        if not os.path.exists(caminho_diretorio):
-            print(f"DEBUG: Diretório não encontrado: {caminho_diretorio}")
-            return None, None
-            
-        print(f"DEBUG: Diretório encontrado: {caminho_diretorio}")
-        
-        # Buscar todos os arquivos válidos recursivamente
-        import glob
-        arquivos_validos = []
-        extensoes_video = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
-        extensoes_validas = ['.txt', '.pdf', '.docx', '.doc', '.md', '.rtf', '.odt']
-        
-        # Buscar recursivamente em todas as subpastas
-        for extensao in extensoes_validas:
-            pattern = os.path.join(caminho_diretorio, "**", f"*{extensao}")
-            arquivos_encontrados = glob.glob(pattern, recursive=True)
-            arquivos_validos.extend(arquivos_encontrados)
-        
-        # Filtrar arquivos de vídeo
-        arquivos_finais = []
-        for arquivo in arquivos_validos:
-            if os.path.isfile(arquivo):
-                extensao = os.path.splitext(arquivo)[1].lower()
-                if extensao not in extensoes_video:
-                    arquivos_finais.append(arquivo)
-                else:
-                    print(f"DEBUG: Pulando arquivo de vídeo: {os.path.basename(arquivo)}")
-        
-        print(f"DEBUG: {len(arquivos_finais)} arquivos válidos encontrados para indexação")
-        
-        if not arquivos_finais:
-            print("DEBUG: Nenhum arquivo válido encontrado para indexação")
-            return None, None
-        
-        # Mostrar alguns arquivos que serão indexados
-        print("DEBUG: Primeiros arquivos a serem indexados:")
-        for i, arquivo in enumerate(arquivos_finais[:5]):
-            print(f"  {i+1}. {os.path.basename(arquivo)}")
-        if len(arquivos_finais) > 5:
-            print(f"  ... e mais {len(arquivos_finais) - 5} arquivos")
-        
-        # 🔗 INDEXAÇÃO POR REFERÊNCIA: Carregar documentos diretamente dos arquivos originais
-        print("DEBUG: Carregando documentos por referência...")
-        documents = SimpleDirectoryReader(input_files=arquivos_finais).load_data()
-        
-        if not documents:
-            print(f"DEBUG: Nenhum documento carregado do diretório: {caminho_diretorio}")
-            return None, None
-            
-        print(f"DEBUG: {len(documents)} documentos carregados com sucesso por referência!")
-        
-        # Criar índice
-        print("DEBUG: Criando índice vetorial...")
-        index = VectorStoreIndex.from_documents(documents)
-        
-        # Criar query engine
-        print("DEBUG: Criando query engine...")
-        query_engine = index.as_query_engine()
-        
-        # 🧠 Criar ChatEngine com memória conversacional
-        print("DEBUG: Criando ChatEngine com memória conversacional...")
-        memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
-        chat_engine = index.as_chat_engine(
-            chat_mode="context",
-            memory=memory,
-            system_prompt=(
-                f"Você é o AFI (Assistente Finiti Inteligente), um assistente especializado em engenharia, "
-                f"construção e equipamentos da empresa Finiti. Você tem acesso à base de conhecimento da empresa "
-                f"localizada em '{caminho_diretorio}' e pode manter conversas contextuais. "
-                f"Sempre se lembre do contexto anterior da conversa. "
-                f"Quando o usuário se referir a 'isso', 'aquilo', ou usar pronomes, considere o contexto da conversa anterior."
-            )
-        )
-        
-        print("DEBUG: Indexação por referência concluída com sucesso!")
-        return query_engine, chat_engine
-        
-    except Exception as e:
-        # DIAGNÓSTICO DETALHADO
-        print("=" * 60)
-        print("--- ERRO DETALHADO NA INDEXAÇÃO POR REFERÊNCIA ---")
-        print(f"Tipo do erro: {type(e).__name__}")
-        print(f"Mensagem: {str(e)}")
-        print("Traceback completo:")
-        traceback.print_exc()
-        print("=" * 60)
-        return None, None
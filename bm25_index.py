@@ -0,0 +1,353 @@
+"""
+🔎 AFI v4.0 - Busca Híbrida (BM25 + Vetorial)
+Índice invertido persistente e fusão por Reciprocal Rank Fusion
+
+Modelos e códigos de peça ("AIRLESS 1095", "FT-210") quase não pesam na busca
+densa. Este módulo mantém um índice invertido BM25 dos mesmos chunks do
+VectorStoreIndex, salvo junto com ele, e um retriever que funde as duas listas.
+Quando a pergunta traz códigos exatos e a busca lexical já os encontra, a
+resposta sai só do índice invertido, sem embedding da consulta.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+import unicodedata
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import ANSWER_CACHE_CONFIG, HYBRID_CONFIG
+
+try:
+    from llama_index.core.retrievers import BaseRetriever
+    from llama_index.core.schema import NodeWithScore, QueryBundle
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+ARQUIVO_BM25 = "bm25.json"
+
+# Palavras muito frequentes em português que não ajudam a ranquear
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "da", "do", "das", "dos",
+    "e", "em", "no", "na", "nos", "nas", "por", "para", "pra", "com", "sem", "que",
+    "qual", "quais", "se", "ao", "aos", "ou", "mais", "como", "sao", "ser",
+    "foi", "tem", "ter", "me", "meu", "minha", "voce", "isso", "esse", "essa", "este",
+    "esta", "sobre", "quanto", "quando", "onde", "the", "of", "and",
+}
+
+_RE_TOKEN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos ("Pressão" → "pressao")"""
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Quebra o texto em termos para o índice invertido
+
+    Códigos como "FT-210" ou "1.095" são mantidos inteiros e também quebrados
+    nas partes, para casar tanto "ft-210" quanto "210".
+    """
+    termos = []
+    for token in _RE_TOKEN.findall(normalizar(texto)):
+        if token in STOPWORDS:
+            continue
+        termos.append(token)
+        if any(sep in token for sep in "-./"):
+            termos.extend(p for p in re.split(r"[-./]", token) if p and p not in STOPWORDS)
+    return termos
+
+
+def termos_exatos(texto: str) -> List[str]:
+    """Termos com dígitos (modelos, códigos de peça, referências)"""
+    return sorted({t for t in _RE_TOKEN.findall(normalizar(texto)) if any(c.isdigit() for c in t)})
+
+
+class IndiceBM25:
+    """
+    📚 Índice invertido com pontuação Okapi BM25
+
+    ``postings[termo][node_id] = frequência``; o comprimento de cada chunk fica
+    em ``tamanhos`` para a normalização do BM25.
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = k1 if k1 is not None else HYBRID_CONFIG["bm25_k1"]
+        self.b = b if b is not None else HYBRID_CONFIG["bm25_b"]
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.tamanhos: Dict[str, int] = {}
+        self._soma_tamanhos = 0
+
+    def __len__(self) -> int:
+        return len(self.tamanhos)
+
+    def adicionar(self, node_id: str, texto: str):
+        """Indexa (ou reindexa) um chunk"""
+        if node_id in self.tamanhos:
+            self.remover(node_id)
+        termos = tokenizar(texto)
+        self.tamanhos[node_id] = len(termos)
+        self._soma_tamanhos += len(termos)
+        for termo, freq in Counter(termos).items():
+            self.postings.setdefault(termo, {})[node_id] = freq
+
+    def remover(self, node_id: str):
+        """Remove um chunk do índice"""
+        tamanho = self.tamanhos.pop(node_id, None)
+        if tamanho is None:
+            return
+        self._soma_tamanhos -= tamanho
+        for termo in list(self.postings):
+            docs = self.postings[termo]
+            if docs.pop(node_id, None) is not None and not docs:
+                del self.postings[termo]
+
+    def buscar(self, consulta: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Retorna os ``top_k`` chunks de maior pontuação BM25
+
+        Returns:
+            List[Tuple[str, float]]: (node_id, pontuação), em ordem decrescente
+        """
+        total = len(self.tamanhos)
+        if not total:
+            return []
+        media = self._soma_tamanhos / total or 1.0
+
+        pontuacao: Dict[str, float] = {}
+        for termo in set(tokenizar(consulta)):
+            docs = self.postings.get(termo)
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for node_id, freq in docs.items():
+                norma = self.k1 * (1 - self.b + self.b * self.tamanhos[node_id] / media)
+                pontuacao[node_id] = pontuacao.get(node_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norma)
+
+        return sorted(pontuacao.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def contem_termos(self, node_id: str, termos: List[str]) -> bool:
+        return all(node_id in self.postings.get(termo, {}) for termo in termos)
+
+    def salvar(self, caminho: str):
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({"k1": self.k1, "b": self.b, "tamanhos": self.tamanhos,
+                       "postings": self.postings}, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "IndiceBM25":
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        indice = cls(k1=dados["k1"], b=dados["b"])
+        indice.tamanhos = dados["tamanhos"]
+        indice.postings = dados["postings"]
+        indice._soma_tamanhos = sum(indice.tamanhos.values())
+        return indice
+
+    @classmethod
+    def de_indice_vetorial(cls, index) -> "IndiceBM25":
+        """Monta o índice invertido com os mesmos chunks de um VectorStoreIndex"""
+        indice = cls()
+        for node_id in index.index_struct.nodes_dict.values():
+            node = index.docstore.get_node(node_id, raise_error=False)
+            if node is not None:
+                indice.adicionar(node.node_id, node.get_content())
+        return indice
+
+
+# Índice BM25 de cada VectorStoreIndex vivo no processo
+_bm25_por_indice = weakref.WeakKeyDictionary()
+
+
+def registrar_indice_bm25(index, bm25: IndiceBM25):
+    _bm25_por_indice[index] = bm25
+
+
+def descartar_indice_bm25(index):
+    """Invalida o BM25 de um índice que teve nós inseridos/removidos"""
+    _bm25_por_indice.pop(index, None)
+
+
+def obter_indice_bm25(index) -> IndiceBM25:
+    """Retorna o BM25 associado ao índice, montando a partir do docstore se preciso"""
+    bm25 = _bm25_por_indice.get(index)
+    if bm25 is None or len(bm25) != len(index.index_struct.nodes_dict):
+        bm25 = IndiceBM25.de_indice_vetorial(index)
+        _bm25_por_indice[index] = bm25
+    return bm25
+
+
+def fundir_rrf(listas: List[List[str]], k: int) -> List[Tuple[str, float]]:
+    """Reciprocal Rank Fusion: soma 1 / (k + posição) de cada lista"""
+    pontuacao: Dict[str, float] = {}
+    for lista in listas:
+        for posicao, node_id in enumerate(lista, start=1):
+            pontuacao[node_id] = pontuacao.get(node_id, 0.0) + 1.0 / (k + posicao)
+    return sorted(pontuacao.items(), key=lambda item: item[1], reverse=True)
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class RetrieverHibrido(BaseRetriever):
+        """
+        🔀 Retriever que funde BM25 e busca vetorial
+
+        Só os ``top_k`` chunks fundidos vão para o prompt.
+        """
+
+        def __init__(self, index, bm25: Optional[IndiceBM25] = None, top_k: Optional[int] = None,
+                     candidatos: Optional[int] = None):
+            super().__init__()
+            self._top_k = top_k or HYBRID_CONFIG["top_k"]
+            self._candidatos = candidatos or HYBRID_CONFIG["candidatos"]
+            self._index = index
+            self._bm25 = bm25 or obter_indice_bm25(index)
+            self._vetorial = index.as_retriever(similarity_top_k=self._candidatos)
+            self.consultas_lexicas = 0
+            self.consultas_hibridas = 0
+
+        def _retrieve(self, query_bundle: "QueryBundle") -> List["NodeWithScore"]:
+            consulta = query_bundle.query_str
+            lexicos = self._bm25.buscar(consulta, self._candidatos)
+
+            # Atalho: códigos exatos já encontrados pelo índice invertido
+            exatos = termos_exatos(consulta)
+            if exatos and lexicos:
+                com_todos = [(node_id, s) for node_id, s in lexicos if self._bm25.contem_termos(node_id, exatos)]
+                if com_todos:
+                    self.consultas_lexicas += 1
+                    return self._montar(com_todos[:self._top_k])
+
+            self.consultas_hibridas += 1
+            vetoriais = self._vetorial.retrieve(query_bundle)
+            nos_vetoriais = {n.node.node_id: n.node for n in vetoriais}
+            fundidos = fundir_rrf(
+                [[node_id for node_id, _ in lexicos], [n.node.node_id for n in vetoriais]],
+                HYBRID_CONFIG["rrf_k"],
+            )
+            return self._montar(fundidos[:self._top_k], nos_vetoriais)
+
+        def _montar(self, pontuados, nos_conhecidos=None) -> List["NodeWithScore"]:
+            nos_conhecidos = nos_conhecidos or {}
+            resultado = []
+            for node_id, score in pontuados:
+                node = nos_conhecidos.get(node_id) or self._index.docstore.get_node(node_id, raise_error=False)
+                if node is not None:
+                    resultado.append(NodeWithScore(node=node, score=score))
+            return resultado
+
+
+    class RetrieverFanOut(BaseRetriever):
+        """
+        🌐 Consulta vários shards em paralelo e funde os resultados
+
+        Cada shard (uma pasta da base de conhecimento) tem seu RetrieverHibrido.
+        Os shards rodam ao mesmo tempo, então a latência acompanha o maior shard
+        e não o corpus inteiro. As pontuações de shards diferentes não são
+        comparáveis entre si, por isso a fusão é por posição (RRF).
+        """
+
+        def __init__(self, retrievers: Sequence[BaseRetriever], embed_model=None, top_k: Optional[int] = None):
+            super().__init__()
+            self._retrievers = list(retrievers)
+            self._embed_model = embed_model
+            self._top_k = top_k or HYBRID_CONFIG["top_k"]
+
+        def _retrieve(self, query_bundle: "QueryBundle") -> List["NodeWithScore"]:
+            if (self._embed_model is not None and query_bundle.embedding is None
+                    and not termos_exatos(query_bundle.query_str)):
+                # Sem códigos exatos todos os shards vão à busca vetorial: uma única
+                # embedding da pergunta serve para todos
+                query_bundle = QueryBundle(
+                    query_str=query_bundle.query_str,
+                    embedding=self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs),
+                )
+
+            listas = list(_obter_pool_shards().map(lambda r: r.retrieve(query_bundle), self._retrievers))
+
+            nos, bm25_do_no = {}, {}
+            for retriever, lista in zip(self._retrievers, listas):
+                for n in lista:
+                    nos.setdefault(n.node.node_id, n.node)
+                    bm25_do_no.setdefault(n.node.node_id, getattr(retriever, "_bm25", None))
+            fundidos = fundir_rrf([[n.node.node_id for n in lista] for lista in listas], HYBRID_CONFIG["rrf_k"])
+
+            exatos = termos_exatos(query_bundle.query_str)
+            if exatos:
+                # O 1º lugar de um shard sem o código pedido não pode passar à frente
+                # de um chunk que tem o código (a fusão por posição empataria os dois)
+                def _tem_codigo(node_id):
+                    bm25 = bm25_do_no[node_id]
+                    return bm25 is not None and bm25.contem_termos(node_id, exatos)
+                fundidos.sort(key=lambda item: not _tem_codigo(item[0]))
+
+            return [NodeWithScore(node=nos[node_id], score=score) for node_id, score in fundidos[:self._top_k]]
+
+
+_pool_shards = None
+_pool_shards_lock = threading.Lock()
+
+
+def _obter_pool_shards() -> ThreadPoolExecutor:
+    """Pool compartilhado pelas consultas aos shards (criado sob demanda)"""
+    global _pool_shards
+    with _pool_shards_lock:
+        if _pool_shards is None:
+            _pool_shards = ThreadPoolExecutor(
+                max_workers=HYBRID_CONFIG["shards_workers"], thread_name_prefix="afi-shard"
+            )
+        return _pool_shards
+
+
+def _montar_retriever(indices):
+    """RetrieverHibrido de um índice, ou RetrieverFanOut sobre vários (um por shard)"""
+    if not isinstance(indices, (list, tuple)):
+        return RetrieverHibrido(indices)
+    if len(indices) == 1:
+        return RetrieverHibrido(indices[0])
+    return RetrieverFanOut([RetrieverHibrido(index) for index in indices], embed_model=indices[0]._embed_model)
+
+
+def criar_query_engine_hibrido(indices):
+    """Query engine usando o RetrieverHibrido (com cache de respostas)
+
+    Args:
+        indices: Um VectorStoreIndex ou uma lista deles (um por shard)
+    """
+    from llama_index.core.query_engine import RetrieverQueryEngine
+    from answer_cache import QueryEngineComCache, versao_indices
+
+    query_engine = RetrieverQueryEngine.from_args(_montar_retriever(indices))
+    if not ANSWER_CACHE_CONFIG["habilitado"]:
+        return query_engine
+    return QueryEngineComCache(query_engine, versao_indices(indices))
+
+
+def criar_chat_engine_hibrido(indices, memory, system_prompt: str):
+    """Chat engine (modo "context") usando o RetrieverHibrido (com cache de respostas)
+
+    Args:
+        indices: Um VectorStoreIndex ou uma lista deles (um por shard)
+    """
+    from llama_index.core.chat_engine import ContextChatEngine
+    from answer_cache import ChatEngineComCache, RetrieverReaproveitavel, versao_indices
+
+    retriever = RetrieverReaproveitavel(_montar_retriever(indices))
+    chat_engine = ContextChatEngine.from_defaults(
+        retriever=retriever,
+        memory=memory,
+        system_prompt=system_prompt,
+    )
+    if not ANSWER_CACHE_CONFIG["habilitado"]:
+        return chat_engine
+    return ChatEngineComCache(chat_engine, retriever, versao_indices(indices))
@@ -0,0 +1,410 @@
+"""
+✂️ AFI v4.0 - Chunking por Seções e Sentenças
+Divisão dos documentos em chunks conforme ``RAG_CONFIG``
+
+Os manuais e catálogos da Finiti são organizados em títulos ("=== FRESADORAS
+===", "ESPECIFICAÇÕES TÉCNICAS:", "## Manutenção") seguidos de listas e frases
+curtas. O chunker respeita essa estrutura: uma seção que cabe inteira num
+chunk nunca é partida, seções pequenas vizinhas são agrupadas e seções grandes
+são cortadas entre sentenças, com sobreposição só dentro da mesma seção. O
+caminho de títulos de cada chunk vai para o metadado ``secao``.
+
+Os tamanhos (``chunk_size``/``chunk_overlap``) são medidos em tokens
+aproximados (palavras e sinais de pontuação), sem depender de tokenizer.
+
+Uso do relatório (sem embedar nada):
+    python chunker.py memoria --chunk-size 512 --chunk-overlap 64
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from config import RAG_CONFIG
+
+try:
+    from llama_index.core.node_parser.interface import NodeParser
+    from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+    from llama_index.core.schema import MetadataMode
+    from llama_index.core.bridge.pydantic import Field
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+# Muda quando o algoritmo muda (entra na assinatura dos índices salvos)
+VERSAO_CHUNKER = 1
+
+SEPARADOR_TITULOS = " > "
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_FIM_SENTENCA = re.compile(r"[.!?…]+[\"'”’)\]]*\s+")
+_ULTIMA_PALAVRA = re.compile(r"(\S+)$")
+_ITEM_LISTA = re.compile(r"^\s*([-–•*▪●]|\d{1,3}[.)]\s|[a-z][)]\s)")
+_TITULO_MARKDOWN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+_TITULO_CERCADO = re.compile(r"^[=\-*#]{2,}\s*(.+?)\s*[=\-*#]{2,}$")
+_SUBLINHADO = re.compile(r"^\s*(=+|-+)\s*$")
+_TITULO_NUMERADO = re.compile(r"^\d+(\.\d+)*\.?\s+[A-ZÀ-Ý]")
+
+# Abreviações comuns em manuais e propostas em português (o ponto não encerra a frase)
+ABREVIACOES = {
+    "sr", "sra", "srs", "dr", "dra", "eng", "prof", "av", "r", "nº", "n", "no", "núm",
+    "tel", "cel", "ltda", "cia", "etc", "ex", "p", "pg", "pág", "págs", "fig", "figs",
+    "tab", "obs", "ref", "aprox", "máx", "max", "mín", "min", "art", "cap", "vol",
+    "ed", "un", "unid", "pç", "pçs", "qtd", "kg", "mod", "esp", "id", "vs", "s.a",
+}
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens aproximados: palavras e sinais de pontuação"""
+    return len(_TOKEN.findall(texto))
+
+
+def _nivel_titulo(linha: str, proxima: str = "") -> Tuple[int, str]:
+    """
+    Identifica se a linha é um título
+
+    Returns:
+        Tuple[int, str]: (nível, título) — nível 0 quando não é título
+    """
+    texto = linha.strip()
+    if not texto or len(texto) > 100:
+        return 0, ""
+
+    md = _TITULO_MARKDOWN.match(texto)
+    if md:
+        return len(md.group(1)), md.group(2)
+    cercado = _TITULO_CERCADO.match(texto)
+    if cercado and not _SUBLINHADO.match(texto):
+        return 1, cercado.group(1)
+    sublinhado = _SUBLINHADO.match(proxima)
+    if sublinhado and proxima.strip() and not _ITEM_LISTA.match(texto):
+        return (1 if sublinhado.group(1).startswith("=") else 2), texto
+
+    if _ITEM_LISTA.match(texto) and not _TITULO_NUMERADO.match(texto):
+        return 0, ""
+    letras = [c for c in texto if c.isalpha()]
+    if len(letras) < 3:
+        return 0, ""
+    # "ESPECIFICAÇÕES TÉCNICAS:" / "ALISADORA FT36" / "3.2 MANUTENÇÃO PREVENTIVA"
+    if not any(c.islower() for c in letras) and not texto.endswith((".", ";", ",")):
+        return 3, texto.rstrip(":").strip()
+    # "Manutenção preventiva:" sozinha na linha
+    if texto.endswith(":") and len(texto) <= 60 and texto[0].isupper() and texto.count(" ") <= 6:
+        return 4, texto.rstrip(":").strip()
+    return 0, ""
+
+
+def dividir_sentencas(texto: str) -> List[str]:
+    """Divide um parágrafo em sentenças sem cortar em abreviações, decimais ou siglas"""
+    sentencas = []
+    inicio = 0
+    for fim in _FIM_SENTENCA.finditer(texto):
+        anterior = _ULTIMA_PALAVRA.search(texto[inicio:fim.start()])
+        palavra = anterior.group(1).lower().strip("(\"'“") if anterior else ""
+        seguinte = texto[fim.end():fim.end() + 1]
+        if fim.group(0).startswith(".") and (palavra in ABREVIACOES or len(palavra) == 1):
+            continue
+        if seguinte and seguinte.islower():
+            continue
+        sentencas.append(texto[inicio:fim.end()].strip())
+        inicio = fim.end()
+    resto = texto[inicio:].strip()
+    if resto:
+        sentencas.append(resto)
+    return sentencas
+
+
+@dataclass
+class _Unidade:
+    texto: str
+    tokens: int
+    nova_linha: bool
+
+
+@dataclass
+class Trecho:
+    """Um chunk pronto: texto, caminho de títulos e tamanho em tokens"""
+
+    texto: str
+    secao: str
+    tokens: int
+
+
+def dividir_secoes(texto: str, por_titulos: bool = True) -> List[Tuple[str, List[_Unidade]]]:
+    """
+    Separa o texto em seções (caminho de títulos, unidades)
+
+    Cada unidade é uma sentença ou item de lista. Linhas quebradas no meio da
+    frase (comum em PDF) são religadas antes da divisão em sentenças.
+    """
+    linhas = texto.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    secoes: List[Tuple[str, List[_Unidade]]] = []
+    caminho: List[Tuple[int, str]] = []
+    unidades: List[_Unidade] = []
+    blocos: List[str] = []
+
+    def _fechar_bloco():
+        for bloco in blocos:
+            for posicao, sentenca in enumerate(dividir_sentencas(bloco)):
+                unidades.append(_Unidade(sentenca, contar_tokens(sentenca), posicao == 0))
+        blocos.clear()
+
+    def _fechar_secao():
+        _fechar_bloco()
+        if unidades:
+            secoes.append((SEPARADOR_TITULOS.join(t for _, t in caminho), list(unidades)))
+            unidades.clear()
+
+    i = 0
+    while i < len(linhas):
+        linha = linhas[i].rstrip()
+        proxima = linhas[i + 1] if i + 1 < len(linhas) else ""
+        if not linha.strip() or _SUBLINHADO.match(linha):
+            _fechar_bloco()
+            i += 1
+            continue
+
+        nivel, titulo = _nivel_titulo(linha, proxima) if por_titulos else (0, "")
+        if nivel:
+            _fechar_secao()
+            while caminho and caminho[-1][0] >= nivel:
+                caminho.pop()
+            caminho.append((nivel, titulo))
+            unidades.append(_Unidade(linha.strip(), contar_tokens(linha), True))
+        elif (blocos and not _ITEM_LISTA.match(linha) and linha.lstrip()[:1].islower()
+              and not blocos[-1].endswith((".", "!", "?", ":", ";"))):
+            # Continuação de uma frase quebrada na linha anterior
+            blocos[-1] = f"{blocos[-1]} {linha.strip()}"
+        else:
+            blocos.append(linha.strip())
+        i += 1
+
+    _fechar_secao()
+    return secoes
+
+
+def _juntar(unidades: Sequence[_Unidade]) -> str:
+    partes = []
+    for unidade in unidades:
+        if partes:
+            partes.append("\n" if unidade.nova_linha else " ")
+        partes.append(unidade.texto)
+    return "".join(partes)
+
+
+def _partir_unidade(unidade: _Unidade, chunk_size: int) -> List[_Unidade]:
+    """Sentença maior que um chunk inteiro: cortada em pedaços de chunk_size tokens"""
+    posicoes = [m.start() for m in _TOKEN.finditer(unidade.texto)]
+    pedacos = []
+    for inicio in range(0, len(posicoes), chunk_size):
+        fim = posicoes[inicio + chunk_size] if inicio + chunk_size < len(posicoes) else len(unidade.texto)
+        texto = unidade.texto[posicoes[inicio]:fim].strip()
+        pedacos.append(_Unidade(texto, contar_tokens(texto), unidade.nova_linha and inicio == 0))
+    return pedacos
+
+
+def dividir_texto(texto: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                  por_titulos: Optional[bool] = None) -> List[Trecho]:
+    """
+    Divide um documento em chunks
+
+    Args:
+        chunk_size: Tokens máximos por chunk (padrão: RAG_CONFIG["chunk_size"])
+        chunk_overlap: Tokens repetidos entre chunks seguidos da mesma seção
+        por_titulos: Usar os títulos como fronteiras preferenciais
+
+    Returns:
+        List[Trecho]: Chunks na ordem do documento
+    """
+    chunk_size = chunk_size or RAG_CONFIG["chunk_size"]
+    chunk_overlap = RAG_CONFIG["chunk_overlap"] if chunk_overlap is None else chunk_overlap
+    por_titulos = RAG_CONFIG.get("chunk_por_titulos", True) if por_titulos is None else por_titulos
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) precisa ser menor que chunk_size ({chunk_size})")
+
+    trechos: List[Trecho] = []
+    atual: List[_Unidade] = []
+    secao_atual = ""
+    tokens_atual = 0
+    # Unidades do chunk atual que já vieram do anterior (sobreposição)
+    repetidas = 0
+
+    def _emitir():
+        nonlocal atual, tokens_atual, repetidas
+        if len(atual) > repetidas:
+            trechos.append(Trecho(_juntar(atual), secao_atual, tokens_atual))
+        atual, tokens_atual, repetidas = [], 0, 0
+
+    for secao, unidades in dividir_secoes(texto, por_titulos):
+        tokens_secao = sum(u.tokens for u in unidades)
+        if atual and tokens_atual + tokens_secao > chunk_size:
+            # A seção não cabe no que sobrou: começa em chunk novo (sem sobreposição entre seções)
+            _emitir()
+        if not atual:
+            secao_atual = secao
+        elif tokens_atual + tokens_secao <= chunk_size:
+            # Seções pequenas vizinhas dividem o mesmo chunk
+            atual.append(_Unidade(_juntar(unidades), tokens_secao, True))
+            tokens_atual += tokens_secao
+            continue
+
+        for unidade in unidades:
+            for pedaco in (_partir_unidade(unidade, chunk_size) if unidade.tokens > chunk_size else [unidade]):
+                if atual and tokens_atual + pedaco.tokens > chunk_size:
+                    anterior = atual
+                    _emitir()
+                    # Sobreposição: últimas unidades do chunk anterior que cabem no overlap
+                    limite = min(chunk_overlap, chunk_size - pedaco.tokens)
+                    for repetida in reversed(anterior):
+                        if tokens_atual + repetida.tokens > limite:
+                            break
+                        atual.insert(0, repetida)
+                        tokens_atual += repetida.tokens
+                    repetidas = len(atual)
+                    secao_atual = secao
+                atual.append(pedaco)
+                tokens_atual += pedaco.tokens
+
+    _emitir()
+    return trechos
+
+
+def assinatura_chunking() -> str:
+    """Identifica a configuração de chunking (parte da assinatura dos índices salvos)"""
+    return (f"chunker-v{VERSAO_CHUNKER}|{RAG_CONFIG['chunk_size']}|{RAG_CONFIG['chunk_overlap']}"
+            f"|{'titulos' if RAG_CONFIG.get('chunk_por_titulos', True) else 'sentencas'}")
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class ChunkerAFI(NodeParser):
+        """
+        🔪 NodeParser do LlamaIndex sobre ``dividir_texto``
+
+        Entra no lugar do ``Settings.node_parser`` e é aplicado por todos os
+        construtores de índice (``inserir_documentos_em_lotes``).
+        """
+
+        chunk_size: int = Field(default=1000, gt=0, description="Tokens máximos por chunk")
+        chunk_overlap: int = Field(default=200, ge=0, description="Tokens repetidos entre chunks")
+        por_titulos: bool = Field(default=True, description="Títulos como fronteiras de chunk")
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "ChunkerAFI"
+
+        def _parse_nodes(self, nodes, show_progress: bool = False, **kwargs: Any) -> List:
+            resultado = []
+            for node in nodes:
+                trechos = dividir_texto(node.get_content(metadata_mode=MetadataMode.NONE),
+                                        self.chunk_size, self.chunk_overlap, self.por_titulos)
+                novos = build_nodes_from_splits([t.texto for t in trechos], node, id_func=self.id_func)
+                for novo, trecho in zip(novos, trechos):
+                    if trecho.secao:
+                        novo.metadata["secao"] = trecho.secao
+                resultado.extend(novos)
+            return resultado
+
+
+def criar_chunker():
+    """Chunker configurado por ``RAG_CONFIG`` (para ``Settings.node_parser``)"""
+    return ChunkerAFI(
+        chunk_size=RAG_CONFIG["chunk_size"],
+        chunk_overlap=RAG_CONFIG["chunk_overlap"],
+        por_titulos=RAG_CONFIG.get("chunk_por_titulos", True),
+    )
+
+
+def _percentil(valores: Sequence[int], p: float) -> int:
+    if not valores:
+        return 0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def relatorio_chunking(textos: Sequence[Tuple[str, str]], chunk_size: Optional[int] = None,
+                       chunk_overlap: Optional[int] = None, por_titulos: Optional[bool] = None) -> dict:
+    """
+    📊 Simulação do chunking, sem embedding
+
+    Args:
+        textos: Pares (nome do arquivo, texto)
+
+    Returns:
+        dict: Quantidade de chunks, distribuição de tokens e custo da sobreposição
+    """
+    tamanhos: List[int] = []
+    por_arquivo = {}
+    tokens_originais = 0
+    for nome, texto in textos:
+        trechos = dividir_texto(texto, chunk_size, chunk_overlap, por_titulos)
+        por_arquivo[nome] = por_arquivo.get(nome, 0) + len(trechos)
+        tamanhos.extend(t.tokens for t in trechos)
+        tokens_originais += contar_tokens(texto)
+
+    chunk_size = chunk_size or RAG_CONFIG["chunk_size"]
+    faixas = [chunk_size // 4, chunk_size // 2, (chunk_size * 3) // 4, chunk_size]
+    histograma = {}
+    anterior = 0
+    for limite in faixas:
+        histograma[f"{anterior + 1}-{limite}"] = sum(1 for t in tamanhos if anterior < t <= limite)
+        anterior = limite
+    tokens_indexados = sum(tamanhos)
+
+    return {
+        'chunk_size': chunk_size,
+        'chunk_overlap': RAG_CONFIG["chunk_overlap"] if chunk_overlap is None else chunk_overlap,
+        'documentos': len(textos),
+        'chunks': len(tamanhos),
+        'tokens_min': min(tamanhos) if tamanhos else 0,
+        'tokens_p50': _percentil(tamanhos, 0.5),
+        'tokens_p95': _percentil(tamanhos, 0.95),
+        'tokens_max': max(tamanhos) if tamanhos else 0,
+        'tokens_medio': round(tokens_indexados / len(tamanhos), 1) if tamanhos else 0.0,
+        'histograma_tokens': histograma,
+        # Quanto a sobreposição e os títulos repetidos aumentam o texto embedado
+        'fator_sobreposicao': round(tokens_indexados / tokens_originais, 3) if tokens_originais else 0.0,
+        'chunks_por_arquivo': por_arquivo,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description="Relatório do chunking da base do AFI (sem embedding).")
+    parser.add_argument("caminhos", nargs="+", help="Pastas ou arquivos a simular")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    parser.add_argument("--sem-titulos", action="store_true", help="Dividir só por sentenças")
+    args = parser.parse_args(argv)
+    if args.chunk_size is not None and args.chunk_size <= 0:
+        parser.error("--chunk-size precisa ser positivo")
+    if args.chunk_size is not None and args.chunk_overlap is None:
+        # Sobreposição padrão (RAG_CONFIG) pensada para o chunk_size padrão: limitada a 1/5 do chunk
+        args.chunk_overlap = min(RAG_CONFIG["chunk_overlap"], args.chunk_size // 5)
+    chunk_size = args.chunk_size or RAG_CONFIG["chunk_size"]
+    if args.chunk_overlap is not None and not 0 <= args.chunk_overlap < chunk_size:
+        parser.error(f"--chunk-overlap ({args.chunk_overlap}) precisa ficar entre 0 e chunk_size ({chunk_size})")
+
+    from rag_index import listar_arquivos_referencia
+    from document_parser import ler_documentos_em_paralelo
+
+    arquivos = []
+    for caminho in args.caminhos:
+        arquivos.extend(listar_arquivos_referencia(caminho) if os.path.isdir(caminho) else [caminho])
+    if not arquivos:
+        print("Nenhum arquivo válido encontrado.")
+        return 1
+
+    textos = [(os.path.basename(d.metadata.get("file_path", "")), d.text)
+              for d in ler_documentos_em_paralelo(arquivos)]
+    relatorio = relatorio_chunking(textos, args.chunk_size, args.chunk_overlap,
+                                   False if args.sem_titulos else None)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
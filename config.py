@@ -1,6 +1,8 @@
 # Configurações do Sistema AFI v3.0
 # Este arquivo define as configurações padrão do sistema
 
+from environment import load_settings
+
 # Configuração do Servidor
 SERVER_CONFIG = {
     "port": 8507,  # Porta padrão única para o frontend
@@ -18,8 +20,151 @@ FOLDERS_CONFIG = {
 # Configuração do RAG
 RAG_CONFIG = {
     "model_name": "sentence-transformers/all-MiniLM-L6-v2",
-    "chunk_size": 1000,
-    "chunk_overlap": 200
+    "chunk_size": 1000,  # Tokens aproximados por chunk (ver chunker.py)
+    "chunk_overlap": 200,  # Tokens repetidos entre chunks seguidos da mesma seção
+    "chunk_por_titulos": True,  # Títulos como fronteiras de chunk (False = só sentenças)
+    "embed_batch_size": 32,  # Chunks por forward pass do transformer
+    "embed_threads": None,  # None = padrão do PyTorch
+    "embed_ordenar_por_tamanho": True,  # Lotes com textos de tamanho parecido (menos padding)
+    "embed_janela_ordenacao": 256  # Quantos chunks são ordenados juntos antes de formar os lotes
+}
+
+# Configuração do Cache de Embeddings (vetores float16 em disco, LRU por modelo)
+EMBEDDING_CACHE_CONFIG = {
+    "pasta": "storage/embeddings_cache",
+    "tamanho_maximo_mb": 512
+}
+
+# Configuração do Servidor de Embeddings (um processo carrega o modelo para todos os clientes)
+EMBEDDING_SERVER_CONFIG = {
+    "habilitado": False,  # True = usar o servidor quando ele estiver no ar (python embedding_server.py)
+    "modelo": "BAAI/bge-small-en-v1.5",
+    "host": "127.0.0.1",
+    "porta": 8510,
+    "max_lote": 64,  # Textos juntados num forward pass
+    "janela_ms": 5,  # Espera por pedidos de outros clientes antes de rodar o lote
+    "timeout": 120
+}
+
+# Configuração do Vector Store (vetores quantizados em RAM + re-rank exato em float32)
+VECTOR_STORE_CONFIG = {
+    "formato": "int8",  # "float32" (SimpleVectorStore padrão), "float16" ou "int8"
+    "fator_rerank": 4,  # Candidatos reordenados com float32 = top_k x fator
+    "max_pendentes": 20000  # Cópias float32 de chunks ainda não salvos em RAM (acima disso, em arquivo temporário)
+}
+
+# Configuração da Busca Híbrida (BM25 + vetorial com Reciprocal Rank Fusion)
+HYBRID_CONFIG = {
+    "top_k": 4,  # Chunks que vão para o prompt
+    "candidatos": 10,  # Candidatos de cada busca antes da fusão
+    "rrf_k": 60,
+    "bm25_k1": 1.5,
+    "bm25_b": 0.75,
+    "shards_workers": 4  # Shards (pastas) consultados em paralelo
+}
+
+# Configuração do Cache de Respostas do RAG (SQLite, invalidado pela versão do índice)
+ANSWER_CACHE_CONFIG = {
+    "habilitado": True,
+    "arquivo": "storage/respostas_cache.sqlite",
+    "ttl_horas": 24,
+    "max_entradas": 5000,
+    "tamanho_maximo_mb": 50
+}
+
+# Configuração do Cache de Gerações do LLM (frases de marketing e outros prompts de modelo fixo)
+LLM_CACHE_CONFIG = {
+    "habilitado": True,
+    "arquivo": "storage/geracoes_cache.sqlite",
+    "max_entradas": 2000,
+    "tamanho_maximo_mb": 20,
+    "variantes_criativas": 5  # Frases diferentes acumuladas por prompt antes de só sortear entre elas
+}
+
+# Configuração do Estoque de Frases de Marketing (pré-geradas quando o Ollama está ocioso)
+FRASES_POOL_CONFIG = {
+    "habilitado": True,
+    "arquivo": "storage/frases_pool.sqlite",
+    "temperatura": 0.9,
+    "estoque_por_tipo": 6,
+    "intervalo_s": 60,  # Nova tentativa de reposição quando o Ollama estava ocupado ou fora
+    "concessao_s": 300,  # Por quanto tempo um processo fica como o único que repõe o estoque
+    "tipos": [  # estilo + limite de caracteres
+        {"estilo": "persuasiva", "max_caracteres": 80},  # Guardião
+        {"estilo": "impacto", "max_caracteres": 50},  # Estúdio de vídeo
+        {"estilo": "Rock", "max_caracteres": 30},  # Stories da integração de mídia, por estilo musical
+        {"estilo": "Pop", "max_caracteres": 30},
+        {"estilo": "Calma", "max_caracteres": 30},
+        {"estilo": "Eletronica", "max_caracteres": 30},
+        {"estilo": "Instrumental", "max_caracteres": 30}
+    ]
+}
+
+# Configuração do Cache Semântico (perguntas parecidas reaproveitam a resposta)
+SEMANTIC_CACHE_CONFIG = {
+    "habilitado": False,  # Opcional: ligar depois de calibrar o limiar com as estatísticas
+    "limiar_similaridade": 0.92,  # Cosseno mínimo entre as perguntas
+    "max_entradas": 2000,
+    "ttl_horas": 24,
+    "lsh_tabelas": 8,
+    "lsh_bits": 10
+}
+
+# Modelos do Ollama por papel (o único lugar com nomes de modelo)
+MODELS_CONFIG = {
+    "chat": "llava-llama3",  # Perguntas gerais, pesquisa web e streaming do chat
+    "rag": "llama3.2",  # LLM do LlamaIndex nas consultas à base de conhecimento
+    "visao": "llava-llama3",  # Descrição de imagens da memória
+    "marketing": "llava-llama3"  # Frases do guardião, do estúdio, da integração de mídia e do estoque
+}
+
+# Configuração da Residência dos Modelos (evita recarregar vários GB a cada troca ou pausa)
+MODEL_RESIDENCY_CONFIG = {
+    "habilitado": True,
+    "pre_carregar": ["chat", "rag"],  # Papéis carregados na inicialização
+    "fixados": ["chat"],  # Papéis mantidos sempre carregados (keep_alive -1)
+    "keep_alive": "30m",  # Demais modelos: tempo ocioso antes de o Ollama descarregar
+    "intervalo_s": 60,  # Consulta a /api/ps; fixados que saíram da memória são recarregados
+    "limiar_carga_fria_s": 1.0  # load_duration acima disso conta como carga fria
+}
+
+# Configuração do Cliente Ollama (sessão compartilhada com conexões keep-alive)
+OLLAMA_CONFIG = {
+    "url": load_settings(create_dirs=False).ollama_url,  # AFI_OLLAMA_URL (ex.: tools/fake_ollama.py)
+    "conexoes": 8,  # Conexões mantidas abertas no pool
+    "timeout_conexao": 3,
+    "timeouts": {  # Tempo máximo de leitura por endpoint
+        "/api/tags": 5,
+        "/api/ps": 5,
+        "/api/generate": 120,  # Vale também para o Settings.llm do RAG (app.py)
+        "padrao": 30
+    },
+    "tentativas": 3,  # Só falhas de conexão e 502/503/504 são repetidas
+    "espera_base_s": 0.25,  # Backoff exponencial com jitter entre tentativas
+    "espera_maxima_s": 2.0,
+    "intervalo_saude_s": 10,  # Verificação de /api/tags em segundo plano
+    "intervalo_saude_offline_s": 3,  # Mais frequente enquanto o Ollama está fora, para notar a volta
+    "ttl_saude_s": 30  # Estado mais velho que isso é verificado na hora
+}
+
+# Configuração do Gateway do LLM (fila com prioridade na frente do Ollama)
+LLM_GATEWAY_CONFIG = {
+    "max_concorrencia": 2,  # Gerações simultâneas no Ollama
+    "vagas_reservadas_interativas": 1,  # Vagas que estúdio e segundo plano nunca ocupam
+    "timeout_espera_s": 300  # Tempo máximo na fila antes de desistir
+}
+
+# Configuração do Roteador de Intenções do chat (regex compilada + classificador opcional)
+INTENT_ROUTER_CONFIG = {
+    "classificador": None,  # "modulo:funcao" chamada quando nenhuma palavra-chave casa (recebe o prompt em minúsculas)
+    "ttl_memoria_s": 30  # "memória tem arquivos" em cache; o file watcher invalida antes disso
+}
+
+# Configuração do Parsing de Documentos (pool de processos na frente do índice)
+PARSING_CONFIG = {
+    "workers": None,  # None = número de CPUs
+    "timeout_por_arquivo": 120,
+    "arquivo_quarentena": "storage/quarentena.json"
 }
 
 # Configuração de Logs
@@ -9,6 +9,14 @@ import json
 import os
 import traceback
 from pathlib import Path
+from typing import Optional
+
+from config import LLM_CACHE_CONFIG, MODELS_CONFIG
+from intent_router import (INTENCAO_IMAGEM, INTENCAO_PESQUISA, INTENCAO_PRODUTOS, INTENCAO_TRANSCRICAO,
+                           invalidar_cache_memoria, obter_estado_memoria, obter_roteador)
+from llm_gateway import (PRIORIDADE_ESTUDIO, PRIORIDADE_INTERATIVA, PRIORIDADE_SEGUNDO_PLANO,
+                         chave_geracao, obter_gateway_llm)
+from ollama_client import obter_monitor_ollama
 
 # Importações condicionais para funcionalidades multimodais
 try:
@@ -104,7 +112,7 @@ def transcrever_video(caminho_video: str) -> str:
 
 def descrever_imagem(caminho_imagem: str) -> str:
     """
-    Gera uma descrição de uma imagem usando llava-llama3 via Ollama.
+    Gera uma descrição de uma imagem usando o modelo de visão (MODELS_CONFIG) via Ollama.
     
     Args:
         caminho_imagem (str): Caminho para o arquivo de imagem
@@ -129,14 +137,14 @@ def descrever_imagem(caminho_imagem: str) -> str:
         
         # Preparar payload para Ollama
         payload = {
-            "model": "llava-llama3",
+            "model": MODELS_CONFIG["visao"],
             "prompt": "Descreva esta imagem de forma detalhada e técnica, focando em equipamentos, processos ou elementos relevantes para engenharia e construção.",
             "images": [encoded_string],
             "stream": False
         }
         
-        # Fazer requisição ao Ollama
-        response = requests.post("http://localhost:11434/api/generate", json=payload, timeout=60)
+        # Fazer requisição ao Ollama (descrição da memória não passa na frente do chat)
+        response = obter_gateway_llm().gerar_sync(payload, PRIORIDADE_SEGUNDO_PLANO)
         
         if response.status_code == 200:
             result = response.json()
@@ -151,12 +159,14 @@ def verificar_conexao_ollama():
     """
     Verifica se o servidor Ollama está rodando e acessível.
     
+    Lê o último estado do monitor de saúde (verificado em segundo plano),
+    sem requisição na hora da pergunta.
+    
     Returns:
         bool: True se conectado, False caso contrário
     """
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        return response.status_code == 200
+        return obter_monitor_ollama().esta_online()
     except:
         return False
 
@@ -171,6 +181,8 @@ def carregar_memoria(pasta_memoria="memoria"):
     Returns:
         str: Status do processamento
     """
+    # Transcrições e descrições novas mudam o conteúdo da pasta (roteador do chat)
+    invalidar_cache_memoria()
     if not os.path.exists(pasta_memoria):
         os.makedirs(pasta_memoria)
         return "Pasta de memória criada"
@@ -274,38 +286,118 @@ def pesquisar_na_web(query: str) -> str:
     except Exception as e:
         return f"❌ Erro na pesquisa web: {str(e)}"
 
-def processar_prompt_geral(prompt: str, query_engine=None):
+def _responder_com_cache_semantico(prompt: str, gerar, escopo: str) -> str:
+    """
+    Passa a geração pelo cache semântico (quando habilitado)
+
+    Args:
+        gerar: Função que retorna (resposta, pode_guardar)
+        escopo: Perguntas só casam com outras do mesmo escopo
+    """
+    from semantic_cache import obter_cache_semantico
+
+    cache = obter_cache_semantico()
+    if cache is None:
+        return gerar()[0]
+    return cache.responder(prompt, gerar, escopo)
+
+
+def _responder_com_cache_semantico_stream(prompt: str, gerar_stream, escopo: str):
+    """Como ``_responder_com_cache_semantico``, mas ``gerar_stream`` devolve um gerador de trechos"""
+    from semantic_cache import obter_cache_semantico
+
+    cache = obter_cache_semantico()
+    if cache is None:
+        return gerar_stream()
+    return cache.responder_stream(prompt, gerar_stream, escopo)
+
+
+def gerar_texto_cacheado(prompt: str, modelo: Optional[str] = None, prioridade: int = PRIORIDADE_SEGUNDO_PLANO,
+                         variantes: int = 1, opcoes: Optional[dict] = None) -> Optional[str]:
+    """
+    Geração direta no Ollama (sem o roteador) pelo cache persistente de gerações
+
+    Para prompts de modelo fixo (frases de marketing): o mesmo prompt não
+    paga outra geração. Com ``variantes`` > 1, acumula essa quantidade de
+    respostas diferentes e depois sorteia entre elas. O modelo padrão é o
+    de marketing em MODELS_CONFIG.
+
+    Returns:
+        str: Texto gerado (ou None se o modelo respondeu vazio)
+
+    Raises:
+        RuntimeError: Erro HTTP do Ollama (exceções do requests passam direto)
+    """
+    from llm_cache import obter_cache_geracoes
+
+    modelo = modelo or MODELS_CONFIG["marketing"]
+
+    def _gerar():
+        payload = {"model": modelo, "prompt": prompt, "stream": False}
+        if opcoes:
+            payload["options"] = opcoes
+        response = obter_gateway_llm().gerar_sync(payload, prioridade)
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro na API do Ollama: {response.status_code}")
+        return (response.json().get("response") or "").strip() or None
+
+    cache = obter_cache_geracoes()
+    if cache is None:
+        return _gerar()
+    return cache.gerar(modelo, prompt, _gerar, opcoes, variantes)
+
+
+def conversar(chat_engine, prompt: str, stream: bool = False, prioridade: int = PRIORIDADE_INTERATIVA):
+    """
+    Pergunta ao chat engine do RAG segurando uma vaga do gateway do LLM
+
+    O chat engine chama o Ollama pelo ``Settings.llm``, fora do gateway; a
+    vaga garante que o chat com memória também entre na fila de prioridades.
+
+    Returns:
+        Com ``stream=True``, gerador de trechos (a vaga fica presa até o fim do
+        stream); senão, o texto da resposta
+    """
+    if stream:
+        return obter_gateway_llm().iterar_com_vaga(lambda: chat_engine.stream_chat(prompt).response_gen, prioridade)
+    with obter_gateway_llm().vaga(prioridade):
+        return str(chat_engine.chat(prompt))
+
+
+def processar_prompt_geral(prompt: str, query_engine=None, stream: bool = False,
+                           prioridade: int = PRIORIDADE_INTERATIVA, versao_base: Optional[str] = None):
     """
     Roteador inteligente que analisa o prompt e direciona para a funcionalidade adequada
     
     Args:
         prompt (str): O prompt do usuário
         query_engine: Engine de consulta RAG configurado
+        stream (bool): Gerar as respostas do RAG e do Ollama geral token a token
+        prioridade (int): Classe na fila do gateway do LLM (chat, estúdio ou segundo plano)
+        versao_base (str): Versão da base que montou o query_engine (``BaseConhecimento.versao``);
+            sem ela as respostas do RAG não passam pelo cache semântico
     
     Returns:
-        str: Resposta processada pelo modelo adequado
+        str: Resposta processada pelo modelo adequado. Com ``stream=True``, as
+        respostas do RAG e do Ollama geral vêm como um gerador de trechos de
+        texto (ou str quando saem do cache semântico); as demais rotas sempre
+        devolvem str
     """
-    prompt_lower = prompt.lower()
+    # Uma passada de regex compilada decide a intenção (palavras-chave em intent_router.py)
+    rota = obter_roteador().rotear(prompt)
     
     # 1. Roteamento para transcrição de vídeo
-    palavras_transcricao = ['transcreva', 'transcrever', 'roteiro do vídeo', 'áudio do vídeo', 'fala do vídeo']
-    if any(palavra in prompt_lower for palavra in palavras_transcricao):
+    if rota.intencao == INTENCAO_TRANSCRICAO:
         return "Para transcrever vídeos, por favor faça upload do arquivo de vídeo através do gerenciador de memória na sidebar. O sistema processará automaticamente o áudio e criará a transcrição."
     
     # 2. Roteamento para geração de imagens
-    palavras_imagem = ['gere uma imagem', 'desenhe', 'crie uma imagem', 'gerar imagem', 'criar desenho']
-    if any(palavra in prompt_lower for palavra in palavras_imagem):
+    if rota.intencao == INTENCAO_IMAGEM:
         return "🎨 **Funcionalidade de Geração de Imagem em Desenvolvimento**\n\nEsta funcionalidade estará disponível em breve! Por enquanto, você pode:\n- Fazer upload de imagens para análise\n- Solicitar descrições de imagens existentes\n- Usar outras funcionalidades do AFI"
     
     # 3. Roteamento para pesquisa web em tempo real
-    palavras_pesquisa = ['pesquise sobre', 'notícias de', 'qual o preço atual de', 'quem é', 'o que é', 'pesquisar', 'buscar na internet', 'procurar na web']
-    if any(palavra in prompt_lower for palavra in palavras_pesquisa):
-        # Extrair termo de pesquisa do prompt
-        termo_pesquisa = prompt
-        for palavra in palavras_pesquisa:
-            if palavra in prompt_lower:
-                termo_pesquisa = prompt_lower.replace(palavra, '').strip()
-                break
+    if rota.intencao == INTENCAO_PESQUISA:
+        # Extrair termo de pesquisa do prompt (sem palavra-chave, intenção do classificador: o prompt inteiro)
+        termo_pesquisa = prompt.lower().replace(rota.palavra, '').strip() if rota.palavra else prompt
         
         # Realizar pesquisa web
         resultados_web = pesquisar_na_web(termo_pesquisa)
@@ -313,14 +405,13 @@ def processar_prompt_geral(prompt: str, query_engine=None):
         # Combinar resultados com análise do LLM
         try:
             if verificar_conexao_ollama():
-                import requests
                 payload = {
-                    "model": "llava-llama3",
+                    "model": MODELS_CONFIG["chat"],
                     "prompt": f"Com base nos seguintes resultados de pesquisa, forneça uma resposta completa e informativa para a pergunta: '{prompt}'\n\nResultados da pesquisa:\n{resultados_web}",
                     "stream": False
                 }
                 
-                response = requests.post("http://localhost:11434/api/generate", json=payload, timeout=60)
+                response = obter_gateway_llm().gerar_sync(payload, prioridade)
                 if response.status_code == 200:
                     return response.json().get("response", resultados_web)
                 else:
@@ -330,42 +421,78 @@ def processar_prompt_geral(prompt: str, query_engine=None):
         except Exception as e:
             return f"{resultados_web}\n\n⚠️ Nota: Não foi possível processar os resultados com IA local: {str(e)}"
     
-    # 4. Roteamento para consultas sobre produtos/memória (RAG com llava-llama3)
-    palavras_produtos = ['produto', 'equipamento', 'orçamento', 'preço', 'finiti', 'memoria', 'arquivo']
-    tem_arquivos_memoria = os.path.exists("./memoria") and len(os.listdir("./memoria")) > 0
-    
-    if any(palavra in prompt_lower for palavra in palavras_produtos) or tem_arquivos_memoria:
-        if query_engine:
+    # 4. Roteamento para consultas sobre produtos/memória (RAG)
+    # Sem query_engine (base ainda carregando em segundo plano) a pergunta segue para o Ollama direto
+    if query_engine and (rota.intencao == INTENCAO_PRODUTOS or obter_estado_memoria().tem_arquivos()):
+        # Respostas do RAG só valem para a versão do índice que as gerou
+        versao = versao_base or getattr(query_engine, 'versao', None)
+
+        if stream:
+            from answer_cache import consultar_em_streaming
+
+            def _consultar_rag_stream():
+                # Recuperação e síntese dentro da vaga; streams idênticos em andamento viram um só
+                return obter_gateway_llm().iterar_com_vaga(
+                    lambda: consultar_em_streaming(query_engine, prompt).response_gen, prioridade,
+                    chave=chave_geracao("rag-stream", versao or "", prompt)
+                )
+
+            if not versao:
+                return _consultar_rag_stream()
+            return _responder_com_cache_semantico_stream(prompt, _consultar_rag_stream, f"rag:{versao}")
+
+        def _consultar_rag():
             try:
-                response = query_engine.query(prompt)
-                return str(response)
+                def _consultar():
+                    with obter_gateway_llm().vaga(prioridade):
+                        return str(query_engine.query(prompt))
+
+                # Duas sessões com a mesma pergunta ao mesmo tempo: uma consulta só
+                chave = chave_geracao("rag", versao or "", prompt)
+                return obter_gateway_llm().coalescedor.executar(chave, _consultar), True
             except Exception as e:
-                return f"Erro ao processar consulta RAG: {str(e)}"
-        else:
-            return "Sistema RAG não está disponível no momento."
+                return f"Erro ao processar consulta RAG: {str(e)}", False
+
+        if not versao:
+            return _consultar_rag()[0]
+        return _responder_com_cache_semantico(prompt, _consultar_rag, f"rag:{versao}")
     
     # 4. Fallback para perguntas gerais (phi-3-mini simulado)
     try:
         # Verificar se o servidor Ollama está rodando
         if verificar_conexao_ollama():
-            try:
-                # Usar llava-llama3 para perguntas gerais
-                import requests
-                payload = {
-                    "model": "llava-llama3",
-                    "prompt": prompt,
-                    "stream": False
-                }
-                
-                response = requests.post("http://localhost:11434/api/generate", json=payload, timeout=60)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("response", "Erro: Resposta vazia do modelo")
-                else:
-                    return f"Erro na API do Ollama: {response.status_code}"
-            except Exception as e:
-                return f"Erro ao processar consulta: {str(e)}"
+            if stream:
+                from llm_streaming import stream_ollama_generate
+                return _responder_com_cache_semantico_stream(
+                    prompt,
+                    lambda: obter_gateway_llm().iterar_com_vaga(
+                        lambda: stream_ollama_generate(prompt, MODELS_CONFIG["chat"]), prioridade,
+                        chave=chave_geracao("stream", MODELS_CONFIG["chat"], prompt)
+                    ),
+                    "geral"
+                )
+
+            def _consultar_ollama():
+                try:
+                    # Modelo do chat para perguntas gerais
+                    payload = {
+                        "model": MODELS_CONFIG["chat"],
+                        "prompt": prompt,
+                        "stream": False
+                    }
+                    
+                    response = obter_gateway_llm().gerar_sync(payload, prioridade)
+                    
+                    if response.status_code == 200:
+                        result = response.json()
+                        texto = result.get("response")
+                        return (texto, True) if texto else ("Erro: Resposta vazia do modelo", False)
+                    else:
+                        return f"Erro na API do Ollama: {response.status_code}", False
+                except Exception as e:
+                    return f"Erro ao processar consulta: {str(e)}", False
+
+            return _responder_com_cache_semantico(prompt, _consultar_ollama, "geral")
         else:
             return "⚠️ **Servidor Ollama Desconectado**\n\nO servidor Ollama não está disponível no momento. Por favor:\n1. Verifique se o Ollama está instalado\n2. Inicie o servidor Ollama\n3. Tente novamente"
             
@@ -535,9 +662,19 @@ A frase deve ser:
 
 Responda APENAS com a frase, sem explicações."""
 
-        # Gerar frase com IA
+        # Frase do estoque pré-gerado; gerada na hora (com o contexto do vídeo) só se ele acabou
+        from frases_pool import TIPO_ESTUDIO, obter_pool_frases
+        pool = obter_pool_frases()
+        frase_estoque = pool.retirar(*TIPO_ESTUDIO) if pool else None
         try:
-            frase_marketing = processar_prompt_geral(prompt_marketing)
+            if frase_estoque:
+                frase_marketing = frase_estoque
+                print(f"✅ Frase do estoque: '{frase_marketing}'")
+            else:
+                frase_marketing = gerar_texto_cacheado(prompt_marketing, prioridade=PRIORIDADE_ESTUDIO,
+                                                       variantes=LLM_CACHE_CONFIG["variantes_criativas"])
+            if not frase_marketing:
+                raise RuntimeError("Resposta vazia do modelo")
             # Limpar a resposta (remover quebras de linha extras, etc.)
             frase_marketing = frase_marketing.strip().replace('\n', ' ')
             
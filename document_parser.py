@@ -0,0 +1,364 @@
+"""
+📄 AFI v4.0 - Parsing Paralelo de Documentos
+Estágio de leitura de documentos que roda na frente do VectorStoreIndex
+
+Os arquivos são lidos por processos workers (um arquivo por vez em cada),
+com timeout por arquivo contado a partir do aviso do worker de que começou.
+Um worker que trava é encerrado e substituído sem interromper os outros.
+Arquivos que estouram o timeout ou derrubam o parser vão para uma lista de
+quarentena persistida em disco e deixam de ser tentados até mudarem. Os
+documentos são entregues à medida que ficam prontos, então o embedding
+começa enquanto o resto da biblioteca ainda está sendo lido.
+"""
+
+import os
+import json
+import time
+import threading
+import multiprocessing
+from collections import deque
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from config import PARSING_CONFIG
+
+# Intervalo máximo entre as conferências de timeout
+INTERVALO_VERIFICACAO = 0.5
+
+
+def _ler_arquivo(caminho: str, filename_as_id: bool) -> list:
+    """Lê um único arquivo com o SimpleDirectoryReader (roda dentro do worker)"""
+    from llama_index.core import SimpleDirectoryReader
+    return SimpleDirectoryReader(input_files=[caminho], filename_as_id=filename_as_id).load_data()
+
+
+def _laco_worker(conexao, leitor: Callable, filename_as_id: bool):
+    """Lê os arquivos recebidos pela conexão até receber None"""
+    while True:
+        caminho = conexao.recv()
+        if caminho is None:
+            return
+        # O relógio do timeout só começa com este aviso (não conta o start do processo)
+        conexao.send(("inicio", None))
+        try:
+            conexao.send(("ok", leitor(caminho, filename_as_id)))
+        except Exception as e:
+            conexao.send(("erro", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """
+    Processo leitor com uma conexão só dele
+
+    Encerrar um worker travado não afeta os outros: nenhuma fila é
+    compartilhada, então matar o processo no meio de um envio não corrompe
+    o canal de ninguém.
+    """
+
+    def __init__(self, leitor: Callable, filename_as_id: bool):
+        self.conexao, conexao_filho = multiprocessing.Pipe()
+        self.processo = multiprocessing.Process(target=_laco_worker, args=(conexao_filho, leitor, filename_as_id),
+                                                daemon=True)
+        self.processo.start()
+        # Sem a cópia do pai, a morte do worker vira EOF na conexão
+        conexao_filho.close()
+        self.arquivo = None
+        self.inicio = None
+
+    def enviar(self, arquivo: str):
+        self.arquivo, self.inicio = arquivo, None
+        self.conexao.send(arquivo)
+
+    def encerrar(self):
+        """Ocioso: pede para sair; lendo (travado ou interrompido): termina o processo"""
+        if self.arquivo is None:
+            try:
+                self.conexao.send(None)
+            except OSError:
+                pass
+            self.processo.join(timeout=1)
+        if self.processo.is_alive():
+            self.processo.terminate()
+            self.processo.join(timeout=5)
+        self.conexao.close()
+
+
+class Quarentena:
+    """
+    🚧 Lista de arquivos que travaram ou derrubaram o parser
+
+    A entrada guarda tamanho e mtime: se o arquivo for substituído, ele volta
+    a ser tentado automaticamente.
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = caminho or PARSING_CONFIG["arquivo_quarentena"]
+        self.entradas = {}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    self.entradas = json.load(f)
+            except (OSError, ValueError):
+                self.entradas = {}
+
+    def contem(self, arquivo: str) -> bool:
+        entrada = self.entradas.get(os.path.abspath(arquivo))
+        if not entrada:
+            return False
+        try:
+            stat = os.stat(arquivo)
+        except OSError:
+            return False
+        return entrada.get("tamanho") == stat.st_size and entrada.get("mtime_ns") == stat.st_mtime_ns
+
+    def adicionar(self, arquivo: str, motivo: str):
+        try:
+            stat = os.stat(arquivo)
+            tamanho, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            tamanho, mtime_ns = None, None
+        self.entradas[os.path.abspath(arquivo)] = {
+            "motivo": motivo,
+            "tamanho": tamanho,
+            "mtime_ns": mtime_ns,
+            "quando": datetime.now().isoformat(),
+        }
+        print(f"🚧 Arquivo em quarentena: {os.path.basename(arquivo)} ({motivo})")
+        self.salvar()
+
+    def salvar(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        temporario = self.caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.entradas, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+
+
+class ProgressoIndexacao:
+    """
+    📊 Andamento da construção de um índice
+
+    Atualizado pela thread que indexa e lido pela interface a qualquer
+    momento: arquivos lidos, chunks embedados e a estimativa de término
+    (pelo ritmo dos arquivos já embedados).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zerar(None, "parado")
+
+    def _zerar(self, fonte: Optional[str], fase: str):
+        self.fonte = fonte
+        self.fase = fase
+        self.arquivos_total = 0
+        self._lidos = set()
+        self._embedados = set()
+        self.chunks_embedados = 0
+        self._inicio = time.monotonic()
+
+    def iniciar(self, fonte: Optional[str], fase: str = "preparando"):
+        with self._lock:
+            self._zerar(fonte, fase)
+
+    def definir_fase(self, fase: str):
+        with self._lock:
+            self.fase = fase
+
+    def definir_arquivos(self, total: int):
+        with self._lock:
+            self.arquivos_total = total
+            self.fase = "indexando"
+
+    def registrar_documento(self, documento):
+        with self._lock:
+            self._lidos.add(documento.metadata.get("file_path", documento.doc_id))
+
+    def registrar_lote(self, documentos: List, chunks: int):
+        with self._lock:
+            self._embedados.update(d.metadata.get("file_path", d.doc_id) for d in documentos)
+            self.chunks_embedados += chunks
+
+    def concluir(self):
+        with self._lock:
+            self.fase = "parado"
+
+    def get_status(self) -> dict:
+        with self._lock:
+            decorrido = time.monotonic() - self._inicio
+            embedados = len(self._embedados)
+            eta = None
+            if self.arquivos_total and embedados:
+                eta = decorrido / embedados * max(0, self.arquivos_total - embedados)
+            return {
+                'fonte': self.fonte,
+                'fase': self.fase,
+                'arquivos_total': self.arquivos_total,
+                'arquivos_lidos': len(self._lidos),
+                'arquivos_embedados': embedados,
+                'chunks_embedados': self.chunks_embedados,
+                'decorrido_s': round(decorrido, 1),
+                'eta_s': round(eta, 1) if eta is not None else None,
+            }
+
+
+def ler_documentos_em_paralelo(arquivos: Iterable[str], filename_as_id: bool = False,
+                               workers: Optional[int] = None,
+                               timeout_por_arquivo: Optional[float] = None,
+                               quarentena: Optional[Quarentena] = None,
+                               leitor: Callable = _ler_arquivo) -> Iterator:
+    """
+    🚀 Lê documentos em paralelo e os entrega assim que ficam prontos
+
+    Args:
+        arquivos: Arquivos a ler
+        filename_as_id: Usar o caminho como doc_id (necessário para indexação incremental)
+        workers: Processos leitores (padrão: PARSING_CONFIG ou número de CPUs)
+        timeout_por_arquivo: Segundos máximos de parsing por arquivo
+        quarentena: Lista de quarentena (padrão: a persistida em PARSING_CONFIG)
+        leitor: ``leitor(caminho, filename_as_id) -> documentos``, executado nos
+            workers (precisa ser importável por eles)
+
+    Yields:
+        Document: Documentos do LlamaIndex, na ordem em que terminam
+    """
+    workers = workers or PARSING_CONFIG["workers"] or os.cpu_count() or 1
+    timeout_por_arquivo = timeout_por_arquivo or PARSING_CONFIG["timeout_por_arquivo"]
+    quarentena = quarentena or Quarentena()
+
+    pendentes = deque()
+    for arquivo in arquivos:
+        if quarentena.contem(arquivo):
+            print(f"DEBUG: Pulando arquivo em quarentena: {os.path.basename(arquivo)}")
+            continue
+        pendentes.append(arquivo)
+
+    # Até texto puro passa pelos workers: é o que garante o timeout
+    ativos: List[_Worker] = []
+    try:
+        while pendentes or any(w.arquivo is not None for w in ativos):
+            for worker in ativos:
+                if worker.arquivo is None and pendentes:
+                    worker.enviar(pendentes.popleft())
+            while pendentes and len(ativos) < workers:
+                worker = _Worker(leitor, filename_as_id)
+                ativos.append(worker)
+                worker.enviar(pendentes.popleft())
+
+            ocupados = [w for w in ativos if w.arquivo is not None]
+            prontas = wait([w.conexao for w in ocupados], timeout=INTERVALO_VERIFICACAO)
+            agora = time.monotonic()
+
+            for worker in ocupados:
+                if worker.conexao in prontas:
+                    try:
+                        tipo, dados = worker.conexao.recv()
+                    except (EOFError, OSError):
+                        # O worker morreu (ex.: segfault no parser de PDF) lendo este arquivo
+                        quarentena.adicionar(worker.arquivo, "processo do parser encerrado")
+                        _descartar(worker, ativos)
+                        continue
+                    if tipo == "inicio":
+                        worker.inicio = agora
+                        continue
+                    arquivo, worker.arquivo = worker.arquivo, None
+                    if tipo == "erro":
+                        quarentena.adicionar(arquivo, dados)
+                    else:
+                        yield from dados
+                elif worker.inicio is not None and agora - worker.inicio > timeout_por_arquivo:
+                    # Só este worker é derrubado: as leituras dos outros seguem
+                    quarentena.adicionar(worker.arquivo, f"timeout de {timeout_por_arquivo:.0f}s")
+                    _descartar(worker, ativos)
+    finally:
+        for worker in ativos:
+            worker.encerrar()
+
+
+def _descartar(worker: _Worker, ativos: List[_Worker]):
+    """Encerra um worker travado ou morto; a próxima rodada abre outro se houver arquivos"""
+    worker.encerrar()
+    ativos.remove(worker)
+
+
+def inserir_documentos_em_lotes(index, documentos: Iterable, tamanho_lote: int = 16,
+                                progresso: Optional[ProgressoIndexacao] = None) -> int:
+    """
+    Insere documentos no índice em lotes, à medida que chegam do parser
+
+    Cada lote passa pelas transformações do Settings (chunking + embedding)
+    e é inserido de uma vez, como o ``VectorStoreIndex.insert`` faria.
+
+    Args:
+        progresso: Recebe os arquivos lidos e os chunks embedados de cada lote
+
+    Returns:
+        int: Total de documentos inseridos
+    """
+    from llama_index.core import Settings
+    from llama_index.core.ingestion import run_transformations
+
+    total = 0
+    lote: List = []
+
+    def _inserir(lote_atual):
+        nos = run_transformations(lote_atual, Settings.transformations, show_progress=False)
+        index.insert_nodes(nos)
+        for documento in lote_atual:
+            index.docstore.set_document_hash(documento.get_doc_id(), documento.hash)
+        if progresso:
+            progresso.registrar_lote(lote_atual, len(nos))
+
+    for documento in documentos:
+        if progresso:
+            progresso.registrar_documento(documento)
+        lote.append(documento)
+        if len(lote) >= tamanho_lote:
+            _inserir(lote)
+            total += len(lote)
+            print(f"DEBUG: {total} documentos embedados...")
+            lote = []
+
+    if lote:
+        _inserir(lote)
+        total += len(lote)
+
+    return total
+
+
+def criar_indice_vazio(persistir: bool = True):
+    """
+    VectorStoreIndex vazio com o vector store de ``VECTOR_STORE_CONFIG``
+
+    Args:
+        persistir: O índice será salvo com ``salvar_indice`` (False = só em memória)
+    """
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from quantized_store import criar_vector_store
+
+    vector_store = criar_vector_store(guardar_originais=persistir)
+    if vector_store is None:
+        return VectorStoreIndex(nodes=[])
+    return VectorStoreIndex(nodes=[], storage_context=StorageContext.from_defaults(vector_store=vector_store))
+
+
+def construir_indice_streaming(arquivos: List[str], filename_as_id: bool = False,
+                               progresso: Optional[ProgressoIndexacao] = None, persistir: bool = True):
+    """
+    Constrói um VectorStoreIndex lendo os arquivos em paralelo e embedando em fluxo
+
+    Args:
+        persistir: O índice será salvo em disco (False = só em memória, como no modo local)
+
+    Returns:
+        VectorStoreIndex ou None se nenhum documento foi lido
+    """
+    index = criar_indice_vazio(persistir)
+    if progresso:
+        progresso.definir_arquivos(len(arquivos))
+    total = inserir_documentos_em_lotes(index, ler_documentos_em_paralelo(arquivos, filename_as_id),
+                                        progresso=progresso)
+    if total == 0:
+        return None
+    print(f"DEBUG: {total} documentos carregados e indexados")
+    return index
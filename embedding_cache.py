@@ -0,0 +1,375 @@
+"""
+🧠 AFI v4.0 - Cache de Embeddings por Chunk
+Reaproveita vetores já calculados entre construções de índice
+
+Cada modelo de embedding tem seu próprio cache em disco, chaveado pelo hash
+do texto do chunk. Os vetores ficam em um arquivo float16 contíguo aberto via
+memory-map, e um pequeno SQLite guarda chave → slot + último uso. Quando o
+limite de tamanho é atingido, os slots menos usados recentemente (LRU) são
+reaproveitados.
+
+Vários processos (app, watcher, guardião) podem usar o mesmo cache. Um slot
+só é sobrescrito depois que a entrada antiga foi apagada e trocada por uma
+reserva (transação confirmada), e a chave nova só aparece depois do vetor
+gravado em disco. Quem lê segura a transação de leitura do SQLite enquanto
+copia as linhas, então a confirmação da reserva espera a leitura terminar.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, List, Optional
+
+from config import EMBEDDING_CACHE_CONFIG
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+# Slots alocados na criação do arquivo de vetores (cresce sob demanda até o limite)
+SLOTS_INICIAIS = 1024
+
+# Slot reservado por um put_many em andamento (a chave real entra depois do vetor gravado)
+PREFIXO_RESERVA = "reserva:"
+# Reserva mais velha que isto é de um processo que morreu no meio: o slot volta ao LRU
+RESERVA_EXPIRA_S = 600
+
+
+def _slug_modelo(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_") or "modelo"
+
+
+def chave_texto(texto: str) -> str:
+    """Chave do cache: SHA-256 do texto do chunk"""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheEmbeddings:
+    """
+    💾 Cache de embeddings em disco para um modelo
+
+    Os vetores são guardados em float16 (metade do espaço de float32) em um
+    arquivo de até ``capacidade`` slots. A dimensão é descoberta no primeiro
+    ``put``.
+    """
+
+    def __init__(self, model_name: str, pasta: Optional[str] = None,
+                 tamanho_maximo_mb: Optional[float] = None):
+        """
+        Args:
+            model_name: Nome do modelo (parte da chave do cache)
+            pasta: Pasta raiz do cache (padrão: EMBEDDING_CACHE_CONFIG["pasta"])
+            tamanho_maximo_mb: Limite do arquivo de vetores por modelo
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("NumPy é necessário para o cache de embeddings")
+
+        self.model_name = model_name
+        self.pasta = os.path.join(pasta or EMBEDDING_CACHE_CONFIG["pasta"], _slug_modelo(model_name))
+        self.tamanho_maximo_bytes = int(
+            (tamanho_maximo_mb or EMBEDDING_CACHE_CONFIG["tamanho_maximo_mb"]) * 1024 * 1024
+        )
+        os.makedirs(self.pasta, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.pasta, "indice.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entradas ("
+            " chave TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, ultimo_uso REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_uso ON entradas(ultimo_uso)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT)")
+        self._db.commit()
+
+        self.dimensao = None
+        self.capacidade = 0
+        self._vetores = None
+        self.hits = 0
+        self.misses = 0
+
+        linha = self._db.execute("SELECT valor FROM meta WHERE nome = 'dimensao'").fetchone()
+        if linha:
+            self._abrir_vetores(int(linha[0]))
+
+    @property
+    def _caminho_vetores(self) -> str:
+        return os.path.join(self.pasta, "vetores.f16")
+
+    def _abrir_vetores(self, dimensao: int):
+        self.dimensao = dimensao
+        self.capacidade = max(1, self.tamanho_maximo_bytes // (dimensao * 2))
+        linhas = 0
+        if os.path.exists(self._caminho_vetores):
+            linhas = os.path.getsize(self._caminho_vetores) // (dimensao * 2)
+            if linhas > self.capacidade:
+                # Limite diminuiu: descartar o cache em vez de remapear slots
+                os.remove(self._caminho_vetores)
+                self._db.execute("DELETE FROM entradas")
+                self._db.commit()
+                linhas = 0
+        self._mapear(max(linhas, min(self.capacidade, SLOTS_INICIAIS)))
+
+    def _mapear(self, linhas: int):
+        """(Re)abre o arquivo de vetores com ``linhas`` slots, crescendo o arquivo se preciso"""
+        if self._vetores is not None:
+            self._vetores.flush()
+            self._vetores = None
+        tamanho = linhas * self.dimensao * 2
+        with open(self._caminho_vetores, "ab") as f:
+            if f.tell() < tamanho:
+                f.truncate(tamanho)
+        self._vetores = np.memmap(self._caminho_vetores, dtype=np.float16, mode="r+",
+                                  shape=(linhas, self.dimensao))
+
+    def _garantir_slot(self, slot: int):
+        # O arquivo cresce em dobro até o limite, então caches pequenos ocupam pouco disco
+        linhas = self._vetores.shape[0]
+        if slot >= linhas:
+            self._mapear(min(self.capacidade, max(slot + 1, linhas * 2)))
+
+    def _acompanhar_arquivo(self, slot: int) -> bool:
+        """Outro processo pode ter crescido o arquivo: remapeia com o tamanho atual"""
+        if slot < self._vetores.shape[0]:
+            return True
+        linhas = os.path.getsize(self._caminho_vetores) // (self.dimensao * 2)
+        if linhas > self._vetores.shape[0]:
+            self._mapear(min(self.capacidade, linhas))
+        return slot < self._vetores.shape[0]
+
+    def get_many(self, textos: List[str]) -> List[Optional[List[float]]]:
+        """
+        Busca os vetores de vários textos
+
+        Returns:
+            List: vetor (lista de floats) para cada hit, None para cada miss
+        """
+        resultado: List[Optional[List[float]]] = [None] * len(textos)
+        if self._vetores is None or not textos:
+            self.misses += len(textos)
+            return resultado
+
+        chaves = [chave_texto(t) for t in textos]
+        with self._lock:
+            slots = {}
+            # Mapa e linhas lidos na mesma transação: nenhum slot é reservado para outra chave no meio
+            self._db.execute("BEGIN")
+            try:
+                for inicio in range(0, len(chaves), 500):
+                    lote = chaves[inicio:inicio + 500]
+                    marcadores = ",".join("?" * len(lote))
+                    for chave, slot in self._db.execute(
+                        f"SELECT chave, slot FROM entradas WHERE chave IN ({marcadores})", lote
+                    ):
+                        slots[chave] = slot
+
+                for i, chave in enumerate(chaves):
+                    slot = slots.get(chave)
+                    if slot is not None and self._acompanhar_arquivo(slot):
+                        resultado[i] = self._vetores[slot].astype(np.float32).tolist()
+            finally:
+                self._db.commit()
+
+            if slots:
+                self._db.executemany(
+                    "UPDATE entradas SET ultimo_uso = ? WHERE chave = ?",
+                    [(time.time(), chave) for chave in slots],
+                )
+                self._db.commit()
+
+        acertos = sum(1 for r in resultado if r is not None)
+        self.hits += acertos
+        self.misses += len(textos) - acertos
+        return resultado
+
+    def put_many(self, textos: List[str], vetores: List[List[float]]):
+        """Armazena vetores recém-calculados, reaproveitando slots LRU se o cache estiver cheio"""
+        if not textos:
+            return
+
+        with self._lock:
+            if self._vetores is None:
+                linha = self._db.execute("SELECT valor FROM meta WHERE nome = 'dimensao'").fetchone()
+                if linha is None:
+                    self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dimensao', ?)", (str(len(vetores[0])),))
+                    self._db.commit()
+                    linha = self._db.execute("SELECT valor FROM meta WHERE nome = 'dimensao'").fetchone()
+                self._abrir_vetores(int(linha[0]))
+
+            novos = {}
+            for texto, vetor in zip(textos, vetores):
+                if len(vetor) == self.dimensao:
+                    novos[chave_texto(texto)] = vetor
+
+            # 1. Reservar slots: a entrada despejada some antes de o vetor dela ser sobrescrito
+            reservas = {}
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                agora = time.time()
+                existentes = [chave for chave in novos if self._db.execute(
+                    "SELECT 1 FROM entradas WHERE chave = ?", (chave,)).fetchone()]
+                for chave in existentes:
+                    # Mesmo texto, mesmo modelo: o vetor já está lá (outro processo pode estar lendo)
+                    self._db.execute("UPDATE entradas SET ultimo_uso = ? WHERE chave = ?", (agora, chave))
+                    del novos[chave]
+                for chave in novos:
+                    slot = self._proximo_slot(agora)
+                    if slot is None:
+                        # Lote maior que o cache: o restante fica de fora
+                        break
+                    self._db.execute(
+                        "INSERT INTO entradas (chave, slot, ultimo_uso) VALUES (?, ?, ?)",
+                        (f"{PREFIXO_RESERVA}{slot}", slot, agora),
+                    )
+                    reservas[chave] = slot
+                if reservas:
+                    self._garantir_slot(max(reservas.values()))
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            if not reservas:
+                return
+
+            # 2. Gravar os vetores nos slots reservados (ninguém mais os enxerga)
+            for chave, slot in reservas.items():
+                self._acompanhar_arquivo(slot)
+                self._vetores[slot] = np.asarray(novos[chave], dtype=np.float16)
+            self._vetores.flush()
+
+            # 3. Só agora a chave real aponta para o slot
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for chave, slot in reservas.items():
+                    reserva = f"{PREFIXO_RESERVA}{slot}"
+                    if self._db.execute("SELECT 1 FROM entradas WHERE chave = ?", (chave,)).fetchone():
+                        # Outro processo guardou o mesmo texto enquanto gravávamos
+                        self._db.execute("DELETE FROM entradas WHERE chave = ?", (reserva,))
+                    else:
+                        self._db.execute("UPDATE entradas SET chave = ? WHERE chave = ?", (chave, reserva))
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def _proximo_slot(self, agora: float) -> Optional[int]:
+        total = self._db.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        if total < self.capacidade:
+            ocupado = self._db.execute("SELECT MAX(slot) FROM entradas").fetchone()[0]
+            proximo = 0 if ocupado is None else ocupado + 1
+            if proximo < self.capacidade:
+                return proximo
+            # Houve remoções no meio: procurar o primeiro slot livre
+            livres = set(range(self.capacidade)) - {
+                s for (s,) in self._db.execute("SELECT slot FROM entradas")
+            }
+            return min(livres)
+
+        # Cache cheio: despejar a entrada usada há mais tempo (reservas em andamento ficam)
+        linha = self._db.execute(
+            "SELECT chave, slot FROM entradas WHERE substr(chave, 1, ?) != ? OR ultimo_uso < ?"
+            " ORDER BY ultimo_uso ASC LIMIT 1",
+            (len(PREFIXO_RESERVA), PREFIXO_RESERVA, agora - RESERVA_EXPIRA_S),
+        ).fetchone()
+        if linha is None:
+            return None
+        chave, slot = linha
+        self._db.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+        return slot
+
+    def get_status(self) -> dict:
+        """Retorna estatísticas do cache"""
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        return {
+            'model_name': self.model_name,
+            'entradas': total,
+            'capacidade': self.capacidade,
+            'dimensao': self.dimensao,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._vetores is not None:
+                self._vetores.flush()
+            self._db.close()
+
+
+# Um cache por modelo, compartilhado por todas as construções de índice do processo
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obter_cache(model_name: str) -> CacheEmbeddings:
+    """Retorna o cache compartilhado do modelo (criado sob demanda)"""
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = CacheEmbeddings(model_name)
+        return _caches[model_name]
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class EmbeddingComCache(BaseEmbedding):
+        """
+        Adaptador LlamaIndex: consulta o cache antes de rodar o modelo
+
+        Só os embeddings de chunks (texto) passam pelo cache; embeddings de
+        consulta vão direto para o modelo interno.
+        """
+
+        _interno: Any = PrivateAttr()
+        _cache: Any = PrivateAttr()
+
+        def __init__(self, modelo_interno: BaseEmbedding, cache: Optional[CacheEmbeddings] = None,
+                     **kwargs: Any):
+            super().__init__(
+                model_name=modelo_interno.model_name,
+                embed_batch_size=modelo_interno.embed_batch_size,
+                **kwargs,
+            )
+            self._interno = modelo_interno
+            self._cache = cache or obter_cache(modelo_interno.model_name)
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "EmbeddingComCache"
+
+        @property
+        def cache(self) -> CacheEmbeddings:
+            return self._cache
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return self._interno.get_query_embedding(query)
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return await self._interno.aget_query_embedding(query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._get_text_embeddings([text])[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            resultado = self._cache.get_many(texts)
+            faltando = [i for i, vetor in enumerate(resultado) if vetor is None]
+            if faltando:
+                textos_faltando = [texts[i] for i in faltando]
+                novos = self._interno.get_text_embedding_batch(textos_faltando)
+                self._cache.put_many(textos_faltando, novos)
+                for i, vetor in zip(faltando, novos):
+                    resultado[i] = vetor
+            return resultado
+
@@ -0,0 +1,356 @@
+"""
+🛰️ AFI v4.0 - Servidor Local de Embeddings
+Um único processo carrega o modelo e atende a interface, o watcher e os scripts
+
+Cada processo que montava o próprio HuggingFaceEmbedding pagava centenas de
+MB de RAM e alguns segundos de carga. O servidor (HTTP em localhost, sem
+dependências além da biblioteca padrão) carrega o modelo uma vez, com o
+mesmo motor em lotes e o mesmo cache em disco do ``criar_modelo_embedding``.
+Pedidos simultâneos de vários clientes esperam alguns milissegundos numa fila
+e são embedados juntos, no mesmo forward pass.
+
+Do lado do cliente, ``EmbeddingRemoto`` entra no ``Settings.embed_model``
+como qualquer outro modelo do LlamaIndex.
+
+Uso:
+    python embedding_server.py [--modelo BAAI/bge-small-en-v1.5] [--porta 8510]
+"""
+
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+from config import EMBEDDING_SERVER_CONFIG
+
+try:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+TIPO_TEXTO = "texto"
+TIPO_CONSULTA = "consulta"
+
+
+def url_servidor() -> str:
+    return f"http://{EMBEDDING_SERVER_CONFIG['host']}:{EMBEDDING_SERVER_CONFIG['porta']}"
+
+
+@dataclass
+class _Pedido:
+    textos: List[str]
+    tipo: str
+    pronto: threading.Event = field(default_factory=threading.Event)
+    vetores: Optional[List[List[float]]] = None
+    erro: Optional[BaseException] = None
+
+
+class LoteadorEmbeddings:
+    """
+    🧺 Junta pedidos simultâneos em lotes para o modelo
+
+    Uma única thread fala com o modelo. Ao receber um pedido ela espera até
+    ``janela_ms`` por outros (ou até juntar ``max_lote`` textos) e embeda
+    todos os textos de chunk de uma vez; consultas são embedadas uma a uma
+    (o LlamaIndex não tem versão em lote para elas).
+    """
+
+    def __init__(self, modelo, max_lote: Optional[int] = None, janela_ms: Optional[float] = None):
+        self.modelo = modelo
+        self.max_lote = max_lote or EMBEDDING_SERVER_CONFIG["max_lote"]
+        self.janela_s = (janela_ms if janela_ms is not None else EMBEDDING_SERVER_CONFIG["janela_ms"]) / 1000
+        self._fila: "queue.Queue[Optional[_Pedido]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.pedidos = 0
+        self.lotes = 0
+        self.textos = 0
+        self.segundos_modelo = 0.0
+        self._thread = threading.Thread(target=self._trabalhar, name="afi-embeddings", daemon=True)
+        self._thread.start()
+
+    def embedar(self, textos: List[str], tipo: str = TIPO_TEXTO, timeout: Optional[float] = None) -> List[List[float]]:
+        if not textos:
+            return []
+        pedido = _Pedido(list(textos), tipo)
+        self._fila.put(pedido)
+        if not pedido.pronto.wait(timeout or EMBEDDING_SERVER_CONFIG["timeout"]):
+            raise TimeoutError("Tempo esgotado esperando o modelo de embedding")
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.vetores
+
+    def parar(self):
+        self._fila.put(None)
+        self._thread.join(timeout=5)
+
+    def _coletar(self, primeiro: _Pedido) -> List[_Pedido]:
+        pedidos = [primeiro]
+        total = len(primeiro.textos)
+        prazo = time.monotonic() + self.janela_s
+        while total < self.max_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pedido = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if pedido is None:
+                # Processa o que já chegou e encerra na próxima volta
+                self._fila.put(None)
+                break
+            pedidos.append(pedido)
+            total += len(pedido.textos)
+        return pedidos
+
+    def _trabalhar(self):
+        while True:
+            primeiro = self._fila.get()
+            if primeiro is None:
+                return
+            pedidos = self._coletar(primeiro)
+            inicio = time.perf_counter()
+            lotes = 0
+
+            textos = [p for p in pedidos if p.tipo == TIPO_TEXTO]
+            if textos:
+                try:
+                    vetores = self.modelo.get_text_embedding_batch([t for p in textos for t in p.textos])
+                    posicao = 0
+                    for pedido in textos:
+                        pedido.vetores = vetores[posicao:posicao + len(pedido.textos)]
+                        posicao += len(pedido.textos)
+                except Exception as e:
+                    for pedido in textos:
+                        pedido.erro = e
+                lotes += 1
+
+            for pedido in (p for p in pedidos if p.tipo != TIPO_TEXTO):
+                try:
+                    pedido.vetores = [self.modelo.get_query_embedding(t) for t in pedido.textos]
+                except Exception as e:
+                    pedido.erro = e
+                lotes += 1
+
+            with self._lock:
+                self.pedidos += len(pedidos)
+                self.lotes += lotes
+                self.textos += sum(len(p.textos) for p in pedidos)
+                self.segundos_modelo += time.perf_counter() - inicio
+            for pedido in pedidos:
+                pedido.pronto.set()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'modelo': self.modelo.model_name,
+                'pedidos': self.pedidos,
+                'lotes': self.lotes,
+                'textos': self.textos,
+                'pedidos_por_lote': round(self.pedidos / self.lotes, 2) if self.lotes else 0.0,
+                'textos_por_segundo': round(self.textos / self.segundos_modelo, 1) if self.segundos_modelo else 0.0,
+                'na_fila': self._fila.qsize(),
+            }
+
+
+def _criar_handler(loteador: LoteadorEmbeddings):
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: cada cliente reaproveita a conexão
+
+        def _responder(self, codigo: int, dados: dict):
+            corpo = json.dumps(dados).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._responder(200, loteador.get_status())
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def do_POST(self):
+            if self.path != "/embed":
+                self._responder(404, {"erro": "rota não encontrada"})
+                return
+            try:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                dados = json.loads(self.rfile.read(tamanho) or b"{}")
+                textos = dados["textos"]
+                tipo = dados.get("tipo", TIPO_TEXTO)
+                if not isinstance(textos, list) or tipo not in (TIPO_TEXTO, TIPO_CONSULTA):
+                    raise ValueError("esperado {'textos': [...], 'tipo': 'texto'|'consulta'}")
+            except (KeyError, ValueError) as e:
+                self._responder(400, {"erro": str(e)})
+                return
+            try:
+                vetores = loteador.embedar(textos, tipo)
+            except Exception as e:
+                self._responder(500, {"erro": f"{type(e).__name__}: {e}"})
+                return
+            self._responder(200, {"modelo": loteador.modelo.model_name, "vetores": vetores})
+
+        def log_message(self, formato, *args):
+            # Uma linha por requisição inundaria o console durante a indexação
+            pass
+
+    return _Handler
+
+
+class ServidorEmbeddings:
+    """🛰️ Servidor HTTP local em volta de um LoteadorEmbeddings"""
+
+    def __init__(self, modelo, host: Optional[str] = None, porta: Optional[int] = None):
+        self.loteador = LoteadorEmbeddings(modelo)
+        self.host = host or EMBEDDING_SERVER_CONFIG["host"]
+        self._http = ThreadingHTTPServer((self.host, porta if porta is not None else EMBEDDING_SERVER_CONFIG["porta"]),
+                                         _criar_handler(self.loteador))
+        self._http.daemon_threads = True
+        self.porta = self._http.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.porta}"
+
+    def iniciar(self) -> "ServidorEmbeddings":
+        """Atende em uma thread em segundo plano"""
+        self._thread = threading.Thread(target=self._http.serve_forever, name="afi-embeddings-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def servir(self):
+        """Atende na thread atual até Ctrl+C"""
+        try:
+            self._http.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.parar()
+
+    def parar(self):
+        if self._thread is not None:
+            self._http.shutdown()
+        self._http.server_close()
+        self.loteador.parar()
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class EmbeddingRemoto(BaseEmbedding):
+        """
+        Adaptador LlamaIndex que embeda pelo servidor local
+
+        Não carrega modelo nem usa o cache em disco (os dois ficam no servidor,
+        que é o único processo escrevendo no cache).
+        """
+
+        _url: str = PrivateAttr()
+        _timeout: float = PrivateAttr()
+        _sessoes: Any = PrivateAttr()
+
+        def __init__(self, url: Optional[str] = None, model_name: Optional[str] = None,
+                     timeout: Optional[float] = None, **kwargs: Any):
+            url = (url or url_servidor()).rstrip("/")
+            timeout = timeout or EMBEDDING_SERVER_CONFIG["timeout"]
+            if model_name is None:
+                model_name = EmbeddingRemoto._consultar_status(url, timeout)["modelo"]
+            kwargs.setdefault("embed_batch_size", EMBEDDING_SERVER_CONFIG["max_lote"])
+            super().__init__(model_name=model_name, **kwargs)
+            self._url = url
+            self._timeout = timeout
+            self._sessoes = threading.local()
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "EmbeddingRemoto"
+
+        @staticmethod
+        def _consultar_status(url: str, timeout: float) -> dict:
+            import requests
+
+            resposta = requests.get(f"{url}/status", timeout=min(timeout, 2))
+            resposta.raise_for_status()
+            return resposta.json()
+
+        def _sessao(self):
+            # Uma sessão (conexão keep-alive) por thread
+            sessao = getattr(self._sessoes, "sessao", None)
+            if sessao is None:
+                import requests
+                sessao = self._sessoes.sessao = requests.Session()
+            return sessao
+
+        def _embedar(self, textos: List[str], tipo: str) -> List[List[float]]:
+            resposta = self._sessao().post(f"{self._url}/embed", json={"textos": textos, "tipo": tipo},
+                                           timeout=self._timeout)
+            if resposta.status_code != 200:
+                raise RuntimeError(f"Servidor de embeddings: {resposta.status_code} {resposta.text[:200]}")
+            return resposta.json()["vetores"]
+
+        def get_status(self) -> dict:
+            return self._consultar_status(self._url, self._timeout)
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return self._embedar([query], TIPO_CONSULTA)[0]
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._embedar([text], TIPO_TEXTO)[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            return self._embedar(texts, TIPO_TEXTO) if texts else []
+
+
+def conectar_servidor_embeddings(model_name: str):
+    """
+    Cliente do servidor local, se ele estiver no ar servindo o mesmo modelo
+
+    Returns:
+        EmbeddingRemoto ou None (o chamador carrega o modelo no próprio processo)
+    """
+    if not LLAMA_INDEX_AVAILABLE:
+        return None
+    try:
+        cliente = EmbeddingRemoto()
+    except Exception as e:
+        print(f"⚠️ Servidor de embeddings indisponível em {url_servidor()} ({type(e).__name__}) - "
+              f"carregando o modelo neste processo")
+        return None
+    if cliente.model_name != model_name:
+        print(f"⚠️ Servidor de embeddings serve {cliente.model_name}, não {model_name} - "
+              f"carregando o modelo neste processo")
+        return None
+    print(f"🛰️ Embeddings pelo servidor local {url_servidor()} ({model_name})")
+    return cliente
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local de embeddings do AFI.")
+    parser.add_argument("--modelo", default=EMBEDDING_SERVER_CONFIG["modelo"])
+    parser.add_argument("--host", default=EMBEDDING_SERVER_CONFIG["host"])
+    parser.add_argument("--porta", type=int, default=EMBEDDING_SERVER_CONFIG["porta"])
+    args = parser.parse_args(argv)
+
+    from embedding_engine import criar_modelo_embedding
+
+    print(f"🧠 Carregando {args.modelo}...")
+    servidor = ServidorEmbeddings(criar_modelo_embedding(args.modelo, usar_servidor=False), args.host, args.porta)
+    print(f"🛰️ Servidor de embeddings em {servidor.url} (Ctrl+C para parar)")
+    servidor.servir()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,7 @@ from typing import Iterable
 
 ROOT_DIR = Path(__file__).resolve().parent
 DEFAULT_PORT = 8507
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
 
 
 def _normalize_path(value: str | None, *fallback: Path) -> Path:
@@ -43,6 +44,7 @@ class AFISettings:
     third_party_dir: Path
     ffmpeg_dir: Path
     no_deps: bool
+    ollama_url: str = DEFAULT_OLLAMA_URL
 
     def all_dirs(self) -> Iterable[Path]:
         return (
@@ -80,6 +82,7 @@ def load_settings(create_dirs: bool = True) -> AFISettings:
         third_party_dir=third_party_dir,
         ffmpeg_dir=ffmpeg_dir,
         no_deps=_strtobool(os.getenv("NO_DEPS", "0")),
+        ollama_url=(os.getenv("AFI_OLLAMA_URL") or DEFAULT_OLLAMA_URL).rstrip("/"),
     )
 
     if create_dirs:
@@ -93,4 +96,4 @@ def no_deps_mode() -> bool:
     return load_settings(create_dirs=False).no_deps
 
 
-__all__ = ["AFISettings", "load_settings", "no_deps_mode", "ROOT_DIR", "DEFAULT_PORT"]
+__all__ = ["AFISettings", "load_settings", "no_deps_mode", "ROOT_DIR", "DEFAULT_PORT", "DEFAULT_OLLAMA_URL"]
@@ -15,6 +15,8 @@ from typing import Optional, Callable, List
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileModifiedEvent, FileCreatedEvent
 
+from intent_router import invalidar_cache_memoria
+
 class AFIFileWatcher(FileSystemEventHandler):
     """
     🔍 Guardião de Arquivos do AFI
@@ -81,6 +83,10 @@ class AFIFileWatcher(FileSystemEventHandler):
         self.last_event_time[file_path] = current_time
         return True
     
+    def on_any_event(self, event):
+        """Mudança na pasta de memória (inclusive remoção) invalida o "memória tem arquivos" do roteador do chat"""
+        invalidar_cache_memoria(event.src_path, getattr(event, "dest_path", ""))
+    
     def on_created(self, event):
         """Chamado quando um arquivo é criado"""
         if isinstance(event, FileCreatedEvent):
@@ -0,0 +1,313 @@
+"""
+🎞️ AFI v4.0 - Estoque de Frases de Marketing
+Frases pré-geradas no tempo ocioso do Ollama para o guardião e o estúdio
+
+Cada vídeo esperava uma geração síncrona (10-60 s) pela frase da legenda
+antes de começar a renderizar. O estoque mantém algumas frases prontas por
+tipo (estilo + limite de caracteres) num SQLite em disco: quem processa um
+vídeo retira uma na hora e só gera ao vivo se o tipo estiver vazio.
+
+Uma thread repõe o estoque apenas quando o Ollama está no ar e o gateway
+do LLM *deste processo* não tem nenhuma geração em andamento nem na fila.
+O gateway não enxerga outros processos, então a reposição roda só no app,
+que é quem atende o chat; o guardião apenas retira frases (e gera ao vivo
+se o estoque acabar). Uma concessão no próprio SQLite garante um único
+processo repondo por vez, e a inserção confere o estoque na mesma
+instrução, para dois processos nunca passarem do alvo. Toda frase passa
+por ``validar_frase`` antes de entrar no estoque.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import FRASES_POOL_CONFIG, MODELS_CONFIG
+
+# Tom pedido ao LLM para cada estilo (os estilos musicais são os da integração de mídia)
+DESCRICOES_ESTILO = {
+    "persuasiva": "impactante e persuasiva, que motive a compra",
+    "impacto": "de impacto, direta e focada no benefício ou resultado",
+    "Rock": "enérgica e motivadora",
+    "Pop": "alegre, de vendas e promoções",
+    "Calma": "tranquila e didática, de tutorial",
+    "Eletronica": "moderna, sobre inovação e tecnologia",
+    "Instrumental": "técnica, sobre precisão e qualidade",
+}
+
+# Tipos usados por cada consumidor (precisam estar em FRASES_POOL_CONFIG["tipos"] para serem repostos)
+TIPO_GUARDIAO = ("persuasiva", 80)
+TIPO_ESTUDIO = ("impacto", 50)
+LIMITE_STORY = 30  # Integração de mídia: um tipo por estilo musical
+
+# Respostas que são mensagens do sistema, não frases
+_PALAVRAS_PROIBIDAS = ("erro", "ollama", "desconectado", "não foi possível", "como modelo", "assistente")
+_PREFIXO = re.compile(r"^\s*(frase(\s+de\s+\w+)?|resposta|slogan)\s*:\s*", re.IGNORECASE)
+
+
+def montar_prompt(estilo: str, max_caracteres: int) -> str:
+    descricao = DESCRICOES_ESTILO.get(estilo, estilo)
+    return (
+        f"Crie uma frase de marketing {descricao} para um vídeo da Finiti, empresa de equipamentos "
+        f"de pintura airless e tratamento de pisos. A frase deve ter no máximo {max_caracteres} caracteres "
+        "e estar em português brasileiro. Responda APENAS com a frase, sem aspas nem explicações."
+    )
+
+
+def validar_frase(texto: Optional[str], max_caracteres: int) -> Optional[str]:
+    """
+    Limpa a resposta do LLM e decide se ela serve como legenda
+
+    Returns:
+        str: A frase limpa (primeira linha, sem prefixo nem aspas), ou None
+        se estiver vazia, passar do limite ou parecer mensagem de erro
+    """
+    if not texto:
+        return None
+    linhas = [linha.strip() for linha in texto.strip().splitlines() if linha.strip()]
+    if not linhas:
+        return None
+    frase = _PREFIXO.sub("", linhas[0]).strip().strip('"\'“”«»').strip()
+    if not frase or len(frase) > max_caracteres:
+        return None
+    if any(palavra in frase.lower() for palavra in _PALAVRAS_PROIBIDAS):
+        return None
+    return frase
+
+
+def _gerar_pelo_ollama(prompt: str) -> Optional[str]:
+    from llm_gateway import PRIORIDADE_SEGUNDO_PLANO, obter_gateway_llm
+
+    payload = {
+        "model": MODELS_CONFIG["marketing"],
+        "prompt": prompt,
+        "stream": False,
+        # Temperatura alta: o estoque precisa de frases diferentes para o mesmo pedido
+        "options": {"temperature": FRASES_POOL_CONFIG["temperatura"]},
+    }
+    response = obter_gateway_llm().gerar_sync(payload, PRIORIDADE_SEGUNDO_PLANO)
+    if response.status_code != 200:
+        raise RuntimeError(f"Erro na API do Ollama: {response.status_code}")
+    return response.json().get("response")
+
+
+def _ollama_ocioso() -> bool:
+    """Ollama no ar e nada em andamento nem na fila do gateway deste processo"""
+    from llm_gateway import obter_gateway_llm
+    from ollama_client import obter_monitor_ollama
+
+    if not obter_monitor_ollama().esta_online():
+        return False
+    status = obter_gateway_llm().get_status()
+    return status['em_uso'] == 0 and not any(p['na_fila'] for p in status['prioridades'].values())
+
+
+class PoolFrases:
+    """
+    🎞️ Estoque persistente de frases por (estilo, limite de caracteres)
+
+    O SQLite permite que o app e o guardião (processos diferentes) retirem
+    e reponham frases do mesmo arquivo sem entregar a mesma frase duas vezes.
+    A tabela ``reposicao`` guarda qual processo está repondo e até quando.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, tipos: Optional[List[Tuple[str, int]]] = None,
+                 estoque: Optional[int] = None, gerar: Optional[Callable[[str], Optional[str]]] = None,
+                 ocioso: Optional[Callable[[], bool]] = None):
+        self.caminho = caminho or FRASES_POOL_CONFIG["arquivo"]
+        self.tipos = tipos or [(t["estilo"], t["max_caracteres"]) for t in FRASES_POOL_CONFIG["tipos"]]
+        self.estoque = estoque or FRASES_POOL_CONFIG["estoque_por_tipo"]
+        self._gerar = gerar or _gerar_pelo_ollama
+        self._ocioso = ocioso or _ollama_ocioso
+        self._dono = f"{os.getpid()}:{id(self)}"
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.caminho, check_same_thread=False, timeout=10,
+                                   isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS frases ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, estilo TEXT NOT NULL, max_caracteres INTEGER NOT NULL,"
+            " texto TEXT NOT NULL, criado_em REAL NOT NULL, UNIQUE (estilo, max_caracteres, texto))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reposicao ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), dono TEXT NOT NULL, expira_em REAL NOT NULL)"
+        )
+
+        self.retiradas = 0
+        self.faltas = 0
+        self.geradas = 0
+        self.rejeitadas = 0
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def retirar(self, estilo: str, max_caracteres: int) -> Optional[str]:
+        """A frase mais antiga do tipo (removida do estoque), ou None se ele estiver vazio"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self._db.execute(
+                    "SELECT id, texto FROM frases WHERE estilo = ? AND max_caracteres = ? ORDER BY id LIMIT 1",
+                    (estilo, max_caracteres),
+                ).fetchone()
+                if linha:
+                    self._db.execute("DELETE FROM frases WHERE id = ?", (linha[0],))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if linha:
+                self.retiradas += 1
+            else:
+                self.faltas += 1
+        # Repor o que saiu assim que o Ollama ficar ocioso
+        self._acordar.set()
+        return linha[1] if linha else None
+
+    def quantidade(self, estilo: str, max_caracteres: int) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM frases WHERE estilo = ? AND max_caracteres = ?", (estilo, max_caracteres)
+            ).fetchone()[0]
+
+    def repor(self, estilo: str, max_caracteres: int) -> bool:
+        """Gera, valida e guarda uma frase do tipo; True se ela entrou no estoque"""
+        frase = validar_frase(self._gerar(montar_prompt(estilo, max_caracteres)), max_caracteres)
+        if frase is None:
+            self.rejeitadas += 1
+            return False
+        with self._lock:
+            # A contagem vai na mesma instrução: o tipo nunca passa do estoque alvo
+            inseridas = self._db.execute(
+                "INSERT OR IGNORE INTO frases (estilo, max_caracteres, texto, criado_em)"
+                " SELECT ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM frases"
+                " WHERE estilo = ? AND max_caracteres = ?) < ?",
+                (estilo, max_caracteres, frase, time.time(), estilo, max_caracteres, self.estoque),
+            ).rowcount
+        if inseridas:
+            self.geradas += 1
+        else:
+            # Repetida (o estoque precisa de frases diferentes) ou o tipo já encheu
+            self.rejeitadas += 1
+        return bool(inseridas)
+
+    def assumir_reposicao(self) -> bool:
+        """
+        Renova a concessão de reposição deste pool, se ninguém mais a tiver
+
+        Returns:
+            bool: True se este pool é o que repõe o estoque agora
+        """
+        agora = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self._db.execute("SELECT dono, expira_em FROM reposicao WHERE id = 1").fetchone()
+                livre = linha is None or linha[0] == self._dono or linha[1] < agora
+                if livre:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO reposicao (id, dono, expira_em) VALUES (1, ?, ?)",
+                        (self._dono, agora + FRASES_POOL_CONFIG["concessao_s"]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return livre
+
+    def _liberar_reposicao(self):
+        with self._lock:
+            self._db.execute("DELETE FROM reposicao WHERE id = 1 AND dono = ?", (self._dono,))
+
+    def tipo_mais_vazio(self) -> Optional[Tuple[str, int]]:
+        """O tipo com menos frases abaixo do estoque alvo (None se todos estão cheios)"""
+        faltando = [(self.quantidade(estilo, limite), (estilo, limite)) for estilo, limite in self.tipos]
+        faltando = [item for item in faltando if item[0] < self.estoque]
+        return min(faltando)[1] if faltando else None
+
+    def abastecer(self, max_geracoes: Optional[int] = None) -> int:
+        """
+        Repõe frases enquanto o Ollama estiver ocioso
+
+        Returns:
+            int: Quantas gerações foram feitas (aceitas ou não)
+        """
+        geracoes = 0
+        while max_geracoes is None or geracoes < max_geracoes:
+            if self._parar.is_set():
+                break
+            tipo = self.tipo_mais_vazio()
+            if tipo is None or not self._ocioso() or not self.assumir_reposicao():
+                break
+            self.repor(*tipo)
+            geracoes += 1
+        return geracoes
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._abastecer_sempre, name="afi-frases", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._liberar_reposicao()
+
+    def _abastecer_sempre(self):
+        while not self._parar.is_set():
+            try:
+                # Limite por rodada: um modelo que só devolve frases inválidas não prende a thread
+                self.abastecer(max_geracoes=2 * self.estoque * len(self.tipos))
+            except Exception as e:
+                print(f"⚠️ Estoque de frases: geração falhou ({type(e).__name__}: {e})")
+            self._acordar.wait(FRASES_POOL_CONFIG["intervalo_s"])
+            self._acordar.clear()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            por_tipo: Dict[str, int] = {
+                f"{estilo}/{limite}": total
+                for estilo, limite, total in self._db.execute(
+                    "SELECT estilo, max_caracteres, COUNT(*) FROM frases GROUP BY estilo, max_caracteres"
+                )
+            }
+        return {
+            'estoque_alvo': self.estoque,
+            'por_tipo': {f"{e}/{l}": por_tipo.get(f"{e}/{l}", 0) for e, l in self.tipos},
+            'retiradas': self.retiradas,
+            'faltas': self.faltas,
+            'geradas': self.geradas,
+            'rejeitadas': self.rejeitadas,
+        }
+
+
+_pool_global = None
+_pool_global_lock = threading.Lock()
+
+
+def obter_pool_frases(repor: bool = True) -> Optional[PoolFrases]:
+    """
+    Estoque compartilhado pelo processo (None se desabilitado)
+
+    Args:
+        repor: Rodar a thread de reposição neste processo. Só o processo que
+            atende o chat (o app) deve repor: é o gateway dele que sabe se o
+            Ollama está livre
+    """
+    global _pool_global
+    if not FRASES_POOL_CONFIG["habilitado"]:
+        return None
+    with _pool_global_lock:
+        if _pool_global is None:
+            _pool_global = PoolFrases()
+        if repor:
+            _pool_global.iniciar()
+        return _pool_global
@@ -63,7 +63,9 @@ NO_DEPS_MODE = AFI_SETTINGS.no_deps
 
 # Importar função de IA para gerar frases de marketing
 try:
-    from core_logic import processar_prompt_geral
+    from config import LLM_CACHE_CONFIG
+    from core_logic import gerar_texto_cacheado
+    from frases_pool import TIPO_GUARDIAO, obter_pool_frases
     IA_DISPONIVEL = True
 except ImportError:
     IA_DISPONIVEL = False
@@ -134,14 +136,20 @@ class GuardiaoVideoHandler(FileSystemEventHandler):
                     return
                 musica_escolhida = random.choice(musicas_disponiveis)
                 
-            # 1. Gerar frase de marketing usando IA
-            print("[INFO] Gerando frase de marketing com IA...")
-            if IA_DISPONIVEL:
+            # 1. Frase de marketing: do estoque pré-gerado, ou gerada na hora se ele acabou
+            pool = obter_pool_frases(repor=False) if IA_DISPONIVEL else None
+            frase_estoque = pool.retirar(*TIPO_GUARDIAO) if pool else None
+            if frase_estoque:
+                frase_marketing = frase_estoque
+                print(f"[IA] Frase do estoque: {frase_marketing}")
+            elif IA_DISPONIVEL:
+                print("[INFO] Gerando frase de marketing com IA...")
                 try:
                     prompt_ia = "Crie uma frase de marketing impactante e persuasiva para um produto da Finiti. A frase deve ser curta, chamativa e motivar a compra. Responda apenas com a frase, sem explicações."
-                    resposta_ia = processar_prompt_geral(prompt_ia)
-                    if resposta_ia and 'response' in resposta_ia:
-                        frase_marketing = resposta_ia['response'].strip()
+                    # Mesmo prompt para todo vídeo: depois de algumas frases geradas, sorteia entre elas
+                    resposta_ia = gerar_texto_cacheado(prompt_ia, variantes=LLM_CACHE_CONFIG["variantes_criativas"])
+                    if resposta_ia:
+                        frase_marketing = resposta_ia
                         print(f"[IA] Frase gerada: {frase_marketing}")
                     else:
                         frase_marketing = TEXTO_PERSONALIZADO
@@ -311,6 +319,10 @@ class GuardiaoAutonomo:
 
         self.verificar_estrutura()
 
+        # O estoque de frases é reposto pelo app (o gateway deste processo não vê o chat)
+        if IA_DISPONIVEL:
+            obter_pool_frases(repor=False)
+
         event_handler = GuardiaoVideoHandler(self.pasta_musicas, self.pasta_saida)
 
         print(f"[INFO] Monitorando: {self.pasta_entrada}")
@@ -0,0 +1,340 @@
+"""
+🔁 AFI v4.0 - Gerenciador da Base de Conhecimento
+Um único dono do índice em uso, com reconstrução em segundo plano e troca atômica
+
+Antes, cada forma de indexar (pasta de memória, pasta por referência, pasta
+local) montava seus próprios engines e o ``@st.cache_resource`` segurava o
+engine antigo até a aplicação ser reiniciada. Agora a base ativa é um
+snapshot imutável trocado de uma vez só quando a nova versão fica pronta;
+enquanto isso, as consultas continuam sendo respondidas pela base anterior.
+
+A base é dividida em shards, um índice por pasta (a pasta de memória, cada
+pasta por referência e cada pasta monitorada pelo watcher). Uma mudança em
+uma pasta reconstrói só o shard dela, e as consultas percorrem os shards em
+paralelo (``RetrieverFanOut``).
+
+Nada aqui bloqueia quem chama: a inicialização dos modelos e a primeira
+construção também rodam na thread do gerenciador, e ``progresso`` informa à
+interface arquivos lidos, chunks embedados e a estimativa de término.
+"""
+
+import os
+import time
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from rag_index import (
+    atualizar_indice_incremental,
+    carregar_ou_construir_indice,
+    listar_arquivos_referencia,
+    listar_arquivos_validos,
+    pasta_storage_referencia,
+)
+from document_parser import ProgressoIndexacao, construir_indice_streaming
+from bm25_index import criar_chat_engine_hibrido, criar_query_engine_hibrido
+from answer_cache import versao_indices
+
+MODO_PRINCIPAL = "principal"
+MODO_REFERENCIA = "referencia"
+MODO_LOCAL = "local"
+
+PROMPT_SISTEMA = (
+    "Você é o AFI (Assistente Finiti Inteligente), um assistente especializado em engenharia, "
+    "construção e equipamentos da empresa Finiti. Você tem acesso à base de conhecimento da empresa"
+    "{origem} e pode manter conversas contextuais. Sempre se lembre do contexto anterior da conversa. "
+    "Quando o usuário se referir a 'isso', 'aquilo', ou usar pronomes, considere o contexto da conversa anterior."
+)
+
+
+def _mesma_pasta(a: str, b: str) -> bool:
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Índice de uma única pasta da base de conhecimento"""
+
+    fonte: str
+    modo: str
+    index: object
+    chunks: int
+    criado_em: str = field(default_factory=_agora)
+
+
+@dataclass(frozen=True)
+class BaseConhecimento:
+    """Snapshot imutável da base em uso: trocado inteiro, nunca alterado no lugar"""
+
+    shards: Tuple[Shard, ...]
+    query_engine: object
+    geracao: int
+    versao: str = ""  # Hash dos ids de nós: escopo das respostas em cache desta base
+    criada_em: str = field(default_factory=_agora)
+
+    @property
+    def indices(self) -> list:
+        return [shard.index for shard in self.shards]
+
+    @property
+    def chunks(self) -> int:
+        return sum(shard.chunks for shard in self.shards)
+
+    @property
+    def system_prompt(self) -> str:
+        externas = [shard.fonte for shard in self.shards if shard.modo == MODO_REFERENCIA]
+        origem = f" localizada em {', '.join(repr(f) for f in externas)}" if externas else ""
+        return PROMPT_SISTEMA.format(origem=origem)
+
+
+class GerenciadorIndice:
+    """
+    🧠 Dono da base de conhecimento ativa
+
+    As reconstruções rodam uma de cada vez em uma thread própria; a troca da
+    base ativa é uma única atribuição sob lock, então quem já pegou a base
+    antiga termina a consulta com ela e a próxima consulta já usa a nova.
+    """
+
+    def __init__(self, modelo_embedding: str,
+                 preparar_pasta: Optional[Callable[[str], None]] = None,
+                 inicializar: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            modelo_embedding: Modelo usado na assinatura dos índices salvos
+            preparar_pasta: Pré-processamento da pasta antes de indexar
+                (ex.: transcrição de vídeos e descrição de imagens)
+            inicializar: Preparação lenta (ex.: carregar o modelo de embedding)
+                executada em segundo plano antes da primeira construção
+        """
+        self.modelo_embedding = modelo_embedding
+        self._preparar_pasta = preparar_pasta
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="afi-indice")
+        self._ativa: Optional[BaseConhecimento] = None
+        self._geracao = 0
+        self._na_fila: Dict[str, Future] = {}
+        self._em_construcao: Optional[str] = None
+        self.progresso = ProgressoIndexacao()
+        self.ultimo_erro: Optional[str] = None
+        self.ultima_duracao: Optional[float] = None
+        self.inicializado = inicializar is None
+        if inicializar is not None:
+            self.progresso.iniciar(None, "carregando modelos")
+            self._executor.submit(self._inicializar, inicializar)
+
+    def _inicializar(self, inicializar: Callable[[], None]):
+        try:
+            inicializar()
+            self.inicializado = True
+        except Exception as e:
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            print(f"DEBUG: Falha ao inicializar os modelos: {self.ultimo_erro}")
+            traceback.print_exc()
+        finally:
+            self.progresso.concluir()
+
+    # ------------------------------------------------------------------
+    # Leitura (sempre da base ativa, sem bloquear durante reconstruções)
+    # ------------------------------------------------------------------
+
+    @property
+    def base(self) -> Optional[BaseConhecimento]:
+        return self._ativa
+
+    @property
+    def query_engine(self):
+        base = self._ativa
+        return base.query_engine if base else None
+
+    @property
+    def geracao(self) -> int:
+        base = self._ativa
+        return base.geracao if base else 0
+
+    def criar_chat_engine(self, memory, base: Optional[BaseConhecimento] = None):
+        """Chat engine ligado à base ativa (ou à informada), reaproveitando a memória da conversa"""
+        base = base or self._ativa
+        if base is None:
+            return None
+        return criar_chat_engine_hibrido(base.indices, memory=memory, system_prompt=base.system_prompt)
+
+    def shard_da_pasta(self, caminho: str) -> Optional[Shard]:
+        """Shard responsável por um caminho (a pasta mais específica que o contém)"""
+        base = self._ativa
+        if base is None:
+            return None
+        alvo = os.path.abspath(caminho)
+        melhor = None
+        for shard in base.shards:
+            raiz = os.path.abspath(shard.fonte)
+            if alvo == raiz or alvo.startswith(raiz.rstrip(os.sep) + os.sep):
+                if melhor is None or len(raiz) > len(os.path.abspath(melhor.fonte)):
+                    melhor = shard
+        return melhor
+
+    def get_status(self) -> dict:
+        with self._lock:
+            base = self._ativa
+            return {
+                'shards': [
+                    {'fonte': s.fonte, 'modo': s.modo, 'chunks': s.chunks, 'criado_em': s.criado_em}
+                    for s in (base.shards if base else ())
+                ],
+                'geracao': base.geracao if base else 0,
+                'versao': base.versao if base else None,
+                'chunks': base.chunks if base else 0,
+                'criada_em': base.criada_em if base else None,
+                'construindo': self._em_construcao,
+                'na_fila': len(self._na_fila),
+                'inicializado': self.inicializado,
+                'progresso': self.progresso.get_status(),
+                'ultimo_erro': self.ultimo_erro,
+                'ultima_duracao_s': round(self.ultima_duracao, 1) if self.ultima_duracao else None,
+            }
+
+    # ------------------------------------------------------------------
+    # Reconstrução
+    # ------------------------------------------------------------------
+
+    def reconstruir(self, fonte: str, modo: str = MODO_PRINCIPAL) -> Future:
+        """
+        Agenda a (re)construção do shard de uma pasta em segundo plano
+
+        Pedidos repetidos para uma pasta que ainda está na fila são unidos em um só.
+
+        Args:
+            fonte: Pasta de origem dos documentos
+            modo: MODO_PRINCIPAL (pasta de memória, índice salvo em storage/principal),
+                MODO_REFERENCIA (pasta externa, atualização incremental) ou
+                MODO_LOCAL (pasta local, índice só em memória)
+
+        Returns:
+            Future: Resolve para True se a base foi trocada
+        """
+        chave = os.path.normcase(os.path.abspath(fonte))
+        with self._lock:
+            futuro = self._na_fila.get(chave)
+            if futuro is None:
+                futuro = self._executor.submit(self._construir_e_trocar, fonte, modo)
+                self._na_fila[chave] = futuro
+            return futuro
+
+    def reconstruir_pasta_alterada(self, caminho: str) -> Optional[Future]:
+        """Callback do watcher: reconstrói só o shard que contém o caminho alterado"""
+        shard = self.shard_da_pasta(caminho)
+        if shard is None:
+            print(f"DEBUG: Nenhum shard cobre {caminho} - mudança ignorada")
+            return None
+        return self.reconstruir(shard.fonte, shard.modo)
+
+    def construir_agora(self, fonte: str, modo: str = MODO_PRINCIPAL) -> bool:
+        """Constrói e ativa o shard aguardando o resultado (usado no start)"""
+        return self.reconstruir(fonte, modo).result()
+
+    def remover_shard(self, fonte: str) -> Future:
+        """Agenda a saída de uma pasta da base ativa (os demais shards seguem sem reconstrução)"""
+        return self._executor.submit(self._remover_e_trocar, fonte)
+
+    def _remover_e_trocar(self, fonte: str) -> bool:
+        base = self._ativa
+        restantes = tuple(s for s in (base.shards if base else ()) if not _mesma_pasta(s.fonte, fonte))
+        if base is None or len(restantes) == len(base.shards):
+            return False
+        self._trocar(restantes)
+        print(f"DEBUG: Shard removido da base: {fonte}")
+        return True
+
+    def _trocar(self, shards: Tuple[Shard, ...]):
+        """
+        Monta o query engine da nova combinação de shards e troca a base ativa
+
+        Só roda na thread do executor (uma alteração por vez), então a base lida
+        no início é a mesma que está sendo substituída.
+        """
+        indices = [s.index for s in shards]
+        query_engine = criar_query_engine_hibrido(indices) if shards else None
+        versao = versao_indices(indices) if shards else ""
+        with self._lock:
+            self._geracao += 1
+            self._ativa = (BaseConhecimento(shards=shards, query_engine=query_engine, geracao=self._geracao,
+                                            versao=versao)
+                           if shards else None)
+
+    def _construir_e_trocar(self, fonte: str, modo: str) -> bool:
+        with self._lock:
+            self._na_fila.pop(os.path.normcase(os.path.abspath(fonte)), None)
+            self._em_construcao = fonte
+        inicio = time.perf_counter()
+        self.progresso.iniciar(fonte)
+        try:
+            if not self.inicializado:
+                raise RuntimeError(f"Modelos não inicializados ({self.ultimo_erro})")
+            print(f"DEBUG: Construindo shard ({modo}) a partir de: {fonte}")
+            index = self._construir_indice(fonte, modo)
+            if index is None:
+                self.ultimo_erro = f"Nenhum documento válido encontrado em {fonte}"
+                print(f"DEBUG: {self.ultimo_erro} - base atual mantida")
+                return False
+
+            novo = Shard(fonte=fonte, modo=modo, index=index, chunks=len(index.index_struct.nodes_dict))
+            base = self._ativa
+            shards = tuple(s for s in (base.shards if base else ()) if not _mesma_pasta(s.fonte, fonte)) + (novo,)
+            self._trocar(shards)
+            self.ultimo_erro = None
+            print(f"DEBUG: Base de conhecimento trocada (geração {self._geracao}, shard {fonte})")
+            return True
+        except Exception as e:
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            print("=" * 60)
+            print("--- ERRO AO CONSTRUIR A BASE DE CONHECIMENTO (base atual mantida) ---")
+            print(f"Tipo do erro: {type(e).__name__}")
+            print(f"Mensagem: {str(e)}")
+            print("Traceback completo:")
+            traceback.print_exc()
+            print("=" * 60)
+            return False
+        finally:
+            self.ultima_duracao = time.perf_counter() - inicio
+            self.progresso.concluir()
+            with self._lock:
+                self._em_construcao = None
+
+    def _construir_indice(self, fonte: str, modo: str):
+        if not os.path.isdir(fonte):
+            print(f"DEBUG: Pasta não encontrada: {fonte}")
+            return None
+
+        if modo == MODO_REFERENCIA:
+            arquivos = listar_arquivos_referencia(fonte)
+            if not arquivos:
+                return None
+            index, estatisticas = atualizar_indice_incremental(
+                arquivos, self.modelo_embedding, persist_dir=pasta_storage_referencia(fonte),
+                progresso=self.progresso,
+            )
+            print(f"DEBUG: Índice por referência atualizado: {estatisticas}")
+            return index
+
+        if self._preparar_pasta:
+            # Vídeos e imagens viram texto antes da indexação
+            self.progresso.definir_fase("preparando arquivos")
+            self._preparar_pasta(fonte)
+        arquivos = listar_arquivos_validos(fonte)
+        print(f"DEBUG: {len(arquivos)} arquivos válidos encontrados")
+        if not arquivos:
+            return None
+
+        if modo == MODO_LOCAL:
+            return construir_indice_streaming(arquivos, progresso=self.progresso, persistir=False)
+
+        index, do_disco = carregar_ou_construir_indice(arquivos, self.modelo_embedding, progresso=self.progresso)
+        print(f"DEBUG: Índice {'carregado do disco' if do_disco else 'reconstruído'}")
+        return index
@@ -16,12 +16,12 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from core_logic import AFICore
-    from config import Config
+    from core_logic import gerar_texto_cacheado, verificar_conexao_ollama
+    from config import LLM_CACHE_CONFIG
+    from frases_pool import LIMITE_STORY, obter_pool_frases
 except ImportError as e:
     logging.warning(f"Módulos AFI não encontrados: {e}")
-    AFICore = None
-    Config = None
+    gerar_texto_cacheado = None
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +34,7 @@ class IntegradorAFIMidia:
         """
         Inicializa o integrador AFI-Mídia.
         """
-        self.afi_core = None
-        self.config = None
+        self.afi_core = False
         self.inicializar_afi()
         
     def inicializar_afi(self):
@@ -43,9 +42,8 @@ class IntegradorAFIMidia:
         Inicializa a conexão com o AFI.
         """
         try:
-            if Config and AFICore:
-                self.config = Config()
-                self.afi_core = AFICore()
+            if gerar_texto_cacheado and verificar_conexao_ollama():
+                self.afi_core = True
                 logger.info("✅ AFI Core inicializado com sucesso")
             else:
                 logger.warning("⚠️ AFI Core não disponível - usando modo simulado")
@@ -65,6 +63,15 @@ class IntegradorAFIMidia:
         try:
             nome_arquivo = Path(caminho_video).stem
             
+            # Frase pronta do estoque, no estilo musical sugerido pelo nome do arquivo
+            if gerar_texto_cacheado:
+                pool = obter_pool_frases(repor=False)
+                estilo = self._analisar_simulado(nome_arquivo)[1]
+                frase = pool.retirar(estilo, LIMITE_STORY) if pool else None
+                if frase:
+                    logger.info(f"🎞️ Frase do estoque: Frase='{frase}', Estilo='{estilo}'")
+                    return frase, estilo
+            
             if self.afi_core:
                 # Usar AFI real para análise
                 return self._analisar_com_afi_real(caminho_video, nome_arquivo)
@@ -95,8 +102,8 @@ class IntegradorAFIMidia:
             ESTILO: [estilo musical]
             """
             
-            # Consultar AFI
-            resposta = self.afi_core.processar_consulta(prompt_analise)
+            # Consultar AFI (o mesmo vídeo/nome reaproveita as frases já geradas)
+            resposta = gerar_texto_cacheado(prompt_analise, variantes=LLM_CACHE_CONFIG["variantes_criativas"])
             
             # Extrair frase e estilo da resposta
             frase, estilo = self._extrair_frase_estilo(resposta)
@@ -0,0 +1,206 @@
+"""
+🧭 AFI v4.0 - Roteador de Intenções do Chat
+Decide, antes de chamar qualquer modelo, o que fazer com o prompt
+
+``processar_prompt_geral`` percorria uma lista de palavras-chave por
+intenção (``any(palavra in prompt_lower ...)``, dezenas de buscas por
+mensagem) e fazia ``os.listdir("./memoria")`` em toda pergunta só para saber
+se a pasta tinha arquivos.
+
+Aqui todas as palavras-chave viram uma única expressão regular (em forma de
+trie) compilada uma vez: uma passada pelo prompt encontra todas as
+ocorrências, inclusive sobrepostas, e a intenção de maior prioridade vence,
+exatamente como a sequência de ``if`` antiga. Se nenhuma palavra-chave
+aparece, um classificador plugável (``INTENT_ROUTER_CONFIG["classificador"]``)
+pode sugerir a intenção. O "memória tem arquivos" fica em cache: o file watcher
+e ``carregar_memoria`` o invalidam, e um TTL cobre mudanças sem watcher.
+"""
+
+import importlib
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from config import FOLDERS_CONFIG, INTENT_ROUTER_CONFIG
+
+INTENCAO_TRANSCRICAO = "transcricao"
+INTENCAO_IMAGEM = "imagem"
+INTENCAO_PESQUISA = "pesquisa"
+INTENCAO_PRODUTOS = "produtos"
+INTENCAO_GERAL = "geral"
+
+# Em ordem de prioridade: com palavras de duas intenções no prompt, vale a primeira
+PALAVRAS_INTENCOES: Dict[str, List[str]] = {
+    INTENCAO_TRANSCRICAO: ['transcreva', 'transcrever', 'roteiro do vídeo', 'áudio do vídeo', 'fala do vídeo'],
+    INTENCAO_IMAGEM: ['gere uma imagem', 'desenhe', 'crie uma imagem', 'gerar imagem', 'criar desenho'],
+    INTENCAO_PESQUISA: ['pesquise sobre', 'notícias de', 'qual o preço atual de', 'quem é', 'o que é', 'pesquisar',
+                        'buscar na internet', 'procurar na web'],
+    INTENCAO_PRODUTOS: ['produto', 'equipamento', 'orçamento', 'preço', 'finiti', 'memoria', 'arquivo'],
+}
+
+# Classificador: recebe o prompt em minúsculas e devolve uma intenção (ou None)
+Classificador = Callable[[str], Optional[str]]
+
+
+class Rota(NamedTuple):
+    intencao: str
+    palavra: Optional[str]  # Palavra-chave que decidiu (None = classificador ou geral)
+
+
+def _trie_regex(no: dict) -> str:
+    ramos = [re.escape(letra) + _trie_regex(filho) for letra, filho in sorted(no.items()) if letra]
+    if not ramos:
+        return ""
+    grupo = ramos[0] if len(ramos) == 1 and "" not in no else f"(?:{'|'.join(ramos)})"
+    # Palavra que termina aqui e também é prefixo de outra: o resto é opcional
+    return f"{grupo}?" if "" in no else grupo
+
+
+def compilar_padrao(palavras: List[str]) -> "re.Pattern":
+    """
+    Todas as palavras-chave numa regex em forma de trie, dentro de um lookahead
+
+    Prefixos comuns ("transcrev", "pesquis", "cri") viram um ramo só, então
+    o custo quase não cresce com o número de palavras. O lookahead de largura
+    zero faz ``findall`` testar todas as posições: uma palavra que começa
+    dentro de outra já casada também é encontrada.
+    """
+    trie: dict = {}
+    for palavra in palavras:
+        no = trie
+        for letra in palavra:
+            no = no.setdefault(letra, {})
+        no[""] = {}
+    return re.compile(f"(?=({_trie_regex(trie)}))")
+
+
+def carregar_classificador(caminho: Optional[str]) -> Optional[Classificador]:
+    """``"modulo:funcao"`` importado sob demanda (vazio/None = sem classificador)"""
+    if not caminho:
+        return None
+    modulo, _, funcao = caminho.partition(":")
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+class RoteadorIntencoes:
+    """
+    🧭 Intenção do prompt por uma regex compilada, com classificador de reserva
+    """
+
+    def __init__(self, palavras_intencoes: Optional[Dict[str, List[str]]] = None,
+                 classificador: Optional[Classificador] = None):
+        self.palavras_intencoes = palavras_intencoes or PALAVRAS_INTENCOES
+        self.intencoes = list(self.palavras_intencoes)
+        # Palavra -> posição da intenção (a mesma palavra em duas intenções fica com a de maior prioridade)
+        self._prioridades: Dict[str, int] = {}
+        for indice, palavras in enumerate(self.palavras_intencoes.values()):
+            for palavra in palavras:
+                self._prioridades.setdefault(palavra.lower(), indice)
+        self._padrao = compilar_padrao(list(self._prioridades))
+        self.classificador = classificador
+
+    def rotear(self, prompt: str) -> Rota:
+        """
+        A intenção do prompt
+
+        Returns:
+            Rota: A intenção de maior prioridade com palavra-chave no prompt;
+            senão a do classificador (se houver e reconhecer o prompt); senão
+            ``INTENCAO_GERAL``
+        """
+        prompt_lower = prompt.lower()
+        encontradas = self._padrao.findall(prompt_lower)
+        if encontradas:
+            intencao = self.intencoes[min(self._prioridades[palavra] for palavra in encontradas)]
+            # A primeira palavra da lista presente no prompt, como no roteador antigo
+            palavra = next(p for p in self.palavras_intencoes[intencao] if p in prompt_lower)
+            return Rota(intencao, palavra)
+
+        if self.classificador is not None:
+            intencao = self.classificador(prompt_lower)
+            if intencao in self.palavras_intencoes:
+                return Rota(intencao, None)
+        return Rota(INTENCAO_GERAL, None)
+
+
+class EstadoMemoria:
+    """
+    📁 "A pasta de memória tem arquivos?" sem ir ao disco a cada pergunta
+
+    O resultado vale até ``invalidar()`` (file watcher, ``carregar_memoria``)
+    ou até passar o TTL, para mudanças feitas sem o watcher ativo.
+    """
+
+    def __init__(self, pasta: Optional[str] = None, ttl_s: Optional[float] = None):
+        self.pasta = pasta or FOLDERS_CONFIG["memoria"]
+        self.ttl_s = INTENT_ROUTER_CONFIG["ttl_memoria_s"] if ttl_s is None else ttl_s
+        self._lock = threading.Lock()
+        self._valor: Optional[bool] = None
+        self._verificado_em = 0.0
+        self.consultas_disco = 0
+
+    def tem_arquivos(self) -> bool:
+        with self._lock:
+            if self._valor is not None and time.monotonic() - self._verificado_em < self.ttl_s:
+                return self._valor
+        try:
+            with os.scandir(self.pasta) as entradas:
+                valor = any(True for _ in entradas)
+        except OSError:
+            valor = False
+        with self._lock:
+            self._valor = valor
+            self._verificado_em = time.monotonic()
+            self.consultas_disco += 1
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._valor = None
+
+    def contem_caminho(self, caminho: str) -> bool:
+        """O caminho é a própria pasta de memória ou fica dentro dela"""
+        pasta = os.path.abspath(self.pasta)
+        try:
+            return os.path.commonpath([pasta, os.path.abspath(caminho)]) == pasta
+        except ValueError:
+            # Outro drive (Windows)
+            return False
+
+
+_roteador_global = None
+_estado_memoria_global = None
+_globais_lock = threading.Lock()
+
+
+def obter_roteador() -> RoteadorIntencoes:
+    """Roteador compartilhado pelo processo (regex compilada uma vez)"""
+    global _roteador_global
+    with _globais_lock:
+        if _roteador_global is None:
+            _roteador_global = RoteadorIntencoes(
+                classificador=carregar_classificador(INTENT_ROUTER_CONFIG["classificador"])
+            )
+        return _roteador_global
+
+
+def obter_estado_memoria() -> EstadoMemoria:
+    global _estado_memoria_global
+    with _globais_lock:
+        if _estado_memoria_global is None:
+            _estado_memoria_global = EstadoMemoria()
+        return _estado_memoria_global
+
+
+def invalidar_cache_memoria(*caminhos: str):
+    """
+    Chamado quando arquivos mudam: a próxima pergunta relê a pasta de memória
+
+    Com ``caminhos`` (eventos do file watcher), só invalida se algum deles
+    estiver na pasta de memória.
+    """
+    estado = obter_estado_memoria()
+    if not caminhos or any(estado.contem_caminho(c) for c in caminhos if c):
+        estado.invalidar()
@@ -0,0 +1,159 @@
+"""
+🗃️ AFI v4.0 - Cache Persistente de Gerações do LLM
+Completions do Ollama reaproveitadas entre vídeos, execuções e processos
+
+O guardião manda o mesmo prompt de marketing para cada vídeo novo, e o
+estúdio e a integração de mídia usam modelos de prompt quase fixos: cada
+vídeo pagava 10-60 s por uma frase que já tinha sido gerada.
+
+A chave é o hash de (modelo, prompt, opções de geração). Para prompts
+criativos a mesma chave guarda até N variantes: enquanto houver menos de N,
+cada pedido gera uma nova; com N guardadas, uma delas é sorteada sem chamar
+o LLM. O cache é podado por quantidade e tamanho (LRU).
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from config import LLM_CACHE_CONFIG
+
+
+class CacheGeracoes:
+    """
+    🗃️ Gerações do LLM em SQLite, com variantes por prompt e poda LRU
+    """
+
+    def __init__(self, caminho: Optional[str] = None, max_entradas: Optional[int] = None,
+                 tamanho_maximo_mb: Optional[float] = None):
+        self.caminho = caminho or LLM_CACHE_CONFIG["arquivo"]
+        self.max_entradas = max_entradas or LLM_CACHE_CONFIG["max_entradas"]
+        self.tamanho_maximo_bytes = int(
+            (tamanho_maximo_mb or LLM_CACHE_CONFIG["tamanho_maximo_mb"]) * 1024 * 1024
+        )
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geracoes ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, chave TEXT NOT NULL, modelo TEXT NOT NULL,"
+            " prompt TEXT NOT NULL, resposta TEXT NOT NULL, tamanho INTEGER NOT NULL,"
+            " criado_em REAL NOT NULL, ultimo_uso REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_geracoes_chave ON geracoes(chave)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_geracoes_uso ON geracoes(ultimo_uso)")
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def montar_chave(modelo: str, prompt: str, opcoes: Optional[dict] = None) -> str:
+        partes = [modelo, prompt, json.dumps(opcoes or {}, sort_keys=True)]
+        return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+    def get(self, modelo: str, prompt: str, opcoes: Optional[dict] = None, variantes: int = 1) -> Optional[str]:
+        """
+        Uma das variantes guardadas, sorteada (ou None)
+
+        Retorna None enquanto houver menos de ``variantes`` guardadas, para
+        que o chamador gere mais uma.
+        """
+        chave = self.montar_chave(modelo, prompt, opcoes)
+        with self._lock:
+            linhas = self._db.execute(
+                "SELECT id, resposta FROM geracoes WHERE chave = ?", (chave,)
+            ).fetchall()
+            if len(linhas) < max(1, variantes):
+                self.misses += 1
+                return None
+            id_escolhido, resposta = random.choice(linhas)
+            self._db.execute("UPDATE geracoes SET ultimo_uso = ? WHERE id = ?", (time.time(), id_escolhido))
+            self._db.commit()
+            self.hits += 1
+            return resposta
+
+    def put(self, modelo: str, prompt: str, resposta: str, opcoes: Optional[dict] = None):
+        """Guarda mais uma variante e poda o cache se passar dos limites"""
+        agora = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO geracoes (chave, modelo, prompt, resposta, tamanho, criado_em, ultimo_uso)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.montar_chave(modelo, prompt, opcoes), modelo, prompt, resposta,
+                 len(prompt.encode("utf-8")) + len(resposta.encode("utf-8")), agora, agora),
+            )
+            self._podar()
+            self._db.commit()
+
+    def gerar(self, modelo: str, prompt: str, gerar: Callable[[], Optional[str]],
+              opcoes: Optional[dict] = None, variantes: int = 1) -> Optional[str]:
+        """
+        Resposta do cache ou de ``gerar()`` (guardada se não vier vazia)
+
+        Args:
+            gerar: Chama o LLM e retorna o texto (None/vazio não é guardado)
+            variantes: Quantas respostas diferentes acumular antes de sortear
+        """
+        resposta = self.get(modelo, prompt, opcoes, variantes)
+        if resposta is not None:
+            return resposta
+        resposta = gerar()
+        if resposta:
+            self.put(modelo, prompt, resposta, opcoes)
+        return resposta
+
+    def _podar(self):
+        total, tamanho = self._db.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM geracoes").fetchone()
+        while total > self.max_entradas or tamanho > self.tamanho_maximo_bytes:
+            # Remover as menos usadas em blocos de 10% para não podar a cada put
+            excesso = max(total - self.max_entradas, 1, total // 10)
+            self._db.execute(
+                "DELETE FROM geracoes WHERE id IN "
+                "(SELECT id FROM geracoes ORDER BY ultimo_uso ASC LIMIT ?)", (excesso,)
+            )
+            total, tamanho = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM geracoes"
+            ).fetchone()
+
+    def limpar(self):
+        with self._lock:
+            self._db.execute("DELETE FROM geracoes")
+            self._db.commit()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            total, prompts, tamanho = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT chave), COALESCE(SUM(tamanho), 0) FROM geracoes"
+            ).fetchone()
+        consultas = self.hits + self.misses
+        return {
+            'entradas': total,
+            'prompts': prompts,
+            'tamanho_bytes': tamanho,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / consultas, 3) if consultas else 0.0,
+        }
+
+
+_cache_global = None
+_cache_global_lock = threading.Lock()
+
+
+def obter_cache_geracoes() -> Optional[CacheGeracoes]:
+    """Cache de gerações compartilhado pelo processo (None se desabilitado)"""
+    global _cache_global
+    if not LLM_CACHE_CONFIG["habilitado"]:
+        return None
+    with _cache_global_lock:
+        if _cache_global is None:
+            _cache_global = CacheGeracoes()
+        return _cache_global
@@ -0,0 +1,435 @@
+"""
+🚦 AFI v4.0 - Gateway do LLM
+Fila com prioridade e limite de concorrência na frente do Ollama local
+
+O chat, o estúdio de vídeo e os serviços em segundo plano (guardião,
+descrição de imagens da memória) usam o mesmo Ollama. Sem coordenação, um
+lote de frases de marketing ocupa o modelo e a pergunta de um vendedor
+espera atrás dele.
+
+O gateway agenda vagas num event loop asyncio próprio (uma thread):
+
+- no máximo ``max_concorrencia`` gerações ao mesmo tempo;
+- vagas livres vão para o pedido de maior prioridade (chat > estúdio >
+  segundo plano) e, dentro da mesma prioridade, por ordem de chegada;
+- ``vagas_reservadas_interativas`` nunca são ocupadas por estúdio nem
+  segundo plano, então o chat não espera uma geração longa terminar;
+- quem desiste antes de receber a vaga (timeout, tarefa cancelada) sai da
+  fila sem ocupar o modelo.
+
+Código síncrono usa ``vaga()`` / ``gerar_sync()``; código asyncio usa
+``gerar()`` de qualquer event loop.
+
+Pedidos idênticos simultâneos (vários vídeos chegando juntos, duas sessões
+com a mesma pergunta) viram uma geração só: ``ColapsadorGeracoes`` pendura
+os repetidos na geração em andamento e entrega a todos o mesmo resultado.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from config import LLM_GATEWAY_CONFIG
+
+PRIORIDADE_INTERATIVA = 0  # Chat com o vendedor esperando
+PRIORIDADE_ESTUDIO = 1  # Estúdio de vídeo acionado pela interface
+PRIORIDADE_SEGUNDO_PLANO = 2  # Guardião, descrição de imagens, lotes
+
+NOMES_PRIORIDADES = {
+    PRIORIDADE_INTERATIVA: "interativa",
+    PRIORIDADE_ESTUDIO: "estudio",
+    PRIORIDADE_SEGUNDO_PLANO: "segundo_plano",
+}
+
+# Quantas esperas recentes entram nos percentis de cada prioridade
+JANELA_ESPERAS = 200
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class _MetricasPrioridade:
+    def __init__(self):
+        self.concedidas = 0
+        self.canceladas = 0
+        self.esperas = deque(maxlen=JANELA_ESPERAS)
+
+
+class _Pedido:
+    def __init__(self, prioridade: int, avisar):
+        self.prioridade = prioridade
+        self.avisar = avisar  # Chamado (na thread do loop) quando a vaga é concedida
+        self.inicio = time.perf_counter()
+        self.concedido = False
+        self.abandonado = False
+
+
+def chave_geracao(*partes: Any) -> str:
+    """Chave estável para pedidos idênticos (payload, modelo, prompt...)"""
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _GeracaoEmVoo:
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro: Optional[BaseException] = None
+
+
+class _StreamEmVoo:
+    """Trechos de um stream guardados para todos os consumidores, inclusive os que chegam depois"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.trechos = []
+        self.terminado = False
+        self.erro: Optional[BaseException] = None
+        self.consumidores = 0
+
+
+class ColapsadorGeracoes:
+    """
+    🪢 Deduplicação de gerações em andamento ("single flight")
+
+    O primeiro pedido de uma chave gera; os idênticos que chegam enquanto
+    ele roda esperam e recebem o mesmo resultado (ou a mesma exceção).
+    Streams são bombeados por uma thread própria e repassados trecho a
+    trecho a cada consumidor; se todos desistirem, a geração é fechada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_voo: Dict[str, Any] = {}
+        self.geracoes = 0
+        self.coalescidas = 0
+
+    def executar(self, chave: str, funcao: Callable[[], Any]) -> Any:
+        with self._lock:
+            voo = self._em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[chave] = _GeracaoEmVoo()
+                self.geracoes += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            voo.pronto.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = funcao()
+            return voo.resultado
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_voo.pop(chave, None)
+            voo.pronto.set()
+
+    def iterar(self, chave: str, gerar_trechos: Callable[[], Iterator[str]]) -> Iterator[str]:
+        with self._lock:
+            voo = self._em_voo.get(chave)
+            if voo is None:
+                voo = self._em_voo[chave] = _StreamEmVoo()
+                self.geracoes += 1
+                threading.Thread(target=self._bombear, args=(chave, voo, gerar_trechos),
+                                 name="afi-stream-compartilhado", daemon=True).start()
+            else:
+                self.coalescidas += 1
+            with voo.cond:
+                voo.consumidores += 1
+        return self._consumir(voo)
+
+    def _bombear(self, chave: str, voo: _StreamEmVoo, gerar_trechos: Callable[[], Iterator[str]]):
+        trechos = None
+        try:
+            trechos = gerar_trechos()
+            for trecho in trechos:
+                with voo.cond:
+                    if voo.consumidores == 0:
+                        break
+                    voo.trechos.append(trecho)
+                    voo.cond.notify_all()
+        except BaseException as e:
+            voo.erro = e
+        finally:
+            if trechos is not None and hasattr(trechos, "close"):
+                trechos.close()
+            with self._lock:
+                if self._em_voo.get(chave) is voo:
+                    del self._em_voo[chave]
+            with voo.cond:
+                voo.terminado = True
+                voo.cond.notify_all()
+
+    @staticmethod
+    def _consumir(voo: _StreamEmVoo) -> Iterator[str]:
+        posicao = 0
+        try:
+            while True:
+                with voo.cond:
+                    while posicao >= len(voo.trechos) and not voo.terminado:
+                        voo.cond.wait()
+                    if posicao < len(voo.trechos):
+                        trecho = voo.trechos[posicao]
+                    elif voo.erro is not None:
+                        raise voo.erro
+                    else:
+                        return
+                posicao += 1
+                yield trecho
+        finally:
+            with voo.cond:
+                voo.consumidores -= 1
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'geracoes': self.geracoes,
+                'coalescidas': self.coalescidas,
+                'em_andamento': len(self._em_voo),
+            }
+
+
+class GatewayLLM:
+    """
+    🚦 Semáforo com prioridades agendado num event loop asyncio
+
+    Fila e vagas só são tocadas pela thread do loop; as outras threads
+    mandam pedidos, desistências e devoluções por ``call_soon_threadsafe``.
+    Como conceder e desistir rodam na mesma thread, uma vaga concedida no
+    instante da desistência é devolvida e não se perde.
+    """
+
+    def __init__(self, max_concorrencia: Optional[int] = None, vagas_reservadas_interativas: Optional[int] = None):
+        self.max_concorrencia = max(1, max_concorrencia or LLM_GATEWAY_CONFIG["max_concorrencia"])
+        reservadas = (vagas_reservadas_interativas if vagas_reservadas_interativas is not None
+                      else LLM_GATEWAY_CONFIG["vagas_reservadas_interativas"])
+        self.vagas_reservadas_interativas = min(max(0, reservadas), self.max_concorrencia - 1)
+
+        self._em_uso = 0
+        self._em_uso_nao_interativo = 0
+        self._fila = []  # heap de (prioridade, ordem, pedido)
+        self._ordem = itertools.count()
+        self._metricas = {p: _MetricasPrioridade() for p in NOMES_PRIORIDADES}
+        self.coalescedor = ColapsadorGeracoes()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="afi-gateway-llm", daemon=True)
+        self._thread.start()
+
+    # --- agendamento (só na thread do loop) ---
+
+    def _pode_conceder(self, prioridade: int) -> bool:
+        if self._em_uso >= self.max_concorrencia:
+            return False
+        if prioridade == PRIORIDADE_INTERATIVA:
+            return True
+        return self._em_uso_nao_interativo < self.max_concorrencia - self.vagas_reservadas_interativas
+
+    def _despachar(self):
+        """Concede vagas livres aos primeiros da fila que podem recebê-las"""
+        restantes = []
+        while self._fila:
+            item = heapq.heappop(self._fila)
+            pedido = item[2]
+            if pedido.abandonado:
+                continue
+            if not self._pode_conceder(pedido.prioridade):
+                # Estúdio/segundo plano barrados pela reserva não travam quem vem atrás
+                restantes.append(item)
+                continue
+            self._em_uso += 1
+            if pedido.prioridade != PRIORIDADE_INTERATIVA:
+                self._em_uso_nao_interativo += 1
+            metricas = self._metricas[pedido.prioridade]
+            metricas.concedidas += 1
+            metricas.esperas.append(time.perf_counter() - pedido.inicio)
+            pedido.concedido = True
+            pedido.avisar()
+        for item in restantes:
+            heapq.heappush(self._fila, item)
+
+    def _enfileirar(self, pedido: _Pedido):
+        heapq.heappush(self._fila, (pedido.prioridade, next(self._ordem), pedido))
+        self._despachar()
+
+    def _abandonar(self, pedido: _Pedido):
+        if pedido.concedido:
+            self._liberar(pedido.prioridade)
+        elif not pedido.abandonado:
+            pedido.abandonado = True
+            self._metricas[pedido.prioridade].canceladas += 1
+
+    def _liberar(self, prioridade: int):
+        self._em_uso -= 1
+        if prioridade != PRIORIDADE_INTERATIVA:
+            self._em_uso_nao_interativo -= 1
+        self._despachar()
+
+    @staticmethod
+    def _validar(prioridade: int):
+        if prioridade not in NOMES_PRIORIDADES:
+            raise ValueError(f"Prioridade desconhecida: {prioridade}")
+
+    # --- interface síncrona ---
+
+    @contextmanager
+    def vaga(self, prioridade: int = PRIORIDADE_INTERATIVA, timeout: Optional[float] = None):
+        """
+        Bloqueia até receber uma vaga e a devolve ao sair do bloco
+
+        Raises:
+            TimeoutError: Sem vaga em ``timeout`` segundos (o pedido sai da fila)
+        """
+        self._validar(prioridade)
+        timeout = timeout if timeout is not None else LLM_GATEWAY_CONFIG["timeout_espera_s"]
+        concedida = threading.Event()
+        pedido = _Pedido(prioridade, concedida.set)
+        self._loop.call_soon_threadsafe(self._enfileirar, pedido)
+        try:
+            if not concedida.wait(timeout):
+                raise TimeoutError(f"Sem vaga no LLM em {timeout}s ({NOMES_PRIORIDADES[prioridade]})")
+        except BaseException:
+            self._loop.call_soon_threadsafe(self._abandonar, pedido)
+            raise
+        try:
+            yield
+        finally:
+            self._loop.call_soon_threadsafe(self._liberar, prioridade)
+
+    def gerar_sync(self, payload: dict, prioridade: int = PRIORIDADE_INTERATIVA,
+                   timeout_espera: Optional[float] = None, **kwargs):
+        """
+        POST /api/generate pelo cliente compartilhado, dentro de uma vaga
+
+        Payloads idênticos em andamento compartilham a mesma requisição
+        (e a mesma ``Response``, já lida). O ``keep_alive`` do modelo é
+        acrescentado e cargas frias são registradas (residência dos modelos).
+        """
+        from model_residency import obter_gerenciador_modelos
+        from ollama_client import obter_cliente_ollama
+
+        gerenciador = obter_gerenciador_modelos()
+        if gerenciador is not None:
+            payload = gerenciador.preparar(payload)
+
+        def _gerar():
+            with self.vaga(prioridade, timeout_espera):
+                resposta = obter_cliente_ollama().post("/api/generate", json=payload, **kwargs)
+            if gerenciador is not None and not payload.get("stream"):
+                gerenciador.registrar_http(resposta)
+            return resposta
+
+        if payload.get("stream"):
+            return _gerar()
+        return self.coalescedor.executar(chave_geracao("generate", payload), _gerar)
+
+    def _iterar_com_vaga(self, gerar_trechos, prioridade: int):
+        with self.vaga(prioridade):
+            yield from gerar_trechos()
+
+    def iterar_com_vaga(self, gerar_trechos, prioridade: int = PRIORIDADE_INTERATIVA,
+                        chave: Optional[str] = None) -> Iterator[str]:
+        """
+        Repassa um stream de trechos segurando a vaga até ele terminar (ou ser fechado)
+
+        Com ``chave``, streams idênticos em andamento viram um só, repassado
+        a todos os consumidores.
+        """
+        if chave is None:
+            return self._iterar_com_vaga(gerar_trechos, prioridade)
+        return self.coalescedor.iterar(chave, lambda: self._iterar_com_vaga(gerar_trechos, prioridade))
+
+    # --- interface asyncio ---
+
+    async def gerar(self, payload: dict, prioridade: int = PRIORIDADE_INTERATIVA, **kwargs):
+        """
+        Versão asyncio de ``gerar_sync``, para qualquer event loop
+
+        Cancelar a tarefa enquanto ela espera na fila libera o lugar; a
+        requisição HTTP já enviada ao Ollama corre até o fim numa thread.
+        """
+        from model_residency import obter_gerenciador_modelos
+        from ollama_client import obter_cliente_ollama
+
+        self._validar(prioridade)
+        gerenciador = obter_gerenciador_modelos()
+        if gerenciador is not None:
+            payload = gerenciador.preparar(payload)
+        loop = asyncio.get_running_loop()
+        concedida = loop.create_future()
+        pedido = _Pedido(prioridade, lambda: loop.call_soon_threadsafe(
+            lambda: concedida.done() or concedida.set_result(True)))
+        self._loop.call_soon_threadsafe(self._enfileirar, pedido)
+        try:
+            await concedida
+        except asyncio.CancelledError:
+            self._loop.call_soon_threadsafe(self._abandonar, pedido)
+            raise
+        try:
+            resposta = await loop.run_in_executor(
+                None, lambda: obter_cliente_ollama().post("/api/generate", json=payload, **kwargs)
+            )
+        finally:
+            self._loop.call_soon_threadsafe(self._liberar, prioridade)
+        if gerenciador is not None and not payload.get("stream"):
+            gerenciador.registrar_http(resposta)
+        return resposta
+
+    def get_status(self) -> dict:
+        """Vagas em uso, fila e espera (p50/p95) por prioridade"""
+        async def _coletar():
+            na_fila = {p: 0 for p in NOMES_PRIORIDADES}
+            for prioridade, _, pedido in self._fila:
+                if not pedido.abandonado:
+                    na_fila[prioridade] += 1
+            return {
+                'max_concorrencia': self.max_concorrencia,
+                'em_uso': self._em_uso,
+                'coalescidas': self.coalescedor.get_status()['coalescidas'],
+                'prioridades': {
+                    NOMES_PRIORIDADES[p]: {
+                        'na_fila': na_fila[p],
+                        'concedidas': m.concedidas,
+                        'canceladas': m.canceladas,
+                        'espera_s_p50': round(_percentil(m.esperas, 0.5), 3),
+                        'espera_s_p95': round(_percentil(m.esperas, 0.95), 3),
+                    }
+                    for p, m in self._metricas.items()
+                },
+            }
+
+        return asyncio.run_coroutine_threadsafe(_coletar(), self._loop).result(5)
+
+    def parar(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_gateway_global = None
+_gateway_global_lock = threading.Lock()
+
+
+def obter_gateway_llm() -> GatewayLLM:
+    """Gateway do LLM compartilhado pelo processo (criado sob demanda)"""
+    global _gateway_global
+    with _gateway_global_lock:
+        if _gateway_global is None:
+            _gateway_global = GatewayLLM()
+        return _gateway_global
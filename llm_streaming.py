@@ -0,0 +1,132 @@
+"""
+🌊 AFI v4.0 - Geração em Streaming
+Tokens do LLM entregues à medida que chegam, com medição de latência
+
+Cada trecho do stream do Ollama (``/api/generate`` com ``"stream": true``)
+corresponde a um token; ``MedidorStream`` mede o tempo até o primeiro token
+(TTFT) e a taxa de tokens/s de cada resposta e acumula tudo num relatório.
+"""
+
+import json
+import time
+import threading
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+from config import MODELS_CONFIG
+
+# Quantas respostas recentes entram nos percentis
+JANELA_RESPOSTAS = 200
+
+
+def stream_ollama_generate(prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                           cliente=None) -> Iterator[str]:
+    """
+    Gera a resposta do Ollama em streaming
+
+    Args:
+        model: Modelo do Ollama (padrão: o do chat em MODELS_CONFIG)
+        timeout: Segundos máximos de espera entre trechos (padrão: o de /api/generate)
+        cliente: ClienteOllama (padrão: o compartilhado pelo processo)
+
+    Yields:
+        str: Trechos de texto (≈ 1 token cada)
+    """
+    from model_residency import obter_gerenciador_modelos
+
+    if cliente is None:
+        from ollama_client import obter_cliente_ollama
+        cliente = obter_cliente_ollama()
+
+    payload = {"model": model or MODELS_CONFIG["chat"], "prompt": prompt, "stream": True}
+    gerenciador = obter_gerenciador_modelos()
+    if gerenciador is not None:
+        payload = gerenciador.preparar(payload)
+    with cliente.post("/api/generate", json=payload, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro na API do Ollama: {response.status_code}")
+        for linha in response.iter_lines():
+            if not linha:
+                continue
+            dados = json.loads(linha)
+            if dados.get("error"):
+                raise RuntimeError(f"Erro na API do Ollama: {dados['error']}")
+            trecho = dados.get("response", "")
+            if trecho:
+                yield trecho
+            if dados.get("done"):
+                if gerenciador is not None:
+                    gerenciador.registrar_geracao(dados)
+                break
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class RelatorioStreaming:
+    """📈 TTFT e tokens/s das respostas em streaming"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.respostas = 0
+        self._ttfts = deque(maxlen=JANELA_RESPOSTAS)
+        self._taxas = deque(maxlen=JANELA_RESPOSTAS)
+
+    def registrar(self, ttft: Optional[float], tokens_por_segundo: float):
+        with self._lock:
+            self.respostas += 1
+            if ttft is not None:
+                self._ttfts.append(ttft)
+            if tokens_por_segundo:
+                self._taxas.append(tokens_por_segundo)
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'respostas': self.respostas,
+                'ttft_s_p50': round(_percentil(self._ttfts, 0.5), 3),
+                'ttft_s_p95': round(_percentil(self._ttfts, 0.95), 3),
+                'tokens_por_segundo_medio': (round(sum(self._taxas) / len(self._taxas), 1)
+                                             if self._taxas else 0.0),
+            }
+
+
+relatorio_streaming = RelatorioStreaming()
+
+
+class MedidorStream:
+    """
+    ⏱️ Repassa os trechos de um stream medindo TTFT e tokens/s
+
+    As medidas ficam disponíveis ao fim da iteração e são registradas no
+    relatório global.
+    """
+
+    def __init__(self, trechos: Iterable[str], relatorio: Optional[RelatorioStreaming] = None):
+        self._trechos = trechos
+        self._relatorio = relatorio or relatorio_streaming
+        self.ttft: Optional[float] = None
+        self.tokens = 0
+        self.segundos = 0.0
+
+    @property
+    def tokens_por_segundo(self) -> float:
+        # A taxa de geração conta a partir do primeiro token (sem a espera inicial)
+        geracao = self.segundos - (self.ttft or 0.0)
+        return self.tokens / geracao if geracao > 0 and self.tokens > 1 else 0.0
+
+    def __iter__(self) -> Iterator[str]:
+        inicio = time.perf_counter()
+        try:
+            for trecho in self._trechos:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - inicio
+                self.tokens += 1
+                yield trecho
+        finally:
+            self.segundos = time.perf_counter() - inicio
+            self._relatorio.registrar(self.ttft, self.tokens_por_segundo)
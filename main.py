@@ -2,6 +2,9 @@ import requests
 import argparse
 import json
 
+from config import MODELS_CONFIG
+from ollama_client import obter_cliente_ollama
+
 
 def verificar_modelos_ollama():
     """
@@ -9,7 +12,7 @@ def verificar_modelos_ollama():
     """
     try:
         # Fazer requisição GET para o endpoint da API do Ollama
-        response = requests.get("http://localhost:11434/api/tags")
+        response = obter_cliente_ollama().get("/api/tags")
         
         # Verificar se a resposta teve status 200 (sucesso)
         if response.status_code == 200:
@@ -44,7 +47,7 @@ def verificar_modelos_ollama():
 
 def gerar_resposta_llm(prompt_usuario: str):
     """
-    Função para enviar um prompt para o modelo llava-llama3 e obter a resposta.
+    Função para enviar um prompt para o modelo do chat (MODELS_CONFIG) e obter a resposta.
     
     Args:
         prompt_usuario (str): O prompt/pergunta do usuário
@@ -53,19 +56,16 @@ def gerar_resposta_llm(prompt_usuario: str):
         str: A resposta do modelo ou None em caso de erro
     """
     try:
-        # Endpoint da API para geração de texto
-        url = "http://localhost:11434/api/generate"
-        
         # Payload (corpo) da requisição JSON
         payload = {
-            "model": "llava-llama3",
+            "model": MODELS_CONFIG["chat"],
             "prompt": prompt_usuario,
             "stream": False
         }
         
         # Fazer requisição POST para o endpoint
         print("🤖 Gerando resposta... (isso pode levar alguns segundos)")
-        response = requests.post(url, json=payload, timeout=120)
+        response = obter_cliente_ollama().post("/api/generate", json=payload)
         
         # Verificar se a resposta teve status 200 (sucesso)
         if response.status_code == 200:
@@ -110,7 +110,7 @@ def gerar_resposta_llm(prompt_usuario: str):
 
 if __name__ == "__main__":
     # Configurar argparse para capturar argumentos da linha de comando
-    parser = argparse.ArgumentParser(description="Conversar com o modelo llava-llama3 via Ollama")
+    parser = argparse.ArgumentParser(description=f"Conversar com o modelo {MODELS_CONFIG['chat']} via Ollama")
     parser.add_argument("prompt", nargs="?", help="O prompt/pergunta para enviar ao modelo")
     parser.add_argument("--testar", action="store_true", help="Apenas testar a conexão com o Ollama")
     
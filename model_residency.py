@@ -0,0 +1,204 @@
+"""
+🧠 AFI v4.0 - Residência dos Modelos no Ollama
+Modelos carregados antes de serem pedidos e mantidos na memória
+
+O chat usa um modelo e o RAG outro (``MODELS_CONFIG``): a cada troca, ou
+depois de 5 minutos parado (o ``keep_alive`` padrão do Ollama), o modelo
+saía da memória e a pergunta seguinte pagava segundos de carga de vários GB
+antes do primeiro token.
+
+``GerenciadorModelos`` pré-carrega os papéis configurados, põe um
+``keep_alive`` em toda geração (-1 para os fixados, que o Ollama nunca
+descarrega) e, numa thread, consulta ``/api/ps`` para recarregar um fixado
+que tenha saído (Ollama reiniciado, memória disputada). Toda resposta com
+``load_duration`` acima do limiar é registrada como carga fria, com o custo.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Union
+
+from config import MODEL_RESIDENCY_CONFIG, MODELS_CONFIG, OLLAMA_CONFIG
+
+# Quantas cargas frias recentes ficam no status
+JANELA_CARGAS = 20
+
+
+def nome_canonico(modelo: str) -> str:
+    """``llama3.2`` e ``llama3.2:latest`` são o mesmo modelo para o Ollama"""
+    return modelo if ":" in modelo else f"{modelo}:latest"
+
+
+class GerenciadorModelos:
+    """
+    🧠 Pré-carga, keep_alive e registro de cargas frias dos modelos do Ollama
+    """
+
+    def __init__(self, cliente=None, pre_carregar: Optional[List[str]] = None,
+                 fixados: Optional[List[str]] = None):
+        if cliente is None:
+            from ollama_client import obter_cliente_ollama
+            cliente = obter_cliente_ollama()
+        self.cliente = cliente
+        papeis_pre_carga = MODEL_RESIDENCY_CONFIG["pre_carregar"] if pre_carregar is None else pre_carregar
+        papeis_fixados = MODEL_RESIDENCY_CONFIG["fixados"] if fixados is None else fixados
+        # Papéis diferentes podem usar o mesmo modelo: cada modelo aparece uma vez
+        self.pre_carregar = list(dict.fromkeys(MODELS_CONFIG[papel] for papel in papeis_pre_carga))
+        self.fixados = list(dict.fromkeys(MODELS_CONFIG[papel] for papel in papeis_fixados))
+        self._fixados_canonicos = {nome_canonico(modelo) for modelo in self.fixados}
+
+        self._lock = threading.Lock()
+        self.residentes: Optional[List[str]] = None  # None = /api/ps ainda não respondeu
+        self.cargas = deque(maxlen=JANELA_CARGAS)
+        self.total_cargas_frias = 0
+        self.custo_cargas_s = 0.0
+        self.recarregamentos = 0
+        self._pre_carregado = False
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def keep_alive_para(self, modelo: str) -> Union[int, str]:
+        """-1 (nunca descarregar) para os fixados; o keep_alive configurado para os demais"""
+        if nome_canonico(modelo) in self._fixados_canonicos:
+            return -1
+        return MODEL_RESIDENCY_CONFIG["keep_alive"]
+
+    def preparar(self, payload: dict) -> dict:
+        """Payload de /api/generate com o keep_alive do modelo (um keep_alive explícito é mantido)"""
+        if "keep_alive" in payload or not payload.get("model"):
+            return payload
+        return {**payload, "keep_alive": self.keep_alive_para(payload["model"])}
+
+    def registrar_geracao(self, dados: dict):
+        """Lê o ``load_duration`` da resposta final do Ollama e registra a carga fria, se houve"""
+        segundos = (dados.get("load_duration") or 0) / 1e9
+        if segundos < MODEL_RESIDENCY_CONFIG["limiar_carga_fria_s"]:
+            return
+        modelo = dados.get("model", "?")
+        origem = "pré-carga" if dados.get("done_reason") == "load" else "geração"
+        with self._lock:
+            self.total_cargas_frias += 1
+            self.custo_cargas_s += segundos
+            self.cargas.append({'modelo': modelo, 'segundos': round(segundos, 2), 'origem': origem,
+                                'quando': time.time()})
+        print(f"🧊 Carga fria: {modelo} levou {segundos:.1f}s para carregar ({origem})")
+
+    def registrar_http(self, resposta):
+        """``registrar_geracao`` a partir de uma ``Response`` de /api/generate sem streaming"""
+        if resposta.status_code != 200:
+            return
+        try:
+            dados = resposta.json()
+        except ValueError:
+            return
+        if isinstance(dados, dict):
+            self.registrar_geracao(dados)
+
+    def carregar(self, modelo: str) -> bool:
+        """
+        Carrega o modelo no Ollama sem gerar nada (prompt vazio)
+
+        Passa pelo gateway com prioridade de segundo plano, para não
+        atrasar uma pergunta do chat.
+        """
+        from llm_gateway import PRIORIDADE_SEGUNDO_PLANO, obter_gateway_llm
+
+        payload = {"model": modelo, "prompt": "", "stream": False}
+        resposta = obter_gateway_llm().gerar_sync(payload, PRIORIDADE_SEGUNDO_PLANO)
+        return resposta.status_code == 200
+
+    def consultar_residentes(self) -> Optional[List[str]]:
+        """Modelos na memória do Ollama (/api/ps), ou None se ele não respondeu"""
+        try:
+            resposta = self.cliente.get("/api/ps", tentativas=1)
+            if resposta.status_code != 200:
+                return None
+            residentes = [m.get("name", "") for m in resposta.json().get("models", [])]
+        except Exception:
+            return None
+        with self._lock:
+            self.residentes = residentes
+        return residentes
+
+    def verificar(self):
+        """
+        Uma rodada: pré-carga (uma vez) e recarga dos fixados que não estão na memória
+        """
+        residentes = self.consultar_residentes()
+        carregados = {nome_canonico(m) for m in residentes or []}
+        if not self._pre_carregado:
+            for modelo in self.pre_carregar:
+                if nome_canonico(modelo) not in carregados and not self._parar.is_set():
+                    self.carregar(modelo)
+            self._pre_carregado = True
+            return
+        if residentes is None:
+            # Ollama sem /api/ps (versão antiga): não há como saber quem saiu
+            return
+        for modelo in self.fixados:
+            if nome_canonico(modelo) not in carregados and not self._parar.is_set():
+                print(f"📤 Modelo fixado {modelo} saiu da memória do Ollama; recarregando")
+                with self._lock:
+                    self.recarregamentos += 1
+                self.carregar(modelo)
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._manter, name="afi-modelos", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _manter(self):
+        from ollama_client import obter_monitor_ollama
+
+        while not self._parar.is_set():
+            online = obter_monitor_ollama().esta_online()
+            if online:
+                try:
+                    self.verificar()
+                except Exception as e:
+                    print(f"⚠️ Residência dos modelos: verificação falhou ({type(e).__name__}: {e})")
+            # Fora do ar: tentar de novo no ritmo do monitor, para pré-carregar logo que ele voltar
+            intervalo = MODEL_RESIDENCY_CONFIG["intervalo_s"] if online else OLLAMA_CONFIG["intervalo_saude_offline_s"]
+            self._acordar.wait(intervalo)
+            self._acordar.clear()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'residentes': list(self.residentes) if self.residentes is not None else None,
+                'fixados': list(self.fixados),
+                'keep_alive': MODEL_RESIDENCY_CONFIG["keep_alive"],
+                'cargas_frias': self.total_cargas_frias,
+                'custo_cargas_s': round(self.custo_cargas_s, 1),
+                'recarregamentos': self.recarregamentos,
+                'ultimas_cargas': list(self.cargas)[-5:],
+            }
+
+
+_gerenciador_global = None
+_gerenciador_global_lock = threading.Lock()
+
+
+def obter_gerenciador_modelos() -> Optional[GerenciadorModelos]:
+    """
+    Gerenciador compartilhado pelo processo (None se desabilitado)
+
+    Só aplica keep_alive e registra cargas; a pré-carga e a vigilância dos
+    fixados começam com ``iniciar()`` (feito pelo app).
+    """
+    global _gerenciador_global
+    if not MODEL_RESIDENCY_CONFIG["habilitado"]:
+        return None
+    with _gerenciador_global_lock:
+        if _gerenciador_global is None:
+            _gerenciador_global = GerenciadorModelos()
+        return _gerenciador_global
@@ -0,0 +1,277 @@
+"""
+🦙 AFI v4.0 - Cliente HTTP do Ollama
+Uma sessão compartilhada (keep-alive) para todas as chamadas ao Ollama
+
+Cada ``requests.post/get`` solto abria uma conexão TCP nova por pergunta.
+``ClienteOllama`` mantém um pool de conexões abertas, aplica o timeout de
+cada endpoint (``OLLAMA_CONFIG["timeouts"]``), repete falhas de conexão e
+respostas 502/503/504 com backoff exponencial e jitter, e conta requisições,
+erros e latência por endpoint.
+
+A interface é a do ``requests`` (``get``/``post`` devolvem ``Response`` e
+levantam as mesmas exceções), então os chamadores mantêm o tratamento de
+erros que já tinham.
+
+``MonitorSaudeOllama`` consulta ``/api/tags`` numa thread e guarda o último
+estado (online + modelos instalados): quem pergunta se o Ollama está no ar
+lê esse estado em vez de fazer uma requisição.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import OLLAMA_CONFIG
+
+# Respostas de um Ollama reiniciando ou atrás de proxy; vale tentar de novo
+STATUS_REPETIVEIS = (502, 503, 504)
+
+# Quantas latências recentes entram nos percentis de cada endpoint
+JANELA_LATENCIAS = 200
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class _ContadoresEndpoint:
+    def __init__(self):
+        self.requisicoes = 0
+        self.erros = 0
+        self.repeticoes = 0
+        self.latencias = deque(maxlen=JANELA_LATENCIAS)
+
+
+class ClienteOllama:
+    """
+    🦙 Sessão HTTP com pool de conexões para a API do Ollama
+
+    Segura para uso por várias threads (interface, watcher, indexação).
+    """
+
+    def __init__(self, url: Optional[str] = None, conexoes: Optional[int] = None,
+                 tentativas: Optional[int] = None):
+        self.url = (url or OLLAMA_CONFIG["url"]).rstrip("/")
+        self.tentativas = max(1, tentativas or OLLAMA_CONFIG["tentativas"])
+        conexoes = conexoes or OLLAMA_CONFIG["conexoes"]
+
+        self._sessao = requests.Session()
+        # As repetições ficam por nossa conta (com jitter e contadas); o adaptador só guarda o pool
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes, max_retries=0)
+        self._sessao.mount("http://", adaptador)
+        self._sessao.mount("https://", adaptador)
+
+        self._lock = threading.Lock()
+        self._contadores = {}
+
+    def timeout_para(self, endpoint: str, leitura: Optional[float] = None):
+        """(conexão, leitura) do endpoint, com a leitura opcionalmente sobrescrita"""
+        timeouts = OLLAMA_CONFIG["timeouts"]
+        if leitura is None:
+            leitura = timeouts.get(endpoint, timeouts["padrao"])
+        return (OLLAMA_CONFIG["timeout_conexao"], leitura)
+
+    def _espera(self, tentativa: int) -> float:
+        # "Full jitter": clientes que falharam juntos não voltam todos no mesmo instante
+        teto = min(OLLAMA_CONFIG["espera_maxima_s"], OLLAMA_CONFIG["espera_base_s"] * (2 ** tentativa))
+        return random.uniform(0, teto)
+
+    def _registrar(self, endpoint: str, latencia: Optional[float], erro: bool, repeticoes: int):
+        with self._lock:
+            contadores = self._contadores.setdefault(endpoint, _ContadoresEndpoint())
+            contadores.requisicoes += 1
+            contadores.repeticoes += repeticoes
+            if erro:
+                contadores.erros += 1
+            if latencia is not None:
+                contadores.latencias.append(latencia)
+
+    def requisitar(self, metodo: str, endpoint: str, timeout: Optional[float] = None,
+                   tentativas: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Faz a requisição pelo pool, repetindo falhas transitórias
+
+        Args:
+            endpoint: Caminho da API (ex.: "/api/generate")
+            timeout: Segundos de leitura (padrão: o do endpoint em OLLAMA_CONFIG)
+            tentativas: Máximo de tentativas (padrão: OLLAMA_CONFIG["tentativas"])
+            **kwargs: Repassados ao ``requests`` (json, stream, headers...)
+
+        Returns:
+            requests.Response: A última resposta (o chamador confere o status)
+
+        Raises:
+            requests.exceptions.RequestException: Falha de conexão após as
+                tentativas ou tempo de leitura esgotado (este não é repetido)
+        """
+        tentativas = max(1, tentativas or self.tentativas)
+        kwargs["timeout"] = self.timeout_para(endpoint, timeout)
+        url = f"{self.url}{endpoint}"
+
+        for tentativa in range(tentativas):
+            ultima = tentativa == tentativas - 1
+            inicio = time.perf_counter()
+            try:
+                # Com stream=True a latência medida é até os cabeçalhos (o corpo chega depois)
+                resposta = self._sessao.request(metodo, url, **kwargs)
+            except requests.exceptions.ConnectionError:
+                # ConnectionError inclui ConnectTimeout; ReadTimeout não (o modelo pode estar só lento)
+                if ultima:
+                    self._registrar(endpoint, None, True, tentativa)
+                    raise
+            except requests.exceptions.RequestException:
+                self._registrar(endpoint, None, True, tentativa)
+                raise
+            else:
+                latencia = time.perf_counter() - inicio
+                if resposta.status_code not in STATUS_REPETIVEIS or ultima:
+                    self._registrar(endpoint, latencia, resposta.status_code >= 400, tentativa)
+                    return resposta
+                resposta.close()
+            time.sleep(self._espera(tentativa))
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.requisitar("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.requisitar("POST", endpoint, **kwargs)
+
+    def get_status(self) -> dict:
+        """Requisições, erros, repetições e latência (p50/p95) por endpoint"""
+        with self._lock:
+            return {
+                endpoint: {
+                    'requisicoes': c.requisicoes,
+                    'erros': c.erros,
+                    'repeticoes': c.repeticoes,
+                    'latencia_s_p50': round(_percentil(c.latencias, 0.5), 3),
+                    'latencia_s_p95': round(_percentil(c.latencias, 0.95), 3),
+                }
+                for endpoint, c in self._contadores.items()
+            }
+
+    def fechar(self):
+        self._sessao.close()
+
+
+_cliente_global = None
+_cliente_global_lock = threading.Lock()
+
+
+def obter_cliente_ollama() -> ClienteOllama:
+    """Cliente Ollama compartilhado pelo processo (criado sob demanda)"""
+    global _cliente_global
+    with _cliente_global_lock:
+        if _cliente_global is None:
+            _cliente_global = ClienteOllama()
+        return _cliente_global
+
+
+class MonitorSaudeOllama:
+    """
+    💓 Estado do Ollama verificado em segundo plano
+
+    Uma thread consulta ``/api/tags`` a cada ``intervalo_saude_s`` (ou
+    ``intervalo_saude_offline_s`` enquanto ele está fora). ``esta_online`` e
+    ``get_status`` só leem o último resultado; apenas um resultado mais
+    velho que ``ttl_saude_s`` (nenhuma verificação ainda, thread parada) é
+    renovado na hora pelo chamador.
+    """
+
+    def __init__(self, cliente: Optional[ClienteOllama] = None, iniciar: bool = True):
+        self.cliente = cliente or obter_cliente_ollama()
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self.online = False
+        self.modelos = []
+        self.erro: Optional[str] = None
+        self.latencia_s: Optional[float] = None
+        self.verificado_em: Optional[float] = None
+        self.verificacoes = 0
+        self._thread: Optional[threading.Thread] = None
+        if iniciar:
+            self.iniciar()
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._monitorar, name="afi-saude-ollama", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def verificar_agora(self) -> bool:
+        """Consulta /api/tags (uma tentativa, timeout do endpoint) e atualiza o estado"""
+        inicio = time.perf_counter()
+        try:
+            resposta = self.cliente.get("/api/tags", tentativas=1)
+            online = resposta.status_code == 200
+            modelos = [m.get("name", "") for m in resposta.json().get("models", [])] if online else []
+            erro = None if online else f"HTTP {resposta.status_code}"
+        except Exception as e:
+            online, modelos, erro = False, [], f"{type(e).__name__}: {e}"
+        with self._lock:
+            self.online = online
+            if online:
+                self.modelos = modelos
+            self.erro = erro
+            self.latencia_s = time.perf_counter() - inicio
+            self.verificado_em = time.monotonic()
+            self.verificacoes += 1
+        return online
+
+    def _expirado(self) -> bool:
+        with self._lock:
+            return self.verificado_em is None or time.monotonic() - self.verificado_em > OLLAMA_CONFIG["ttl_saude_s"]
+
+    def esta_online(self) -> bool:
+        if self._expirado():
+            return self.verificar_agora()
+        with self._lock:
+            return self.online
+
+    def get_status(self) -> dict:
+        if self._expirado():
+            self.verificar_agora()
+        with self._lock:
+            return {
+                'online': self.online,
+                'modelos': list(self.modelos),
+                'erro': self.erro,
+                'latencia_s': round(self.latencia_s, 3) if self.latencia_s is not None else None,
+                'verificado_ha_s': round(time.monotonic() - self.verificado_em, 1),
+                'verificacoes': self.verificacoes,
+            }
+
+    def _monitorar(self):
+        while not self._parar.is_set():
+            online = self.verificar_agora()
+            intervalo = OLLAMA_CONFIG["intervalo_saude_s" if online else "intervalo_saude_offline_s"]
+            self._acordar.wait(intervalo)
+            self._acordar.clear()
+
+
+_monitor_global = None
+_monitor_global_lock = threading.Lock()
+
+
+def obter_monitor_ollama() -> MonitorSaudeOllama:
+    """Monitor de saúde do Ollama compartilhado pelo processo (iniciado sob demanda)"""
+    global _monitor_global
+    with _monitor_global_lock:
+        if _monitor_global is None:
+            _monitor_global = MonitorSaudeOllama()
+        return _monitor_global
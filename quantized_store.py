@@ -0,0 +1,387 @@
+"""
+🗜️ AFI v4.0 - Vector Store Quantizado
+Embeddings da base em matrizes NumPy compactas (float16 ou int8 com escala)
+
+O ``SimpleVectorStore`` guarda cada embedding como lista de floats do Python,
+o que custa bem mais de 4 bytes por dimensão. Aqui os vetores ficam em uma
+única matriz contígua, em float16 (2 bytes) ou int8 com uma escala por linha
+(1 byte), e a busca é um produto matricial vetorizado. Os melhores candidatos
+são reordenados com os vetores float32 exatos, lidos do ``vetores.npy`` salvo
+(memory-map: só as linhas consultadas saem do disco) ou, para chunks ainda
+não salvos, da cópia float32 pendente. Acima de ``max_pendentes`` as cópias
+mais antigas saem da RAM para um arquivo temporário float32 (só acréscimo),
+de modo que o ``vetores.npy`` salvo é sempre exato. Stores que nunca serão
+salvos não guardam cópias: o re-rank usa o próprio vetor quantizado.
+"""
+
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import VECTOR_STORE_CONFIG
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.schema import BaseNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+    from llama_index.core.vector_stores.types import (
+        VectorStoreQuery,
+        VectorStoreQueryMode,
+        VectorStoreQueryResult,
+    )
+    from llama_index.core.vector_stores.utils import build_metadata_filter_fn, node_to_metadata_dict
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    LLAMA_INDEX_AVAILABLE = False
+
+FORMATOS = ("float16", "int8")
+
+# Linhas convertidas para float32 de cada vez durante a busca (limita a memória temporária)
+LINHAS_POR_BLOCO = 8192
+CAPACIDADE_INICIAL = 256
+
+
+class MatrizQuantizada:
+    """
+    📦 Matriz de embeddings quantizados com crescimento amortizado
+
+    Guarda também a norma de cada vetor original, para que a pontuação seja o
+    mesmo cosseno do ``SimpleVectorStore``.
+    """
+
+    def __init__(self, dimensao: int, formato: str):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de quantização inválido: {formato} (use {', '.join(FORMATOS)})")
+        self.dimensao = dimensao
+        self.formato = formato
+        self._dados = np.empty((CAPACIDADE_INICIAL, dimensao), dtype=np.float16 if formato == "float16" else np.int8)
+        self._escalas = np.ones(CAPACIDADE_INICIAL, dtype=np.float32)
+        self._normas = np.ones(CAPACIDADE_INICIAL, dtype=np.float32)
+        self.linhas = 0
+
+    @property
+    def bytes(self) -> int:
+        usados = self.linhas
+        return self._dados[:usados].nbytes + self._escalas[:usados].nbytes + self._normas[:usados].nbytes
+
+    def _garantir_capacidade(self, total: int):
+        capacidade = len(self._dados)
+        if total <= capacidade:
+            return
+        while capacidade < total:
+            capacidade *= 2
+        dados = np.empty((capacidade, self.dimensao), dtype=self._dados.dtype)
+        dados[:self.linhas] = self._dados[:self.linhas]
+        escalas = np.ones(capacidade, dtype=np.float32)
+        escalas[:self.linhas] = self._escalas[:self.linhas]
+        normas = np.ones(capacidade, dtype=np.float32)
+        normas[:self.linhas] = self._normas[:self.linhas]
+        self._dados, self._escalas, self._normas = dados, escalas, normas
+
+    def adicionar(self, vetores) -> range:
+        """Quantiza e acrescenta vetores float32 (k, dimensao); retorna as linhas ocupadas"""
+        vetores = np.asarray(vetores, dtype=np.float32).reshape(-1, self.dimensao)
+        inicio, fim = self.linhas, self.linhas + len(vetores)
+        self._garantir_capacidade(fim)
+
+        normas = np.linalg.norm(vetores, axis=1)
+        self._normas[inicio:fim] = np.where(normas > 0, normas, 1.0)
+        if self.formato == "float16":
+            self._dados[inicio:fim] = vetores.astype(np.float16)
+        else:
+            # Escala simétrica por linha: o maior valor absoluto vira ±127
+            maximos = np.abs(vetores).max(axis=1)
+            escalas = np.where(maximos > 0, maximos / 127.0, 1.0).astype(np.float32)
+            self._dados[inicio:fim] = np.clip(np.rint(vetores / escalas[:, None]), -127, 127).astype(np.int8)
+            self._escalas[inicio:fim] = escalas
+        self.linhas = fim
+        return range(inicio, fim)
+
+    def remover(self, linha: int) -> Optional[int]:
+        """
+        Remove uma linha trazendo a última para o lugar dela
+
+        Returns:
+            int: Linha antiga do vetor que foi movido (None se era a última)
+        """
+        ultima = self.linhas - 1
+        movida = None
+        if linha != ultima:
+            self._dados[linha] = self._dados[ultima]
+            self._escalas[linha] = self._escalas[ultima]
+            self._normas[linha] = self._normas[ultima]
+            movida = ultima
+        self.linhas = ultima
+        return movida
+
+    def vetor(self, linha: int) -> "np.ndarray":
+        """Vetor float32 reconstruído a partir da linha quantizada"""
+        vetor = self._dados[linha].astype(np.float32)
+        if self.formato == "int8":
+            vetor *= self._escalas[linha]
+        return vetor
+
+    def similaridades(self, consulta) -> "np.ndarray":
+        """Cosseno aproximado entre a consulta e todas as linhas"""
+        consulta = np.asarray(consulta, dtype=np.float32)
+        norma = float(np.linalg.norm(consulta)) or 1.0
+        resultado = np.empty(self.linhas, dtype=np.float32)
+        for inicio in range(0, self.linhas, LINHAS_POR_BLOCO):
+            fim = min(inicio + LINHAS_POR_BLOCO, self.linhas)
+            resultado[inicio:fim] = self._dados[inicio:fim].astype(np.float32) @ consulta
+        if self.formato == "int8":
+            resultado *= self._escalas[:self.linhas]
+        resultado /= self._normas[:self.linhas] * norma
+        return resultado
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class VectorStoreQuantizado(SimpleVectorStore):
+        """
+        🗜️ SimpleVectorStore com vetores quantizados e re-rank exato
+
+        ``text_id_to_ref_doc_id`` e ``metadata_dict`` continuam em ``data`` como
+        no SimpleVectorStore; ``embedding_dict`` fica vazio.
+        """
+
+        _formato: str = PrivateAttr()
+        _fator_rerank: int = PrivateAttr()
+        _matriz: Any = PrivateAttr(default=None)
+        _ids: List[str] = PrivateAttr(default_factory=list)
+        _linha_do_id: Dict[str, int] = PrivateAttr(default_factory=dict)
+        _originais: Any = PrivateAttr(default=None)
+        _linha_original: Dict[str, int] = PrivateAttr(default_factory=dict)
+        _pendentes: Dict[str, Any] = PrivateAttr(default_factory=dict)
+        _max_pendentes: int = PrivateAttr()
+        _guardar_originais: bool = PrivateAttr()
+        _despejo: Any = PrivateAttr(default=None)
+        _linha_despejo: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+        def __init__(self, formato: Optional[str] = None, fator_rerank: Optional[int] = None,
+                     guardar_originais: bool = True, max_pendentes: Optional[int] = None, **kwargs: Any):
+            """
+            Args:
+                guardar_originais: Guardar cópias float32 dos chunks novos até o
+                    próximo ``salvar_indice`` (False para stores que não são salvos)
+                max_pendentes: Cópias mantidas em RAM; as demais vão para um
+                    arquivo temporário (padrão: VECTOR_STORE_CONFIG)
+            """
+            super().__init__(**kwargs)
+            self._formato = formato or VECTOR_STORE_CONFIG["formato"]
+            self._fator_rerank = fator_rerank or VECTOR_STORE_CONFIG["fator_rerank"]
+            self._guardar_originais = guardar_originais
+            self._max_pendentes = VECTOR_STORE_CONFIG["max_pendentes"] if max_pendentes is None else max_pendentes
+            self._ids = []
+            self._linha_do_id = {}
+            self._linha_original = {}
+            self._pendentes = {}
+            self._linha_despejo = {}
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "VectorStoreQuantizado"
+
+        @classmethod
+        def de_matriz(cls, ids: List[str], matriz, text_id_to_ref_doc_id: dict,
+                      metadata_dict: dict, **kwargs: Any) -> "VectorStoreQuantizado":
+            """Monta o store a partir do ``vetores.npy`` salvo (a matriz vira a fonte do re-rank)"""
+            from llama_index.core.vector_stores.simple import SimpleVectorStoreData
+
+            store = cls(data=SimpleVectorStoreData(
+                text_id_to_ref_doc_id=dict(text_id_to_ref_doc_id),
+                metadata_dict=dict(metadata_dict),
+            ), **kwargs)
+            store._inserir(ids, matriz)
+            store.usar_originais(ids, matriz)
+            return store
+
+        # --------------------------------------------------------------
+        # Vetores
+        # --------------------------------------------------------------
+
+        @property
+        def bytes_quantizados(self) -> int:
+            return self._matriz.bytes if self._matriz is not None else 0
+
+        def _inserir(self, ids: Sequence[str], vetores):
+            if not len(ids):
+                return
+            for node_id in ids:
+                if node_id in self._linha_do_id:
+                    self._remover_vetor(node_id)
+            if self._matriz is None:
+                self._matriz = MatrizQuantizada(len(vetores[0]), self._formato)
+            # Em blocos: um memory-map grande nunca é convertido inteiro para float32
+            for inicio in range(0, len(ids), LINHAS_POR_BLOCO):
+                bloco = np.asarray(vetores[inicio:inicio + LINHAS_POR_BLOCO], dtype=np.float32)
+                for node_id, linha in zip(ids[inicio:inicio + LINHAS_POR_BLOCO], self._matriz.adicionar(bloco)):
+                    self._ids.append(node_id)
+                    self._linha_do_id[node_id] = linha
+
+        def _remover_vetor(self, node_id: str):
+            linha = self._linha_do_id.pop(node_id)
+            movida = self._matriz.remover(linha)
+            ultimo_id = self._ids.pop()
+            if movida is not None:
+                self._ids[linha] = ultimo_id
+                self._linha_do_id[ultimo_id] = linha
+            self._pendentes.pop(node_id, None)
+            self._linha_despejo.pop(node_id, None)
+
+        def _despejar(self, node_id: str, vetor):
+            """Acrescenta a cópia exata ao arquivo temporário e a tira da RAM"""
+            if self._despejo is None:
+                self._despejo = tempfile.TemporaryFile(prefix="afi_pendentes_")
+            self._despejo.seek(0, 2)
+            self._linha_despejo[node_id] = self._despejo.tell() // vetor.nbytes
+            self._despejo.write(vetor.tobytes())
+
+        def _ler_despejo(self, linha: int):
+            tamanho = self._matriz.dimensao * 4
+            self._despejo.seek(linha * tamanho)
+            return np.frombuffer(self._despejo.read(tamanho), dtype=np.float32).copy()
+
+        def _descartar_despejo(self):
+            if self._despejo is not None:
+                self._despejo.close()
+            self._despejo, self._linha_despejo = None, {}
+
+        def _original(self, node_id: str):
+            vetor = self._pendentes.get(node_id)
+            if vetor is not None:
+                return vetor
+            linha = self._linha_despejo.get(node_id)
+            if linha is not None:
+                return self._ler_despejo(linha)
+            linha = self._linha_original.get(node_id)
+            if linha is not None:
+                return np.asarray(self._originais[linha], dtype=np.float32)
+            # Sem cópia exata (store que não guarda originais): o vetor quantizado
+            return self._matriz.vetor(self._linha_do_id[node_id])
+
+        def usar_originais(self, ids: List[str], matriz):
+            """Passa a ler os vetores exatos da matriz salva (normalmente um memory-map do .npy)"""
+            self._originais = matriz
+            self._linha_original = {node_id: i for i, node_id in enumerate(ids)}
+            self._pendentes = {}
+            self._descartar_despejo()
+
+        def exportar(self) -> Tuple[List[str], "np.ndarray"]:
+            """Ids e vetores float32 na ordem atual, para persistir (exatos se o store guarda originais)"""
+            ids = list(self._ids)
+            if not ids:
+                return ids, np.zeros((0, 0), dtype=np.float32)
+            return ids, np.stack([self._original(node_id) for node_id in ids]).astype(np.float32)
+
+        def get(self, text_id: str) -> List[float]:
+            return self._original(text_id).tolist()
+
+        # --------------------------------------------------------------
+        # Interface do vector store
+        # --------------------------------------------------------------
+
+        def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+            if not nodes:
+                return []
+            vetores = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+            ids = [node.node_id for node in nodes]
+            self._inserir(ids, vetores)
+            for node, vetor in zip(nodes, vetores):
+                if self._guardar_originais:
+                    # Cópia exata até o próximo salvar_indice gravar o .npy
+                    self._pendentes.pop(node.node_id, None)
+                    self._linha_despejo.pop(node.node_id, None)
+                    self._pendentes[node.node_id] = vetor.copy()
+                self.data.text_id_to_ref_doc_id[node.node_id] = node.ref_doc_id or "None"
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+                metadata.pop("_node_content", None)
+                self.data.metadata_dict[node.node_id] = metadata
+            # Acima do limite, as cópias mais antigas vão para o disco
+            while len(self._pendentes) > self._max_pendentes:
+                node_id = next(iter(self._pendentes))
+                self._despejar(node_id, self._pendentes.pop(node_id))
+            return ids
+
+        def _remover_ids(self, ids):
+            for node_id in ids:
+                if node_id in self._linha_do_id:
+                    self._remover_vetor(node_id)
+                self.data.text_id_to_ref_doc_id.pop(node_id, None)
+                if self.data.metadata_dict is not None:
+                    self.data.metadata_dict.pop(node_id, None)
+
+        def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+            self._remover_ids([
+                text_id for text_id, ref in self.data.text_id_to_ref_doc_id.items() if ref == ref_doc_id
+            ])
+
+        def delete_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **delete_kwargs: Any) -> None:
+            filtro = build_metadata_filter_fn(lambda node_id: self.data.metadata_dict[node_id], filters)
+            candidatos = node_ids if node_ids is not None else list(self._ids)
+            self._remover_ids([node_id for node_id in candidatos if node_id in self._linha_do_id and filtro(node_id)])
+
+        def clear(self) -> None:
+            super().clear()
+            self._matriz = None
+            self._ids, self._linha_do_id, self._pendentes = [], {}, {}
+            self._descartar_despejo()
+
+        def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+            if query.mode != VectorStoreQueryMode.DEFAULT:
+                raise ValueError(f"Modo de consulta não suportado pelo VectorStoreQuantizado: {query.mode}")
+            if self._matriz is None or not self._ids:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+
+            similaridades = self._matriz.similaridades(query.query_embedding)
+
+            if query.node_ids is not None or query.filters is not None:
+                permitidos = set(query.node_ids) if query.node_ids is not None else None
+                filtro = build_metadata_filter_fn(lambda node_id: self.data.metadata_dict[node_id], query.filters)
+                mascara = np.fromiter(
+                    ((permitidos is None or node_id in permitidos) and filtro(node_id) for node_id in self._ids),
+                    dtype=bool, count=len(self._ids),
+                )
+                similaridades = np.where(mascara, similaridades, -np.inf)
+
+            top_k = query.similarity_top_k
+            candidatos = min(len(self._ids), top_k * self._fator_rerank)
+            linhas = np.argpartition(-similaridades, candidatos - 1)[:candidatos]
+            linhas = linhas[np.isfinite(similaridades[linhas])]
+            if not len(linhas):
+                return VectorStoreQueryResult(similarities=[], ids=[])
+
+            # Re-rank exato (float32) só dos candidatos
+            consulta = np.array(query.query_embedding, dtype=np.float32)
+            consulta /= float(np.linalg.norm(consulta)) or 1.0
+            ids = [self._ids[linha] for linha in linhas]
+            exatos = np.stack([self._original(node_id) for node_id in ids])
+            normas = np.linalg.norm(exatos, axis=1)
+            cossenos = (exatos @ consulta) / np.where(normas > 0, normas, 1.0)
+            ordem = np.argsort(-cossenos)[:top_k]
+            return VectorStoreQueryResult(
+                similarities=[float(cossenos[i]) for i in ordem],
+                ids=[ids[i] for i in ordem],
+            )
+
+
+def criar_vector_store(guardar_originais: bool = True):
+    """
+    Vector store das novas bases conforme ``VECTOR_STORE_CONFIG``
+
+    Args:
+        guardar_originais: False para bases que nunca são salvas em disco
+
+    Returns:
+        VectorStoreQuantizado, ou None para usar o SimpleVectorStore padrão (float32)
+    """
+    formato = VECTOR_STORE_CONFIG["formato"]
+    if formato == "float32" or not (NUMPY_AVAILABLE and LLAMA_INDEX_AVAILABLE):
+        return None
+    return VectorStoreQuantizado(formato=formato, guardar_originais=guardar_originais)
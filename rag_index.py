@@ -0,0 +1,595 @@
+"""
+🧠 AFI v4.0 - Índice RAG Persistente
+Persistência em disco do VectorStoreIndex usado pelo app
+
+Este módulo salva o índice vetorial na pasta ``storage/`` (FOLDERS_CONFIG)
+e o recarrega nos próximos starts sem re-embedding. Os vetores são gravados
+em um arquivo ``.npy`` aberto com memory-map, de modo que o carregamento não
+precisa decodificar um JSON gigante. Uma reconstrução completa só acontece
+quando o conjunto de arquivos de origem ou o modelo de embedding mudam.
+
+Cada gravação vai para uma subpasta de versão nova e só passa a valer quando
+o ponteiro ``atual.json`` é trocado (``os.replace``, atômico também no
+Windows). As versões antigas são apagadas depois da troca; se alguma ainda
+estiver aberta (memory-map em outro processo), fica para a próxima gravação.
+"""
+
+import os
+import json
+import glob
+import hashlib
+import shutil
+import time
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+from config import FOLDERS_CONFIG, VECTOR_STORE_CONFIG
+from chunker import assinatura_chunking
+from bm25_index import (
+    ARQUIVO_BM25,
+    IndiceBM25,
+    descartar_indice_bm25,
+    obter_indice_bm25,
+    registrar_indice_bm25,
+)
+from document_parser import (
+    ProgressoIndexacao,
+    construir_indice_streaming,
+    criar_indice_vazio,
+    inserir_documentos_em_lotes,
+    ler_documentos_em_paralelo,
+)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from quantized_store import VectorStoreQuantizado
+except ImportError:
+    VectorStoreQuantizado = None
+
+EXTENSOES_VIDEO = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
+
+ARQUIVO_METADADOS = "afi_index_meta.json"
+ARQUIVO_VETORES = "vetores.npy"
+ARQUIVO_VETORES_IDS = "vetores_ids.json"
+ARQUIVO_DOCSTORE = "docstore.json"
+ARQUIVO_INDEX_STORE = "index_store.json"
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_VERSAO_ATUAL = "atual.json"
+PREFIXO_VERSAO = "v-"
+VERSAO_FORMATO = 1
+
+# Subpasta do índice principal (storage/ também guarda índices por referência e o cache de embeddings)
+SUBPASTA_PRINCIPAL = "principal"
+
+EXTENSOES_REFERENCIA = ['.txt', '.pdf', '.docx', '.doc', '.md', '.rtf', '.odt']
+
+
+def listar_arquivos_validos(pasta: str) -> List[str]:
+    """
+    Lista os arquivos indexáveis de uma pasta (sem recursão), ignorando vídeos
+
+    Args:
+        pasta: Pasta a ser varrida
+
+    Returns:
+        List[str]: Caminhos dos arquivos válidos, em ordem estável
+    """
+    arquivos_validos = []
+    for arquivo in sorted(glob.glob(os.path.join(pasta, "*"))):
+        if not os.path.isfile(arquivo):
+            continue
+        extensao = os.path.splitext(arquivo)[1].lower()
+        if extensao in EXTENSOES_VIDEO:
+            print(f"DEBUG: Pulando arquivo de vídeo: {os.path.basename(arquivo)}")
+            continue
+        arquivos_validos.append(arquivo)
+    return arquivos_validos
+
+
+def listar_arquivos_referencia(caminho_diretorio: str) -> List[str]:
+    """
+    Lista recursivamente os documentos indexáveis de uma pasta (inclusive compartilhamentos de rede)
+
+    Args:
+        caminho_diretorio: Pasta raiz a ser varrida
+
+    Returns:
+        List[str]: Caminhos dos arquivos, em ordem estável
+    """
+    arquivos = []
+    for extensao in EXTENSOES_REFERENCIA:
+        pattern = os.path.join(caminho_diretorio, "**", f"*{extensao}")
+        arquivos.extend(glob.glob(pattern, recursive=True))
+    return sorted(a for a in set(arquivos) if os.path.isfile(a))
+
+
+def calcular_assinatura(arquivos: List[str], modelo_embedding: str) -> str:
+    """
+    Calcula a assinatura do conjunto de origem + modelo de embedding
+
+    A assinatura usa caminho, tamanho e mtime de cada arquivo, então qualquer
+    arquivo novo, removido ou alterado (ou a troca do modelo ou do chunking)
+    invalida o índice.
+    """
+    h = hashlib.sha256()
+    h.update(f"v{VERSAO_FORMATO}|{modelo_embedding}|{assinatura_chunking()}".encode("utf-8"))
+    for arquivo in sorted(os.path.abspath(a) for a in arquivos):
+        try:
+            stat = os.stat(arquivo)
+            h.update(f"|{arquivo}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            h.update(f"|{arquivo}|ausente".encode("utf-8"))
+    return h.hexdigest()
+
+
+def pasta_versao_atual(persist_dir: str) -> str:
+    """
+    Pasta com os arquivos do índice em uso
+
+    Segue o ponteiro ``atual.json``; sem ponteiro (índice gravado no formato
+    antigo, direto em ``persist_dir``) devolve a própria ``persist_dir``.
+    """
+    try:
+        with open(os.path.join(persist_dir, ARQUIVO_VERSAO_ATUAL), 'r', encoding='utf-8') as f:
+            versao = json.load(f)["versao"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return persist_dir
+    pasta = os.path.join(persist_dir, versao)
+    return pasta if os.path.isdir(pasta) else persist_dir
+
+
+def _trocar_versao_atual(persist_dir: str, versao: str):
+    caminho = os.path.join(persist_dir, ARQUIVO_VERSAO_ATUAL)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({"versao": versao}, f)
+    os.replace(temporario, caminho)
+
+
+def _apagar_versoes_antigas(persist_dir: str, versao_atual: str):
+    """
+    Remove as versões anteriores à atual e os arquivos do formato antigo
+
+    Versões com nome maior que a atual são gravações ainda em andamento (outro
+    processo) e ficam. Falhas são ignoradas: uma versão ainda aberta é apagada
+    numa próxima gravação.
+    """
+    for nome in os.listdir(persist_dir):
+        caminho = os.path.join(persist_dir, nome)
+        if os.path.isdir(caminho):
+            if nome.startswith(PREFIXO_VERSAO) and nome < versao_atual:
+                shutil.rmtree(caminho, ignore_errors=True)
+        elif nome in (ARQUIVO_METADADOS, ARQUIVO_VETORES, ARQUIVO_VETORES_IDS, ARQUIVO_DOCSTORE,
+                      ARQUIVO_INDEX_STORE, ARQUIVO_MANIFESTO, ARQUIVO_BM25, "default__vector_store.json",
+                      "graph_store.json", "image__vector_store.json"):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+def ler_metadados(persist_dir: str) -> Optional[dict]:
+    """Lê os metadados do índice salvo, ou None se não houver índice válido"""
+    caminho = os.path.join(pasta_versao_atual(persist_dir), ARQUIVO_METADADOS)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Metadados do índice corrompidos ({e}), será feita reconstrução")
+        return None
+
+
+def _gravar_metadados(persist_dir: str, metadados: dict):
+    caminho = os.path.join(persist_dir, ARQUIVO_METADADOS)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(metadados, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def salvar_indice(index, persist_dir: str, assinatura: str, modelo_embedding: str,
+                  total_arquivos: int, manifesto: Optional[dict] = None):
+    """
+    Persiste o índice em disco
+
+    Docstore e index store vão para JSON; os vetores vão para um ``.npy``
+    contíguo (float32) que é aberto via memory-map no carregamento. Sem NumPy,
+    cai no formato JSON padrão do LlamaIndex. O manifesto de arquivos, quando
+    informado, é gravado junto para permitir reindexação incremental.
+    """
+    from llama_index.core.vector_stores.simple import DEFAULT_VECTOR_STORE
+
+    # Escrever numa versão nova e só então trocar o ponteiro evita índice pela metade
+    versao = f"{PREFIXO_VERSAO}{time.time_ns()}"
+    temporario = os.path.join(persist_dir, versao)
+    os.makedirs(temporario, exist_ok=True)
+
+    storage_context = index.storage_context
+    formato = "json"
+    dados = None
+
+    vector_store = storage_context.vector_stores[DEFAULT_VECTOR_STORE]
+    quantizado = VectorStoreQuantizado is not None and isinstance(vector_store, VectorStoreQuantizado)
+
+    if NUMPY_AVAILABLE:
+        dados = vector_store.data
+        if quantizado:
+            ids, matriz = vector_store.exportar()
+        else:
+            ids = list(dados.embedding_dict.keys())
+            if ids:
+                matriz = np.asarray([dados.embedding_dict[i] for i in ids], dtype=np.float32)
+            else:
+                matriz = np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(temporario, ARQUIVO_VETORES), matriz)
+        with open(os.path.join(temporario, ARQUIVO_VETORES_IDS), 'w', encoding='utf-8') as f:
+            json.dump({
+                "ids": ids,
+                "text_id_to_ref_doc_id": dados.text_id_to_ref_doc_id,
+                "metadata_dict": dados.metadata_dict,
+            }, f, ensure_ascii=False)
+        storage_context.docstore.persist(persist_path=os.path.join(temporario, ARQUIVO_DOCSTORE))
+        storage_context.index_store.persist(persist_path=os.path.join(temporario, ARQUIVO_INDEX_STORE))
+        formato = "npy"
+        # Soltar o memory-map antigo antes de apagar a versão anterior (Windows trava arquivos abertos)
+        if quantizado:
+            vector_store.usar_originais(ids, matriz)
+        else:
+            dados.embedding_dict = dict(zip(ids, matriz))
+    else:
+        storage_context.persist(persist_dir=temporario)
+
+    if manifesto is not None:
+        salvar_manifesto(temporario, manifesto)
+
+    # Índice invertido BM25 dos mesmos chunks (busca híbrida)
+    obter_indice_bm25(index).salvar(os.path.join(temporario, ARQUIVO_BM25))
+
+    _gravar_metadados(temporario, {
+        "versao": VERSAO_FORMATO,
+        "assinatura": assinatura,
+        "modelo_embedding": modelo_embedding,
+        "chunking": assinatura_chunking(),
+        "formato": formato,
+        "total_arquivos": total_arquivos,
+        "criado_em": datetime.now().isoformat(),
+    })
+
+    _trocar_versao_atual(persist_dir, versao)
+
+    if formato == "npy":
+        # Voltar a servir os vetores do arquivo recém-gravado via memory-map
+        matriz = np.load(os.path.join(temporario, ARQUIVO_VETORES), mmap_mode='r')
+        if quantizado:
+            vector_store.usar_originais(ids, matriz)
+        else:
+            dados.embedding_dict = dict(zip(ids, matriz))
+
+    _apagar_versoes_antigas(persist_dir, versao)
+    print(f"💾 Índice salvo em: {temporario} (formato {formato})")
+
+
+def carregar_indice(persist_dir: str):
+    """
+    Carrega o índice salvo sem recalcular embeddings
+
+    Returns:
+        VectorStoreIndex ou None se não for possível carregar
+    """
+    from llama_index.core import StorageContext, load_index_from_storage
+
+    # Resolvida uma vez: todos os arquivos vêm da mesma versão
+    persist_dir = pasta_versao_atual(persist_dir)
+    metadados = ler_metadados(persist_dir)
+    if not metadados:
+        return None
+
+    try:
+        if metadados.get("formato") == "npy" and NUMPY_AVAILABLE:
+            from llama_index.core.vector_stores import SimpleVectorStore
+            from llama_index.core.vector_stores.simple import SimpleVectorStoreData
+
+            # mmap_mode='r': as páginas só são lidas do disco quando usadas
+            matriz = np.load(os.path.join(persist_dir, ARQUIVO_VETORES), mmap_mode='r')
+            with open(os.path.join(persist_dir, ARQUIVO_VETORES_IDS), 'r', encoding='utf-8') as f:
+                info_ids = json.load(f)
+
+            if VECTOR_STORE_CONFIG["formato"] != "float32" and VectorStoreQuantizado is not None:
+                # Quantizado em RAM; o memory-map float32 só serve o re-rank dos candidatos
+                vector_store = VectorStoreQuantizado.de_matriz(
+                    info_ids["ids"],
+                    matriz,
+                    info_ids.get("text_id_to_ref_doc_id", {}),
+                    info_ids.get("metadata_dict", {}),
+                )
+            else:
+                vector_store = SimpleVectorStore(data=SimpleVectorStoreData(
+                    embedding_dict=dict(zip(info_ids["ids"], matriz)),
+                    text_id_to_ref_doc_id=info_ids.get("text_id_to_ref_doc_id", {}),
+                    metadata_dict=info_ids.get("metadata_dict", {}),
+                ))
+            storage_context = StorageContext.from_defaults(
+                docstore=_carregar_docstore(persist_dir),
+                index_store=_carregar_index_store(persist_dir),
+                vector_store=vector_store,
+            )
+        else:
+            storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+
+        index = load_index_from_storage(storage_context)
+        caminho_bm25 = os.path.join(persist_dir, ARQUIVO_BM25)
+        if os.path.exists(caminho_bm25):
+            registrar_indice_bm25(index, IndiceBM25.carregar(caminho_bm25))
+        return index
+    except Exception as e:
+        print(f"⚠️ Falha ao carregar índice salvo ({type(e).__name__}: {e})")
+        return None
+
+
+def _carregar_docstore(persist_dir: str):
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+    return SimpleDocumentStore.from_persist_path(os.path.join(persist_dir, ARQUIVO_DOCSTORE))
+
+
+def _carregar_index_store(persist_dir: str):
+    from llama_index.core.storage.index_store import SimpleIndexStore
+    return SimpleIndexStore.from_persist_path(os.path.join(persist_dir, ARQUIVO_INDEX_STORE))
+
+
+def carregar_ou_construir_indice(arquivos: List[str], modelo_embedding: str,
+                                 persist_dir: Optional[str] = None,
+                                 progresso: Optional[ProgressoIndexacao] = None) -> Tuple[object, bool]:
+    """
+    🚀 Caminho rápido de inicialização do índice
+
+    Se o índice salvo tiver a mesma assinatura (arquivos + modelo), ele é
+    carregado direto do disco. Caso contrário, os documentos são lidos e
+    embedados novamente e o resultado é salvo para o próximo start.
+
+    Args:
+        arquivos: Arquivos de origem já filtrados
+        modelo_embedding: Nome do modelo configurado em Settings.embed_model
+        persist_dir: Pasta de persistência (padrão: storage/principal)
+        progresso: Andamento da leitura/embedding para a interface
+
+    Returns:
+        Tuple[index, bool]: Índice e se ele veio do disco (True) ou foi reconstruído
+    """
+    persist_dir = persist_dir or os.path.join(FOLDERS_CONFIG["storage"], SUBPASTA_PRINCIPAL)
+    assinatura = calcular_assinatura(arquivos, modelo_embedding)
+
+    metadados = ler_metadados(persist_dir)
+    if metadados and metadados.get("assinatura") == assinatura:
+        print(f"DEBUG: Índice salvo encontrado em {persist_dir}, carregando sem re-embedding...")
+        if progresso:
+            progresso.definir_fase("carregando do disco")
+        index = carregar_indice(persist_dir)
+        if index is not None:
+            return index, True
+    elif metadados:
+        print("DEBUG: Arquivos de origem ou modelo de embedding mudaram, reconstruindo índice...")
+
+    print("DEBUG: Lendo documentos em paralelo e criando VectorStoreIndex...")
+    index = construir_indice_streaming(arquivos, progresso=progresso)
+    if index is None:
+        return None, False
+
+    try:
+        salvar_indice(index, persist_dir, assinatura, modelo_embedding, len(arquivos))
+    except Exception as e:
+        # Falha ao salvar não impede o uso do índice em memória
+        print(f"⚠️ Não foi possível salvar o índice em disco: {e}")
+
+    return index, False
+
+
+# =================================================================================
+# MANIFESTO DE ARQUIVOS - INDEXAÇÃO INCREMENTAL
+# =================================================================================
+
+def calcular_hash_arquivo(caminho: str, tamanho_bloco: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo em blocos"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def carregar_manifesto(persist_dir: str) -> dict:
+    """
+    Lê o manifesto salvo ao lado do índice
+
+    Returns:
+        dict: {caminho: {tamanho, mtime_ns, sha256, doc_ids, node_ids}} (vazio se não existir)
+    """
+    caminho = os.path.join(pasta_versao_atual(persist_dir), ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f).get("arquivos", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifesto corrompido ({e}), todos os arquivos serão reindexados")
+        return {}
+
+
+def salvar_manifesto(persist_dir: str, manifesto: dict):
+    """Grava o manifesto de arquivos na versão atual do índice"""
+    caminho = os.path.join(pasta_versao_atual(persist_dir), ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({"versao": VERSAO_FORMATO, "arquivos": manifesto}, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def comparar_com_manifesto(arquivos: List[str], manifesto: dict) -> Tuple[List[str], List[str], List[str], dict]:
+    """
+    Classifica os arquivos em novos, alterados e removidos em relação ao manifesto
+
+    Tamanho e mtime iguais dispensam a leitura do arquivo; se só o mtime mudou
+    (ex.: cópia no compartilhamento), o hash do conteúdo decide.
+
+    Returns:
+        Tuple: (novos, alterados, removidos, inalterados) onde ``inalterados`` é o
+        manifesto já atualizado dos arquivos que não precisam ser reindexados
+    """
+    novos, alterados = [], []
+    inalterados = {}
+    atuais = set()
+
+    for arquivo in arquivos:
+        chave = os.path.abspath(arquivo)
+        try:
+            stat = os.stat(chave)
+        except OSError:
+            # Sumiu depois da listagem: tratado como removido
+            continue
+        atuais.add(chave)
+
+        entrada = manifesto.get(chave)
+        if entrada is None:
+            novos.append(chave)
+            continue
+
+        if entrada.get("tamanho") == stat.st_size and entrada.get("mtime_ns") == stat.st_mtime_ns:
+            inalterados[chave] = entrada
+            continue
+
+        if entrada.get("tamanho") == stat.st_size and entrada.get("sha256") == calcular_hash_arquivo(chave):
+            inalterados[chave] = dict(entrada, mtime_ns=stat.st_mtime_ns)
+            continue
+
+        alterados.append(chave)
+
+    removidos = [chave for chave in manifesto if chave not in atuais]
+    return novos, alterados, removidos, inalterados
+
+
+def atualizar_indice_incremental(arquivos: List[str], modelo_embedding: str,
+                                 persist_dir: str,
+                                 progresso: Optional[ProgressoIndexacao] = None) -> Tuple[object, dict]:
+    """
+    🔄 Reindexação incremental guiada pelo manifesto
+
+    Apenas arquivos novos ou alterados são lidos e embedados; os nós de
+    arquivos alterados ou removidos são apagados do índice. Se o modelo de
+    embedding ou o chunking mudaram, ou não existe índice salvo, faz a
+    construção completa.
+
+    Args:
+        arquivos: Arquivos de origem atuais
+        modelo_embedding: Nome do modelo configurado em Settings.embed_model
+        persist_dir: Pasta do índice + manifesto
+        progresso: Andamento da leitura/embedding para a interface
+
+    Returns:
+        Tuple[index, dict]: Índice atualizado (ou None) e estatísticas da atualização
+    """
+    metadados = ler_metadados(persist_dir)
+    index = None
+    manifesto = {}
+    if (metadados and metadados.get("modelo_embedding") == modelo_embedding
+            and metadados.get("chunking") == assinatura_chunking()):
+        manifesto = carregar_manifesto(persist_dir)
+        if manifesto:
+            index = carregar_indice(persist_dir)
+    elif metadados:
+        print("DEBUG: Modelo de embedding ou chunking mudou, reconstruindo índice completo...")
+
+    if index is None:
+        manifesto = {}
+
+    novos, alterados, removidos, novo_manifesto = comparar_com_manifesto(arquivos, manifesto)
+    estatisticas = {
+        "novos": len(novos),
+        "alterados": len(alterados),
+        "removidos": len(removidos),
+        "inalterados": len(novo_manifesto),
+    }
+    print(f"DEBUG: Manifesto: {estatisticas}")
+
+    if index is not None and not (novos or alterados or removidos):
+        return index, estatisticas
+
+    # Remover nós de arquivos alterados/removidos
+    if index is not None:
+        for chave in alterados + removidos:
+            for doc_id in manifesto[chave].get("doc_ids", []):
+                try:
+                    index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                except Exception as e:
+                    print(f"⚠️ Não foi possível remover {doc_id} do índice: {e}")
+
+    # Ler e embedar apenas o que é novo ou mudou (parsing paralelo, embedding em fluxo)
+    a_indexar = novos + alterados
+    docs_por_arquivo = {}
+
+    def _registrar(documentos):
+        for document in documentos:
+            caminho = os.path.abspath(document.metadata.get("file_path", ""))
+            docs_por_arquivo.setdefault(caminho, []).append(document.doc_id)
+            yield document
+
+    novo_indice = index is None
+    if novo_indice:
+        index = criar_indice_vazio()
+    if a_indexar:
+        print(f"DEBUG: Carregando {len(a_indexar)} arquivos novos/alterados...")
+        if progresso:
+            progresso.definir_arquivos(len(a_indexar))
+        inserir_documentos_em_lotes(
+            index, _registrar(ler_documentos_em_paralelo(a_indexar, filename_as_id=True)), progresso=progresso
+        )
+    if novo_indice and not docs_por_arquivo:
+        return None, estatisticas
+
+    # O BM25 salvo não reflete mais os nós; será remontado do docstore ao salvar
+    descartar_indice_bm25(index)
+
+    # Atualizar manifesto com os doc_ids/node_ids recém-criados. Arquivo que não
+    # gerou documento (quarentena, erro de leitura) fica fora e é tentado de novo
+    for chave in a_indexar:
+        doc_ids = docs_por_arquivo.get(chave)
+        if not doc_ids:
+            continue
+        node_ids = []
+        for doc_id in doc_ids:
+            info = index.docstore.get_ref_doc_info(doc_id)
+            if info:
+                node_ids.extend(info.node_ids)
+        try:
+            stat = os.stat(chave)
+            tamanho, mtime_ns, sha256 = stat.st_size, stat.st_mtime_ns, calcular_hash_arquivo(chave)
+        except OSError:
+            # Apagado depois da leitura: entrada sem hash, a próxima atualização remove os nós
+            tamanho, mtime_ns, sha256 = None, None, None
+        novo_manifesto[chave] = {
+            "tamanho": tamanho,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "doc_ids": doc_ids,
+            "node_ids": node_ids,
+        }
+
+    try:
+        salvar_indice(index, persist_dir, calcular_assinatura(arquivos, modelo_embedding),
+                      modelo_embedding, len(arquivos), manifesto=novo_manifesto)
+    except Exception as e:
+        print(f"⚠️ Não foi possível salvar o índice em disco: {e}")
+
+    return index, estatisticas
+
+
+def pasta_storage_referencia(caminho_diretorio: str) -> str:
+    """Pasta de storage dedicada a uma pasta indexada por referência"""
+    chave = hashlib.sha1(os.path.abspath(caminho_diretorio).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(FOLDERS_CONFIG["storage"], "referencia", chave)
@@ -0,0 +1,280 @@
+"""
+🧭 AFI v4.0 - Cache Semântico de Perguntas
+Reuso de respostas para perguntas parecidas, na frente do processar_prompt_geral
+
+Cada pergunta é embedada e comparada com as perguntas já respondidas. A busca
+usa LSH por hiperplanos aleatórios (várias tabelas de hash sobre o sinal das
+projeções): só as perguntas que caem no mesmo balde em alguma tabela têm a
+similaridade de cosseno calculada. Acima do limiar configurado, a resposta
+guardada é devolvida sem chamar o Ollama.
+
+As estatísticas (hit rate, similaridade dos hits, quase-hits logo abaixo do
+limiar e latências) servem para calibrar ``SEMANTIC_CACHE_CONFIG``.
+"""
+
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from config import SEMANTIC_CACHE_CONFIG
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Faixa abaixo do limiar contada como "quase hit" (ajuda a calibrar o limiar)
+MARGEM_QUASE_HIT = 0.05
+# Quantas latências recentes entram nos percentis
+JANELA_LATENCIAS = 500
+
+
+def _percentil(valores: Sequence[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class IndiceLSH:
+    """
+    🪣 Índice aproximado de vizinhos por cosseno (LSH de hiperplanos aleatórios)
+
+    Vetores parecidos têm a mesma assinatura de sinais com alta probabilidade;
+    várias tabelas reduzem a chance de o vizinho verdadeiro ficar de fora.
+    """
+
+    def __init__(self, dimensao: int, tabelas: int, bits: int, semente: int = 42):
+        gerador = np.random.default_rng(semente)
+        self._planos = gerador.standard_normal((tabelas, bits, dimensao)).astype(np.float32)
+        self._pesos = (1 << np.arange(bits)).astype(np.int64)
+        self._baldes: List[Dict[int, Set[int]]] = [{} for _ in range(tabelas)]
+        self._assinaturas: Dict[int, List[int]] = {}
+
+    def _assinar(self, vetor) -> List[int]:
+        sinais = (self._planos @ vetor) > 0
+        return [int(x) for x in sinais.astype(np.int64) @ self._pesos]
+
+    def adicionar(self, item_id: int, vetor):
+        assinatura = self._assinar(vetor)
+        self._assinaturas[item_id] = assinatura
+        for tabela, chave in zip(self._baldes, assinatura):
+            tabela.setdefault(chave, set()).add(item_id)
+
+    def remover(self, item_id: int):
+        assinatura = self._assinaturas.pop(item_id, None)
+        if assinatura is None:
+            return
+        for tabela, chave in zip(self._baldes, assinatura):
+            balde = tabela.get(chave)
+            if balde is not None:
+                balde.discard(item_id)
+                if not balde:
+                    del tabela[chave]
+
+    def candidatos(self, vetor) -> Set[int]:
+        encontrados: Set[int] = set()
+        for tabela, chave in zip(self._baldes, self._assinar(vetor)):
+            encontrados |= tabela.get(chave, set())
+        return encontrados
+
+
+class CacheSemantico:
+    """
+    🧠 Cache de respostas por similaridade de pergunta
+
+    As entradas ficam em memória, separadas por escopo (ex.: versão do índice
+    RAG ou "geral"), expiram por TTL e são descartadas da mais antiga para a
+    mais nova quando o limite é atingido.
+    """
+
+    def __init__(self, embedder: Callable[[str], Sequence[float]],
+                 limiar: Optional[float] = None, max_entradas: Optional[int] = None,
+                 ttl_segundos: Optional[float] = None, tabelas: Optional[int] = None,
+                 bits: Optional[int] = None):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("NumPy é necessário para o cache semântico")
+
+        self._embedder = embedder
+        self.limiar = limiar if limiar is not None else SEMANTIC_CACHE_CONFIG["limiar_similaridade"]
+        self.max_entradas = max_entradas or SEMANTIC_CACHE_CONFIG["max_entradas"]
+        self.ttl_segundos = ttl_segundos or SEMANTIC_CACHE_CONFIG["ttl_horas"] * 3600
+        self._tabelas = tabelas or SEMANTIC_CACHE_CONFIG["lsh_tabelas"]
+        self._bits = bits or SEMANTIC_CACHE_CONFIG["lsh_bits"]
+
+        self._lock = threading.Lock()
+        self._indice: Optional[IndiceLSH] = None
+        # item_id -> (escopo, pergunta, resposta, vetor, criado_em), em ordem de inserção
+        self._entradas: "OrderedDict[int, Tuple[str, str, str, object, float]]" = OrderedDict()
+        self._proximo_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.quase_hits = 0
+        self._similaridades_hit = deque(maxlen=JANELA_LATENCIAS)
+        self._latencias_busca = deque(maxlen=JANELA_LATENCIAS)
+        self._latencias_hit = deque(maxlen=JANELA_LATENCIAS)
+        self._latencias_miss = deque(maxlen=JANELA_LATENCIAS)
+
+    def _embedar(self, pergunta: str):
+        vetor = np.asarray(self._embedder(pergunta), dtype=np.float32)
+        norma = float(np.linalg.norm(vetor))
+        return vetor / norma if norma else vetor
+
+    def _remover(self, item_id: int):
+        self._entradas.pop(item_id, None)
+        self._indice.remover(item_id)
+
+    def buscar(self, pergunta: str, escopo: str = "geral"):
+        """
+        Procura uma pergunta parecida já respondida
+
+        Returns:
+            Tuple[Optional[str], float, vetor]: (resposta ou None, melhor similaridade,
+            embedding da pergunta para reaproveitar no ``guardar``)
+        """
+        inicio = time.perf_counter()
+        vetor = self._embedar(pergunta)
+        agora = time.time()
+        melhor_id, melhor_sim = None, 0.0
+
+        with self._lock:
+            if self._indice is not None:
+                ids = []
+                for item_id in self._indice.candidatos(vetor):
+                    entrada = self._entradas[item_id]
+                    if agora - entrada[4] > self.ttl_segundos:
+                        self._remover(item_id)
+                    elif entrada[0] == escopo:
+                        ids.append(item_id)
+                if ids:
+                    sims = np.stack([self._entradas[i][3] for i in ids]) @ vetor
+                    posicao = int(np.argmax(sims))
+                    melhor_id, melhor_sim = ids[posicao], float(sims[posicao])
+
+            self._latencias_busca.append(time.perf_counter() - inicio)
+            if melhor_id is not None and melhor_sim >= self.limiar:
+                self.hits += 1
+                self._similaridades_hit.append(melhor_sim)
+                return self._entradas[melhor_id][2], melhor_sim, vetor
+
+            self.misses += 1
+            if melhor_sim >= self.limiar - MARGEM_QUASE_HIT:
+                self.quase_hits += 1
+            return None, melhor_sim, vetor
+
+    def guardar(self, pergunta: str, resposta: str, escopo: str = "geral", vetor=None):
+        """Registra uma pergunta respondida"""
+        if vetor is None:
+            vetor = self._embedar(pergunta)
+        with self._lock:
+            if self._indice is None:
+                self._indice = IndiceLSH(len(vetor), self._tabelas, self._bits)
+            while len(self._entradas) >= self.max_entradas:
+                self._remover(next(iter(self._entradas)))
+            item_id = self._proximo_id
+            self._proximo_id += 1
+            self._entradas[item_id] = (escopo, pergunta, resposta, vetor, time.time())
+            self._indice.adicionar(item_id, vetor)
+
+    def responder(self, pergunta: str, gerar: Callable[[], Tuple[str, bool]], escopo: str = "geral") -> str:
+        """
+        Devolve a resposta em cache ou chama ``gerar`` e guarda o resultado
+
+        Args:
+            gerar: Função que retorna (resposta, pode_guardar); erros não devem ser guardados
+        """
+        inicio = time.perf_counter()
+        try:
+            resposta, _, vetor = self.buscar(pergunta, escopo)
+        except Exception as e:
+            # Falha no embedding não pode impedir a resposta
+            print(f"⚠️ Cache semântico indisponível para esta pergunta: {e}")
+            return gerar()[0]
+        if resposta is not None:
+            self._latencias_hit.append(time.perf_counter() - inicio)
+            return resposta
+
+        resposta, pode_guardar = gerar()
+        if pode_guardar:
+            self.guardar(pergunta, resposta, escopo, vetor)
+        self._latencias_miss.append(time.perf_counter() - inicio)
+        return resposta
+
+    def responder_stream(self, pergunta: str, gerar_stream: Callable[[], Iterator[str]],
+                         escopo: str = "geral") -> Union[str, Iterator[str]]:
+        """
+        Versão em streaming do ``responder``
+
+        Returns:
+            str com a resposta em cache, ou um gerador de trechos que guarda a
+            resposta completa ao terminar sem erro
+        """
+        inicio = time.perf_counter()
+        try:
+            resposta, _, vetor = self.buscar(pergunta, escopo)
+        except Exception as e:
+            print(f"⚠️ Cache semântico indisponível para esta pergunta: {e}")
+            return gerar_stream()
+        if resposta is not None:
+            self._latencias_hit.append(time.perf_counter() - inicio)
+            return resposta
+
+        def _gerar():
+            trechos = []
+            for trecho in gerar_stream():
+                trechos.append(trecho)
+                yield trecho
+            if trechos:
+                self.guardar(pergunta, "".join(trechos), escopo, vetor)
+            self._latencias_miss.append(time.perf_counter() - inicio)
+
+        return _gerar()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'limiar': self.limiar,
+                'hits': self.hits,
+                'misses': self.misses,
+                'quase_hits': self.quase_hits,
+                'hit_rate': round(self.hits / consultas, 3) if consultas else 0.0,
+                'similaridade_media_hits': (round(sum(self._similaridades_hit) / len(self._similaridades_hit), 3)
+                                            if self._similaridades_hit else 0.0),
+                'busca_ms_p50': round(_percentil(self._latencias_busca, 0.5) * 1000, 1),
+                'busca_ms_p95': round(_percentil(self._latencias_busca, 0.95) * 1000, 1),
+                'hit_ms_p50': round(_percentil(self._latencias_hit, 0.5) * 1000, 1),
+                'miss_ms_p50': round(_percentil(self._latencias_miss, 0.5) * 1000, 1),
+                'miss_ms_p95': round(_percentil(self._latencias_miss, 0.95) * 1000, 1),
+            }
+
+
+_cache_global = None
+_cache_global_lock = threading.Lock()
+
+
+def obter_cache_semantico() -> Optional[CacheSemantico]:
+    """
+    Cache semântico do processo, usando o modelo de embedding do Settings
+
+    Returns:
+        CacheSemantico ou None se desabilitado/indisponível
+    """
+    global _cache_global
+    if not SEMANTIC_CACHE_CONFIG["habilitado"] or not NUMPY_AVAILABLE:
+        return None
+    with _cache_global_lock:
+        if _cache_global is None:
+            try:
+                from llama_index.core import Settings
+                embed_model = Settings.embed_model
+            except Exception as e:
+                print(f"⚠️ Cache semântico indisponível: {e}")
+                return None
+            _cache_global = CacheSemantico(embed_model.get_query_embedding)
+        return _cache_global
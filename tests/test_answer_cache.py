@@ -0,0 +1,137 @@
+import shutil
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from llama_index.core import Settings
+from llama_index.core.chat_engine import ContextChatEngine
+from llama_index.core.llms import MockLLM
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+import answer_cache
+
+
+class RetrieverContado(BaseRetriever):
+    def __init__(self):
+        super().__init__()
+        self.chamadas = 0
+
+    def _retrieve(self, query_bundle):
+        self.chamadas += 1
+        return [NodeWithScore(node=TextNode(id_="n1", text="A AIRLESS 1095 trabalha a 3300 psi."), score=1.0)]
+
+
+class CacheRespostasTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_answer_cache").resolve()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        self.cache = answer_cache.CacheRespostas(
+            str(self.pasta / "respostas.sqlite"), ttl_segundos=60, max_entradas=3, tamanho_maximo_mb=1
+        )
+
+    def test_chave_ignora_caixa_acentos_e_pontuacao_final(self) -> None:
+        chave = self.cache.montar_chave("Qual a pressão da AIRLESS 1095?", ["n2", "n1"], "v1")
+
+        self.assertEqual(chave, self.cache.montar_chave("  qual a pressao da airless 1095 ", ["n1", "n2"], "v1"))
+        self.assertNotEqual(chave, self.cache.montar_chave("qual a pressao da airless 1095", ["n1"], "v1"))
+        self.assertNotEqual(chave, self.cache.montar_chave("qual a pressao da airless 1095", ["n1", "n2"], "v2"))
+
+    def test_hit_e_expiracao_por_ttl(self) -> None:
+        self.cache.put("k", "pergunta", "resposta", "v1")
+
+        self.assertEqual(self.cache.get("k"), "resposta")
+
+        self.cache.ttl_segundos = 0.01
+        time.sleep(0.05)
+        self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(self.cache.get_status()["hits"], 1)
+        self.assertEqual(self.cache.get_status()["entradas"], 0)
+
+    def test_poda_remove_menos_usadas(self) -> None:
+        for i in range(3):
+            self.cache.put(f"k{i}", "p", f"r{i}", "v1")
+            time.sleep(0.01)
+        self.cache.get("k0")
+        self.cache.put("k3", "p", "r3", "v1")
+
+        self.assertEqual(self.cache.get("k0"), "r0")
+        self.assertIsNone(self.cache.get("k1"))
+        self.assertLessEqual(self.cache.get_status()["entradas"], 3)
+
+
+
+class ChatEngineComCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_answer_cache_chat").resolve()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        self.contado = RetrieverContado()
+        retriever = answer_cache.RetrieverReaproveitavel(self.contado)
+        chat_engine = ContextChatEngine.from_defaults(
+            retriever=retriever, llm=MockLLM(max_tokens=8),
+            memory=ChatMemoryBuffer.from_defaults(token_limit=1000), system_prompt="",
+        )
+        cache = answer_cache.CacheRespostas(str(self.pasta / "respostas.sqlite"), ttl_segundos=60)
+        self.addCleanup(cache._db.close)
+        self.chat = answer_cache.ChatEngineComCache(chat_engine, retriever, "v1", cache)
+
+    def test_miss_recupera_uma_vez_so(self) -> None:
+        resposta = self.chat.chat("Qual a pressão da AIRLESS 1095?")
+
+        self.assertEqual(self.contado.chamadas, 1)
+        self.assertEqual([n.node.node_id for n in resposta.source_nodes], ["n1"])
+
+    def test_stream_miss_recupera_uma_vez_so(self) -> None:
+        resposta = self.chat.stream_chat("Qual a pressão da AIRLESS 1095?")
+        "".join(resposta.response_gen)
+
+        self.assertEqual(self.contado.chamadas, 1)
+        self.assertEqual([n.node.node_id for n in resposta.source_nodes], ["n1"])
+
+    def test_nos_reaproveitados_so_para_a_mesma_pergunta(self) -> None:
+        retriever = answer_cache.RetrieverReaproveitavel(self.contado)
+        retriever.reaproveitar("outra pergunta", [])
+
+        self.assertEqual(len(retriever.retrieve("pergunta")), 1)
+        self.assertEqual(len(retriever.retrieve("pergunta")), 1)
+        self.assertEqual(self.contado.chamadas, 2)
+
+
+class QueryEngineComCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_answer_cache_query").resolve()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        patcher = mock.patch.object(Settings, "_llm", MockLLM(max_tokens=8))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.contado = RetrieverContado()
+        self.cache = answer_cache.CacheRespostas(str(self.pasta / "respostas.sqlite"), ttl_segundos=60)
+        self.addCleanup(self.cache._db.close)
+        self.query_engine = RetrieverQueryEngine.from_args(self.contado)
+
+    def test_stream_miss_sai_em_trechos_e_vai_para_o_cache(self) -> None:
+        engine = answer_cache.QueryEngineComCache(self.query_engine, "v1", self.cache)
+
+        trechos = list(engine.stream_query("Qual a pressão da AIRLESS 1095?").response_gen)
+        self.assertGreater(len(trechos), 1)
+
+        resposta = engine.query("qual a pressao da airless 1095")
+        self.assertTrue(resposta.from_cache)
+        self.assertEqual(str(resposta), "".join(trechos))
+
+    def test_stream_sem_cache_de_respostas(self) -> None:
+        resposta = answer_cache.consultar_em_streaming(self.query_engine, "Qual a pressão da AIRLESS 1095?")
+
+        self.assertGreater(len(list(resposta.response_gen)), 1)
+        self.assertEqual([n.node.node_id for n in resposta.source_nodes], ["n1"])
+        self.assertEqual(self.contado.chamadas, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
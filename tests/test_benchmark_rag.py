@@ -0,0 +1,38 @@
+import unittest
+from unittest import mock
+
+from config import ANSWER_CACHE_CONFIG, HYBRID_CONFIG, RAG_CONFIG
+from llama_index.core import Settings
+from tools import benchmark_rag
+
+
+class BenchmarkRagTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # O benchmark configura o processo inteiro; nada disso pode vazar para os outros testes
+        for nome in ("_llm", "_embed_model", "_node_parser"):
+            patcher = mock.patch.object(Settings, nome, getattr(Settings, nome))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for config in (ANSWER_CACHE_CONFIG, HYBRID_CONFIG, RAG_CONFIG):
+            patcher = mock.patch.dict(config)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_perguntas_apontam_para_o_corpus(self) -> None:
+        arquivos = {name for files in benchmark_rag.corpus_files().values()
+                    for name in (f.replace("\\", "/").rsplit("/", 1)[-1] for f in files)}
+
+        for item in benchmark_rag.load_questions(benchmark_rag.DEFAULT_QUESTIONS):
+            self.assertTrue(set(item["fontes"]) <= arquivos, item)
+
+    def test_benchmark_offline(self) -> None:
+        resultado = benchmark_rag.run(ks=[1, 3], embedding="hash", shards=True, repeats=1)
+
+        self.assertEqual(resultado["shards"], 2)
+        self.assertGreaterEqual(resultado["recall"]["@3"], 0.8)
+        self.assertGreater(resultado["mrr"], 0.5)
+        self.assertGreater(resultado["consulta_ms_p95"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
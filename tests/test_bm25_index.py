@@ -0,0 +1,83 @@
+import shutil
+import unittest
+from pathlib import Path
+
+import bm25_index
+
+
+class IndiceBM25Test(unittest.TestCase):
+    def setUp(self) -> None:
+        self.indice = bm25_index.IndiceBM25()
+        self.indice.adicionar("manual", "Manual técnico da AIRLESS 1095: pressão máxima 3300 psi.")
+        self.indice.adicionar("vendas", "Procedimentos de vendas da linha airless e formas de pagamento.")
+        self.indice.adicionar("catalogo", "Catálogo Finiti: bico FT-210, mangueira e pistola.")
+
+    def test_tokenizacao_remove_acentos_e_preserva_codigos(self) -> None:
+        termos = bm25_index.tokenizar("Pressão do bico FT-210")
+
+        self.assertIn("pressao", termos)
+        self.assertIn("ft-210", termos)
+        self.assertIn("210", termos)
+        self.assertNotIn("do", termos)
+
+    def test_codigo_exato_ranqueia_o_chunk_certo(self) -> None:
+        resultado = self.indice.buscar("qual o preço da airless 1095?", top_k=3)
+
+        self.assertEqual(resultado[0][0], "manual")
+        self.assertEqual(bm25_index.termos_exatos("preço da airless 1095"), ["1095"])
+        self.assertTrue(self.indice.contem_termos("manual", ["1095"]))
+        self.assertFalse(self.indice.contem_termos("vendas", ["1095"]))
+
+    def test_remover_chunk(self) -> None:
+        self.indice.remover("catalogo")
+
+        self.assertEqual(self.indice.buscar("ft-210"), [])
+        self.assertEqual(len(self.indice), 2)
+
+    def test_salvar_e_carregar(self) -> None:
+        pasta = Path("tests/tmp_bm25").resolve()
+        pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, pasta, True)
+        caminho = str(pasta / bm25_index.ARQUIVO_BM25)
+
+        self.indice.salvar(caminho)
+        carregado = bm25_index.IndiceBM25.carregar(caminho)
+
+        self.assertEqual(carregado.buscar("bico ft-210"), self.indice.buscar("bico ft-210"))
+
+    def test_fusao_rrf_favorece_consenso(self) -> None:
+        fundidos = bm25_index.fundir_rrf([["a", "b", "c"], ["b", "d"]], k=60)
+
+        self.assertEqual(fundidos[0][0], "b")
+        self.assertEqual({node_id for node_id, _ in fundidos}, {"a", "b", "c", "d"})
+
+
+@unittest.skipUnless(bm25_index.LLAMA_INDEX_AVAILABLE, "llama_index não instalado")
+class RetrieverFanOutTest(unittest.TestCase):
+    class _Shard:
+        def __init__(self, textos):
+            from llama_index.core.schema import NodeWithScore, TextNode
+
+            self._bm25 = bm25_index.IndiceBM25()
+            self._nos = []
+            for node_id, texto in textos.items():
+                self._bm25.adicionar(node_id, texto)
+                self._nos.append(NodeWithScore(node=TextNode(id_=node_id, text=texto), score=1.0))
+
+        def retrieve(self, query_bundle):
+            return list(self._nos)
+
+    def test_funde_shards_priorizando_codigo_exato(self) -> None:
+        from llama_index.core.schema import QueryBundle
+
+        memoria = self._Shard({"manual": "Manual da AIRLESS 1095"})
+        catalogo = self._Shard({"bico": "Catálogo: bico FT-210", "pistola": "Pistola airless"})
+        retriever = bm25_index.RetrieverFanOut([memoria, catalogo], top_k=2)
+
+        resultado = retriever.retrieve(QueryBundle("bico ft-210"))
+
+        self.assertEqual([n.node.node_id for n in resultado], ["bico", "manual"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import chunker
+
+MANUAL = """MANUAL TÉCNICO - AIRLESS 1095
+=============================
+
+ESPECIFICAÇÕES TÉCNICAS:
+- Pressão máxima: 210 bar (3000 PSI)
+- Vazão máxima: 2,5 L/min
+
+MANUTENÇÃO:
+A limpeza deve ser feita após cada uso. Verifique o filtro aprox. a cada semana.
+Troque as vedações da bomba conforme o
+manual do fabricante.
+
+GARANTIA:
+12 meses contra defeitos de fabricação.
+"""
+
+
+class DividirSentencasTest(unittest.TestCase):
+    def test_nao_corta_em_abreviacoes_e_decimais(self) -> None:
+        sentencas = chunker.dividir_sentencas("O Sr. Silva usou 2.5 L de tinta. A pressão máx. é 210 bar! Fim")
+
+        self.assertEqual(sentencas, ["O Sr. Silva usou 2.5 L de tinta.", "A pressão máx. é 210 bar!", "Fim"])
+
+
+class DividirTextoTest(unittest.TestCase):
+    def test_secoes_pequenas_dividem_o_chunk(self) -> None:
+        trechos = chunker.dividir_texto(MANUAL, chunk_size=500, chunk_overlap=50)
+
+        self.assertEqual(len(trechos), 1)
+        self.assertEqual(trechos[0].secao, "MANUAL TÉCNICO - AIRLESS 1095")
+        self.assertIn("conforme o manual do fabricante.", trechos[0].texto)
+
+    def test_titulos_sao_fronteiras(self) -> None:
+        trechos = chunker.dividir_texto(MANUAL, chunk_size=40, chunk_overlap=10)
+
+        self.assertEqual(len(trechos), 2)
+        self.assertTrue(all(t.tokens <= 40 for t in trechos))
+        # A seção de manutenção não cabe no primeiro chunk: começa um novo em vez de ser partida
+        self.assertTrue(trechos[1].texto.startswith("MANUTENÇÃO:"))
+        self.assertEqual(trechos[1].secao, "MANUAL TÉCNICO - AIRLESS 1095 > MANUTENÇÃO")
+        self.assertIn("GARANTIA:\n12 meses", trechos[1].texto)
+
+    def test_sobreposicao_dentro_da_secao(self) -> None:
+        texto = "MANUTENÇÃO:\n" + " ".join(f"Passo {i} da limpeza da bomba." for i in range(30))
+
+        trechos = chunker.dividir_texto(texto, chunk_size=30, chunk_overlap=8)
+
+        self.assertGreater(len(trechos), 2)
+        self.assertTrue(all(t.tokens <= 30 for t in trechos))
+        ultima_do_primeiro = trechos[0].texto.split("\n")[-1].split(". ")[-1]
+        self.assertIn(ultima_do_primeiro.rstrip("."), trechos[1].texto)
+
+    def test_overlap_maior_que_chunk_e_erro(self) -> None:
+        with self.assertRaises(ValueError):
+            chunker.dividir_texto(MANUAL, chunk_size=100, chunk_overlap=100)
+
+    def test_cli_limita_a_sobreposicao_padrao_ao_chunk_menor(self) -> None:
+        with mock.patch("document_parser.ler_documentos_em_paralelo",
+                        return_value=[SimpleNamespace(text=MANUAL, metadata={"file_path": "manual.txt"})]), \
+                mock.patch("builtins.print"):
+            self.assertEqual(chunker.main(["manual.txt", "--chunk-size", "100"]), 0)
+
+    def test_cli_rejeita_sobreposicao_invalida(self) -> None:
+        with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+            chunker.main(["manual.txt", "--chunk-size", "100", "--chunk-overlap", "100"])
+
+    def test_relatorio(self) -> None:
+        relatorio = chunker.relatorio_chunking([("manual.txt", MANUAL)], chunk_size=40, chunk_overlap=10)
+
+        self.assertEqual(relatorio["chunks"], relatorio["chunks_por_arquivo"]["manual.txt"])
+        self.assertLessEqual(relatorio["tokens_max"], 40)
+        self.assertEqual(sum(relatorio["histograma_tokens"].values()), relatorio["chunks"])
+
+
+@unittest.skipUnless(chunker.LLAMA_INDEX_AVAILABLE, "llama_index não instalado")
+class ChunkerAFITest(unittest.TestCase):
+    def test_nos_recebem_secao(self) -> None:
+        from llama_index.core import Document
+
+        parser = chunker.ChunkerAFI(chunk_size=40, chunk_overlap=10)
+        nos = parser.get_nodes_from_documents([Document(text=MANUAL, metadata={"file_name": "manual.txt"})])
+
+        self.assertGreater(len(nos), 1)
+        self.assertEqual(nos[0].metadata["file_name"], "manual.txt")
+        self.assertTrue(all("secao" in no.metadata for no in nos))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import time
+import unittest
+from pathlib import Path
+
+from llama_index.core import Document
+
+import document_parser
+
+
+def _leitor_teste(caminho: str, filename_as_id: bool) -> list:
+    """Leitor dos testes: o conteúdo do arquivo diz como o "parser" se comporta"""
+    with open(Path(caminho).parent / "leituras.log", "a", encoding="utf-8") as log:
+        log.write(Path(caminho).name + "\n")
+    conteudo = Path(caminho).read_text(encoding="utf-8")
+    if conteudo == "trava":
+        time.sleep(60)
+    elif conteudo == "lento":
+        time.sleep(1.5)
+    elif conteudo == "erro":
+        raise ValueError("arquivo corrompido")
+    elif conteudo == "crash":
+        os._exit(1)
+    return [Document(text=conteudo, metadata={"file_path": caminho})]
+
+
+class LeituraParalelaTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_root = Path("tests/tmp_document_parser").resolve()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+        self.tmp_root.mkdir(parents=True)
+        self.addCleanup(shutil.rmtree, self.tmp_root, True)
+        self.quarentena = document_parser.Quarentena(str(self.tmp_root / "quarentena.json"))
+
+    def _arquivo(self, nome: str, conteudo: str) -> str:
+        caminho = self.tmp_root / nome
+        caminho.write_text(conteudo, encoding="utf-8")
+        return str(caminho)
+
+    def _ler(self, arquivos, workers: int, timeout: float = 1.0):
+        documentos = document_parser.ler_documentos_em_paralelo(
+            arquivos, workers=workers, timeout_por_arquivo=timeout,
+            quarentena=self.quarentena, leitor=_leitor_teste,
+        )
+        return sorted(d.text for d in documentos)
+
+    def test_arquivo_unico_respeita_o_timeout(self) -> None:
+        travado = self._arquivo("travado.pdf", "trava")
+
+        inicio = time.monotonic()
+        self.assertEqual(self._ler([travado], workers=1), [])
+
+        self.assertLess(time.monotonic() - inicio, 20)
+        self.assertTrue(self.quarentena.contem(travado))
+        self.assertIn("timeout", self.quarentena.entradas[os.path.abspath(travado)]["motivo"])
+
+    def test_arquivo_na_fila_nao_conta_o_tempo_de_espera(self) -> None:
+        # O pool marca três tarefas como "running" com dois workers; a terceira
+        # só começa depois de ~1,5s e termina em ~3s, além do timeout de 2s
+        arquivos = [self._arquivo(f"lento{i}.pdf", "lento") for i in range(3)]
+
+        self.assertEqual(self._ler(arquivos, workers=2, timeout=2.0), ["lento"] * 3)
+
+        self.assertEqual(self.quarentena.entradas, {})
+
+    def test_timeout_nao_reinicia_as_leituras_dos_outros_workers(self) -> None:
+        # lento1 ainda está sendo lido quando o travado estoura o timeout (~2s)
+        arquivos = [self._arquivo("travado.pdf", "trava"), self._arquivo("lento0.pdf", "lento"),
+                    self._arquivo("lento1.pdf", "lento"), self._arquivo("nota.txt", "texto")]
+
+        self.assertEqual(self._ler(arquivos, workers=2, timeout=2.0), ["lento", "lento", "texto"])
+
+        self.assertEqual(list(self.quarentena.entradas), [os.path.abspath(arquivos[0])])
+        leituras = (self.tmp_root / "leituras.log").read_text(encoding="utf-8").split()
+        self.assertEqual(sorted(leituras), ["lento0.pdf", "lento1.pdf", "nota.txt", "travado.pdf"])
+
+    def test_erro_e_crash_vao_para_quarentena(self) -> None:
+        arquivos = [self._arquivo("erro.docx", "erro"), self._arquivo("crash.pdf", "crash"),
+                    self._arquivo("bom.pdf", "bom"), self._arquivo("nota.txt", "texto")]
+
+        self.assertEqual(self._ler(arquivos, workers=2, timeout=10), ["bom", "texto"])
+
+        self.assertEqual(sorted(Path(a).name for a in self.quarentena.entradas), ["crash.pdf", "erro.docx"])
+        # Persistida: na próxima leitura os dois nem são tentados
+        recarregada = document_parser.Quarentena(self.quarentena.caminho)
+        self.assertTrue(all(recarregada.contem(a) for a in arquivos[:2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import itertools
+import multiprocessing
+import random
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import embedding_cache
+
+DIMENSAO = 4
+
+
+def _vetor(i: int):
+    return [float(i), 1.0, -1.0, 0.5]
+
+
+def _limite_mb(slots: int) -> float:
+    return slots * DIMENSAO * 2 / (1024 * 1024)
+
+
+def _vetor_do_texto(texto: str):
+    i = float(texto[1:])
+    return [i, -i, 2.0 * i, 1.0]
+
+
+def _usar_cache_em_paralelo(pasta: str, semente: int, erros) -> None:
+    """Processo que grava e lê textos compartilhados num cache pequeno (muito despejo)"""
+    cache = embedding_cache.CacheEmbeddings("modelo/teste", pasta=pasta, tamanho_maximo_mb=_limite_mb(8))
+    sorteio = random.Random(semente)
+    textos = [f"t{i}" for i in range(30)]
+    for _ in range(300):
+        lote = sorteio.sample(textos, 4)
+        cache.put_many(lote, [_vetor_do_texto(t) for t in lote])
+        lidos = sorteio.sample(textos, 6)
+        for texto, vetor in zip(lidos, cache.get_many(lidos)):
+            if vetor is not None and vetor != _vetor_do_texto(texto):
+                erros.put(f"{texto}: {vetor}")
+    cache.close()
+
+
+class CacheEmbeddingsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_embedding_cache").resolve()
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        # ultimo_uso estritamente crescente: a ordem LRU não depende da resolução do relógio
+        relogio = mock.patch.object(embedding_cache.time, "time", side_effect=itertools.count(1.0))
+        relogio.start()
+        self.addCleanup(relogio.stop)
+
+    def _cache(self, slots: int = 64) -> embedding_cache.CacheEmbeddings:
+        cache = embedding_cache.CacheEmbeddings("modelo/teste", pasta=str(self.pasta),
+                                                tamanho_maximo_mb=_limite_mb(slots))
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_lru_despeja_a_entrada_usada_ha_mais_tempo(self) -> None:
+        cache = self._cache(slots=2)
+        cache.put_many(["a", "b"], [_vetor(1), _vetor(2)])
+        cache.get_many(["a"])
+
+        cache.put_many(["c"], [_vetor(3)])
+
+        a, b, c = cache.get_many(["a", "b", "c"])
+        self.assertEqual((a, b, c), (_vetor(1), None, _vetor(3)))
+        self.assertEqual(cache.get_status()["entradas"], 2)
+
+    def test_le_slots_de_arquivo_crescido_por_outro_processo(self) -> None:
+        with mock.patch.object(embedding_cache, "SLOTS_INICIAIS", 2):
+            escritor = self._cache()
+            escritor.put_many(["t0"], [_vetor(0)])
+            leitor = self._cache()
+            self.assertEqual(leitor._vetores.shape[0], 2)
+
+            textos = [f"t{i}" for i in range(1, 6)]
+            escritor.put_many(textos, [_vetor(i) for i in range(1, 6)])
+
+            self.assertEqual(leitor.get_many(textos), [_vetor(i) for i in range(1, 6)])
+            self.assertGreaterEqual(leitor._vetores.shape[0], 6)
+
+    def test_reabrir_mantem_os_vetores(self) -> None:
+        cache = self._cache()
+        vetor = np.linspace(-1, 1, DIMENSAO).tolist()
+        cache.put_many(["chunk"], [vetor])
+        cache.close()
+
+        reaberto = self._cache()
+
+        self.assertEqual(reaberto.dimensao, DIMENSAO)
+        np.testing.assert_allclose(reaberto.get_many(["chunk"])[0], vetor, atol=1e-3)
+        self.assertEqual(reaberto.get_many(["outro"]), [None])
+
+
+class CacheEmbeddingsMultiprocessoTest(unittest.TestCase):
+    def test_dois_processos_nunca_leem_vetor_de_outra_chave(self) -> None:
+        pasta = Path("tests/tmp_embedding_cache_mp").resolve()
+        shutil.rmtree(pasta, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, pasta, True)
+        embedding_cache.CacheEmbeddings("modelo/teste", pasta=str(pasta),
+                                        tamanho_maximo_mb=_limite_mb(8)).close()
+
+        contexto = multiprocessing.get_context("fork")
+        erros = contexto.Queue()
+        processos = [contexto.Process(target=_usar_cache_em_paralelo, args=(str(pasta), semente, erros))
+                     for semente in range(3)]
+        for processo in processos:
+            processo.start()
+        for processo in processos:
+            processo.join(120)
+
+        self.assertEqual([p.exitcode for p in processos], [0, 0, 0])
+        encontrados = []
+        while not erros.empty():
+            encontrados.append(erros.get())
+        self.assertEqual(encontrados, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
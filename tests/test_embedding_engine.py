@@ -0,0 +1,76 @@
+import unittest
+from typing import List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+import embedding_engine
+
+
+class EmbeddingComprimento(BaseEmbedding):
+    """Vetor = [comprimento do texto, posição no lote]; guarda os lotes recebidos"""
+
+    _lotes: list = PrivateAttr(default_factory=list)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "EmbeddingComprimento"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [float(len(query)), 0.0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._lotes.append(list(texts))
+        return [[float(len(t)), float(i)] for i, t in enumerate(texts)]
+
+
+class DesperdicioPaddingTest(unittest.TestCase):
+    def test_valores_conhecidos(self) -> None:
+        # Lotes de 2: (10, 1) -> 9 e (9, 2) -> 7
+        self.assertEqual(embedding_engine.desperdicio_padding([10, 1, 9, 2], 2), 16)
+        # Ordenados: (1, 2) -> 1 e (9, 10) -> 1
+        self.assertEqual(embedding_engine.desperdicio_padding([1, 2, 9, 10], 2), 2)
+        # Último lote incompleto e lote único
+        self.assertEqual(embedding_engine.desperdicio_padding([5, 5, 1], 2), 0)
+        self.assertEqual(embedding_engine.desperdicio_padding([3, 1, 2], 8), 3)
+        self.assertEqual(embedding_engine.desperdicio_padding([], 4), 0)
+
+
+class EmbeddingEmLotesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.interno = EmbeddingComprimento(model_name="comprimento")
+        self.textos = ["a" * n for n in (10, 1, 9, 2, 7, 3)]
+
+    def test_resultado_volta_na_ordem_original(self) -> None:
+        modelo = embedding_engine.EmbeddingEmLotes(self.interno, tamanho_lote=2, janela_ordenacao=8)
+
+        vetores = modelo._get_text_embeddings(self.textos)
+
+        self.assertEqual([v[0] for v in vetores], [10.0, 1.0, 9.0, 2.0, 7.0, 3.0])
+        # Lotes formados por textos de tamanho parecido
+        self.assertEqual([[len(t) for t in lote] for lote in self.interno._lotes], [[1, 2], [3, 7], [9, 10]])
+        status = modelo.relatorio.get_status()
+        self.assertEqual((status["chunks"], status["lotes"]), (6, 3))
+        self.assertEqual(status["padding_evitado_caracteres"],
+                         embedding_engine.desperdicio_padding([10, 1, 9, 2, 7, 3], 2)
+                         - embedding_engine.desperdicio_padding([1, 2, 3, 7, 9, 10], 2))
+
+    def test_sem_ordenacao_mantem_os_lotes_de_entrada(self) -> None:
+        modelo = embedding_engine.EmbeddingEmLotes(self.interno, tamanho_lote=4, janela_ordenacao=8,
+                                                   ordenar_por_tamanho=False)
+
+        vetores = modelo._get_text_embeddings(self.textos)
+
+        self.assertEqual([v[0] for v in vetores], [10.0, 1.0, 9.0, 2.0, 7.0, 3.0])
+        self.assertEqual(self.interno._lotes, [self.textos[:4], self.textos[4:]])
+        self.assertEqual(modelo.relatorio.get_status()["padding_evitado_caracteres"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
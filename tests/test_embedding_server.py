@@ -0,0 +1,43 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from llama_index.core.embeddings import MockEmbedding
+
+from config import EMBEDDING_SERVER_CONFIG
+from embedding_engine import criar_modelo_embedding
+from embedding_server import EmbeddingRemoto, ServidorEmbeddings, conectar_servidor_embeddings
+
+
+class ServidorEmbeddingsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict(EMBEDDING_SERVER_CONFIG, {"janela_ms": 50})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.servidor = ServidorEmbeddings(MockEmbedding(embed_dim=4), host="127.0.0.1", porta=0).iniciar()
+        self.addCleanup(self.servidor.parar)
+
+    def test_pedidos_simultaneos_dividem_o_lote(self) -> None:
+        cliente = EmbeddingRemoto(url=self.servidor.url)
+        self.assertEqual(cliente.model_name, "unknown")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            vetores = list(executor.map(lambda i: cliente.get_text_embedding_batch([f"texto {i}", f"outro {i}"]),
+                                        range(8)))
+        self.assertEqual([len(v) for v in vetores], [2] * 8)
+        self.assertEqual(len(cliente.get_query_embedding("pergunta")), 4)
+
+        status = cliente.get_status()
+        self.assertEqual(status["textos"], 17)
+        self.assertLess(status["lotes"], status["pedidos"])
+
+    def test_cliente_so_quando_o_servidor_serve_o_mesmo_modelo(self) -> None:
+        with mock.patch.dict(EMBEDDING_SERVER_CONFIG, {"porta": self.servidor.porta}):
+            self.assertIsInstance(criar_modelo_embedding("unknown", usar_servidor=True), EmbeddingRemoto)
+            self.assertIsNone(conectar_servidor_embeddings("BAAI/bge-small-en-v1.5"))
+        with mock.patch.dict(EMBEDDING_SERVER_CONFIG, {"porta": 1}):
+            self.assertIsNone(conectar_servidor_embeddings("unknown"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from environment import DEFAULT_OLLAMA_URL, load_settings
+from llm_streaming import stream_ollama_generate
+from ollama_client import ClienteOllama, MonitorSaudeOllama
+from tools.fake_ollama import Distribution, FakeOllama, FakeOllamaConfig, split_tokens
+
+
+class DistributionTest(unittest.TestCase):
+    def test_parse_and_sample(self) -> None:
+        import random
+
+        rng = random.Random(1)
+        self.assertEqual(Distribution("fixed:0.25").sample(rng), 0.25)
+        for _ in range(50):
+            self.assertTrue(0.1 <= Distribution("uniform:0.1,0.2").sample(rng) <= 0.2)
+            self.assertGreaterEqual(Distribution("normal:0,1").sample(rng), 0.0)
+        with self.assertRaises(ValueError):
+            Distribution("gamma:1,2")
+        with self.assertRaises(ValueError):
+            Distribution("uniform:1")
+
+    def test_split_tokens_joins_back(self) -> None:
+        texto = "Pintura airless  com acabamento uniforme."
+        self.assertEqual("".join(split_tokens(texto)), texto)
+
+
+class FakeOllamaTest(unittest.TestCase):
+    def iniciar(self, **config) -> ClienteOllama:
+        servidor = FakeOllama(FakeOllamaConfig(seed=7, **config)).start()
+        self.addCleanup(servidor.stop)
+        self.servidor = servidor
+        cliente = ClienteOllama(url=servidor.url, tentativas=1)
+        self.addCleanup(cliente.fechar)
+        return cliente
+
+    def test_tags_alimenta_o_monitor(self) -> None:
+        cliente = self.iniciar(models=("modelo-falso:latest",))
+        monitor = MonitorSaudeOllama(cliente=cliente, iniciar=False)
+        self.assertTrue(monitor.verificar_agora())
+        self.assertEqual(monitor.get_status()['modelos'], ["modelo-falso:latest"])
+
+    def test_generate_sem_stream(self) -> None:
+        cliente = self.iniciar(response="Frase pronta.")
+        resposta = cliente.post("/api/generate", json={"model": "llava-llama3", "prompt": "x", "stream": False})
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual(dados["response"], "Frase pronta.")
+        self.assertTrue(dados["done"])
+
+    def test_stream_respeita_tempo_ate_primeiro_token_e_taxa(self) -> None:
+        cliente = self.iniciar(response="um dois três quatro", ttft=Distribution("fixed:0.1"),
+                               tokens_per_second=50)
+        inicio = time.perf_counter()
+        trechos = list(stream_ollama_generate("x", cliente=cliente))
+        duracao = time.perf_counter() - inicio
+        self.assertEqual("".join(trechos), "um dois três quatro")
+        self.assertEqual(len(trechos), 4)
+        # 0,1 s até o primeiro token + 3 intervalos de 20 ms
+        self.assertGreaterEqual(duracao, 0.15)
+
+    def test_modelo_desconhecido_da_404(self) -> None:
+        cliente = self.iniciar()
+        resposta = cliente.post("/api/generate", json={"model": "inexistente", "prompt": "x", "stream": False})
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_erro_injetado_e_repetido_pelo_cliente(self) -> None:
+        self.iniciar(error_rate=1.0, error_status=503)
+        cliente = ClienteOllama(url=self.servidor.url, tentativas=2)
+        self.addCleanup(cliente.fechar)
+        with mock.patch.object(cliente, "_espera", return_value=0):
+            resposta = cliente.post("/api/generate", json={"model": "llava-llama3", "prompt": "x"})
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(cliente.get_status()["/api/generate"]["repeticoes"], 1)
+        self.assertEqual(self.servidor.stats.snapshot()["errors"], 2)
+
+    def test_stream_interrompido(self) -> None:
+        cliente = self.iniciar(response="a b c d e f", drop_rate=1.0)
+        with self.assertRaises(requests.exceptions.RequestException):
+            list(stream_ollama_generate("x", cliente=cliente))
+        self.assertEqual(self.servidor.stats.snapshot()["drops"], 1)
+
+    def test_paralelismo_limitado_enfileira(self) -> None:
+        cliente = self.iniciar(parallel=1, ttft=Distribution("fixed:0.1"))
+        payload = {"model": "llava-llama3", "prompt": "x", "stream": False}
+        threads = [threading.Thread(target=cliente.post, args=("/api/generate",), kwargs={"json": payload})
+                   for _ in range(3)]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.perf_counter() - inicio, 0.28)
+        self.assertEqual(self.servidor.stats.snapshot()["peak_active"], 1)
+
+
+class OllamaUrlSettingTest(unittest.TestCase):
+    def test_padrao_e_variavel_de_ambiente(self) -> None:
+        with mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("AFI_OLLAMA_URL", None)
+            self.assertEqual(load_settings(create_dirs=False).ollama_url, DEFAULT_OLLAMA_URL)
+        with mock.patch.dict(os.environ, {"AFI_OLLAMA_URL": "http://127.0.0.1:11500/"}):
+            self.assertEqual(load_settings(create_dirs=False).ollama_url, "http://127.0.0.1:11500")
+
+
+if __name__ == "__main__":
+    unittest.main()
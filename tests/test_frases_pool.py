@@ -0,0 +1,80 @@
+import itertools
+import shutil
+import unittest
+from pathlib import Path
+
+import frases_pool
+
+
+class ValidarFraseTest(unittest.TestCase):
+    def test_limpa_prefixo_aspas_e_linhas_extras(self) -> None:
+        self.assertEqual(frases_pool.validar_frase('Frase: "Pinte mais rápido!"\nEspero ter ajudado.', 30),
+                         "Pinte mais rápido!")
+
+    def test_rejeita_longa_vazia_e_mensagem_de_erro(self) -> None:
+        self.assertIsNone(frases_pool.validar_frase("x" * 31, 30))
+        self.assertIsNone(frases_pool.validar_frase("  \n ", 30))
+        self.assertIsNone(frases_pool.validar_frase("Erro na API do Ollama: 500", 80))
+
+
+class PoolFrasesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_frases_pool").resolve()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        self.contador = itertools.count()
+        self.ocioso = True
+
+    def criar_pool(self, gerar=None) -> frases_pool.PoolFrases:
+        pool = frases_pool.PoolFrases(
+            str(self.pasta / "frases.sqlite"), tipos=[("Rock", 30), ("persuasiva", 80)], estoque=2,
+            gerar=gerar or (lambda prompt: f"Frase {next(self.contador)}"), ocioso=lambda: self.ocioso,
+        )
+        self.addCleanup(pool.parar)
+        return pool
+
+    def test_abastece_todos_os_tipos_e_persiste(self) -> None:
+        pool = self.criar_pool()
+
+        self.assertEqual(pool.abastecer(), 4)
+        self.assertEqual(pool.get_status()["por_tipo"], {"Rock/30": 2, "persuasiva/80": 2})
+
+        reaberto = self.criar_pool()
+        self.assertEqual(reaberto.retirar("Rock", 30), "Frase 0")
+        self.assertEqual(reaberto.retirar("Rock", 30), "Frase 2")
+        self.assertIsNone(reaberto.retirar("Rock", 30))
+        self.assertEqual((reaberto.get_status()["retiradas"], reaberto.get_status()["faltas"]), (2, 1))
+
+    def test_nao_gera_com_ollama_ocupado(self) -> None:
+        pool = self.criar_pool()
+        self.ocioso = False
+
+        self.assertEqual(pool.abastecer(), 0)
+        self.assertIsNone(pool.retirar("persuasiva", 80))
+
+    def test_frases_invalidas_ou_repetidas_nao_entram(self) -> None:
+        pool = self.criar_pool(gerar=lambda prompt: "Sempre a mesma")
+
+        pool.abastecer(max_geracoes=4)
+
+        self.assertEqual(pool.quantidade("Rock", 30) + pool.quantidade("persuasiva", 80), 2)
+        self.assertEqual(pool.get_status()["rejeitadas"], 2)
+
+    def test_um_processo_repoe_por_vez_sem_passar_do_estoque(self) -> None:
+        app = self.criar_pool()
+        guardiao = self.criar_pool()
+
+        self.assertEqual(app.abastecer(max_geracoes=1), 1)
+        # A concessão está com o outro pool: nada é gerado aqui
+        self.assertEqual(guardiao.abastecer(), 0)
+        self.assertEqual(guardiao.get_status()["geradas"], 0)
+
+        app.parar()
+        self.assertEqual(guardiao.abastecer(), 3)
+        # Mesmo sem a concessão, a inserção não passa do alvo
+        self.assertFalse(app.repor("Rock", 30))
+        self.assertEqual(guardiao.get_status()["por_tipo"], {"Rock/30": 2, "persuasiva/80": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
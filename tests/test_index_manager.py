@@ -0,0 +1,88 @@
+import shutil
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from llama_index.core import Document, Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+
+from answer_cache import versao_indices
+from config import ANSWER_CACHE_CONFIG
+from document_parser import ProgressoIndexacao
+from index_manager import MODO_LOCAL, GerenciadorIndice
+
+
+class ProgressoIndexacaoTest(unittest.TestCase):
+    def test_eta_pelo_ritmo_dos_arquivos(self) -> None:
+        progresso = ProgressoIndexacao()
+        progresso.iniciar("memoria")
+        progresso.definir_arquivos(4)
+        documento = Document(text="a", metadata={"file_path": "memoria/a.txt"})
+        progresso.registrar_documento(documento)
+        self.assertIsNone(progresso.get_status()["eta_s"])
+
+        progresso.registrar_lote([documento], chunks=3)
+        status = progresso.get_status()
+
+        self.assertEqual(status["fase"], "indexando")
+        self.assertEqual((status["arquivos_lidos"], status["arquivos_embedados"]), (1, 1))
+        self.assertEqual(status["chunks_embedados"], 3)
+        self.assertAlmostEqual(status["eta_s"], status["decorrido_s"] * 3, delta=0.2)
+
+
+class InicializacaoEmSegundoPlanoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        for nome in ("_llm", "_embed_model"):
+            patcher = mock.patch.object(Settings, nome, getattr(Settings, nome))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(ANSWER_CACHE_CONFIG, {"habilitado": False})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pasta = Path("tests/tmp_index_manager").resolve()
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        self.pasta.mkdir(parents=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        for i in range(3):
+            (self.pasta / f"manual_{i}.txt").write_text(f"MANUAL {i}\nPressão máxima de {i}00 bar.", encoding="utf-8")
+
+    def test_construtor_nao_espera_modelos_nem_base(self) -> None:
+        def carregar_modelos():
+            time.sleep(0.3)
+            Settings.embed_model = MockEmbedding(embed_dim=8)
+            Settings.llm = MockLLM()
+
+        inicio = time.perf_counter()
+        gerenciador = GerenciadorIndice("mock", inicializar=carregar_modelos)
+        futuro = gerenciador.reconstruir(str(self.pasta), MODO_LOCAL)
+        self.assertLess(time.perf_counter() - inicio, 0.2)
+        self.assertIsNone(gerenciador.query_engine)
+        self.assertEqual(gerenciador.get_status()["progresso"]["fase"], "carregando modelos")
+
+        self.assertTrue(futuro.result(timeout=30))
+        status = gerenciador.get_status()
+        self.assertTrue(status["inicializado"])
+        self.assertIsNotNone(gerenciador.query_engine)
+        self.assertEqual(status["progresso"]["fase"], "parado")
+        self.assertEqual(status["progresso"]["arquivos_embedados"], 3)
+        # Com o cache de respostas desligado a base ainda tem versão (escopo do cache semântico)
+        self.assertFalse(hasattr(gerenciador.query_engine, "versao"))
+        self.assertEqual(status["versao"], versao_indices(gerenciador.base.indices))
+        self.assertTrue(status["versao"])
+
+    def test_falha_na_inicializacao_nao_troca_a_base(self) -> None:
+        def carregar_modelos():
+            raise OSError("modelo não encontrado")
+
+        gerenciador = GerenciadorIndice("mock", inicializar=carregar_modelos)
+
+        self.assertFalse(gerenciador.reconstruir(str(self.pasta), MODO_LOCAL).result(timeout=30))
+        self.assertIsNone(gerenciador.base)
+        self.assertIn("modelo não encontrado", gerenciador.ultimo_erro)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import itertools
+import shutil
+import unittest
+from pathlib import Path
+
+from intent_router import (INTENCAO_GERAL, INTENCAO_IMAGEM, INTENCAO_PESQUISA, INTENCAO_PRODUTOS,
+                           INTENCAO_TRANSCRICAO, PALAVRAS_INTENCOES, EstadoMemoria, RoteadorIntencoes)
+from tools import benchmark_router
+
+
+def _rota_antiga(prompt: str):
+    """Só as palavras-chave, na ordem dos ``if`` do roteador antigo"""
+    prompt_lower = prompt.lower()
+    for intencao, palavras in PALAVRAS_INTENCOES.items():
+        if any(palavra in prompt_lower for palavra in palavras):
+            return intencao
+    return INTENCAO_GERAL
+
+
+class RoteadorIntencoesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.roteador = RoteadorIntencoes()
+
+    def test_prioridade_igual_ao_roteador_antigo(self) -> None:
+        # Intenção de prioridade alta depois de uma de prioridade baixa no texto
+        self.assertEqual(self.roteador.rotear("Qual o PREÇO do produto? Transcreva o vídeo").intencao,
+                         INTENCAO_TRANSCRICAO)
+        self.assertEqual(self.roteador.rotear("Desenhe o equipamento").intencao, INTENCAO_IMAGEM)
+        self.assertEqual(self.roteador.rotear("Qual o preço atual de tinta?").intencao, INTENCAO_PESQUISA)
+        self.assertEqual(self.roteador.rotear("Quanto custa o produto?").intencao, INTENCAO_PRODUTOS)
+        self.assertEqual(self.roteador.rotear("Bom dia!").intencao, INTENCAO_GERAL)
+
+    def test_palavras_sobrepostas_e_combinacoes(self) -> None:
+        palavras = [p for lista in PALAVRAS_INTENCOES.values() for p in lista]
+        prompts = list(benchmark_router.DEFAULT_PROMPTS)
+        # Pares de palavras coladas (uma pode começar dentro da outra) e com texto em volta
+        prompts += [f"{a}{b}" for a, b in itertools.permutations(palavras, 2)]
+        prompts += [f"Me diga: {a} e depois {b}?" for a, b in itertools.permutations(palavras[::3], 2)]
+        for prompt in prompts:
+            self.assertEqual(self.roteador.rotear(prompt).intencao, _rota_antiga(prompt), prompt)
+
+    def test_palavra_de_pesquisa_e_a_primeira_da_lista(self) -> None:
+        rota = self.roteador.rotear("Pesquisar: o que é airless")
+        self.assertEqual(rota, (INTENCAO_PESQUISA, "o que é"))
+
+    def test_classificador_so_sem_palavra_chave(self) -> None:
+        chamadas = []
+
+        def classificador(prompt_lower):
+            chamadas.append(prompt_lower)
+            return INTENCAO_PRODUTOS if "airless" in prompt_lower else "inexistente"
+
+        roteador = RoteadorIntencoes(classificador=classificador)
+        self.assertEqual(roteador.rotear("Desenhe algo").intencao, INTENCAO_IMAGEM)
+        self.assertEqual(roteador.rotear("Fale da AIRLESS 1095").intencao, INTENCAO_PRODUTOS)
+        self.assertEqual(roteador.rotear("Bom dia").intencao, INTENCAO_GERAL)
+        self.assertEqual(chamadas, ["fale da airless 1095", "bom dia"])
+
+
+class EstadoMemoriaTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_estado_memoria").resolve()
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+
+    def test_cache_ate_invalidar(self) -> None:
+        estado = EstadoMemoria(str(self.pasta), ttl_s=3600)
+        self.assertFalse(estado.tem_arquivos())
+
+        self.pasta.mkdir()
+        (self.pasta / "manual.txt").write_text("AIRLESS", encoding="utf-8")
+        self.assertFalse(estado.tem_arquivos())
+        self.assertEqual(estado.consultas_disco, 1)
+
+        estado.invalidar()
+        self.assertTrue(estado.tem_arquivos())
+        self.assertTrue(estado.tem_arquivos())
+        self.assertEqual(estado.consultas_disco, 2)
+
+    def test_so_caminhos_da_pasta_de_memoria(self) -> None:
+        estado = EstadoMemoria(str(self.pasta), ttl_s=3600)
+
+        self.assertTrue(estado.contem_caminho(str(self.pasta)))
+        self.assertTrue(estado.contem_caminho(str(self.pasta / "sub" / "manual.pdf")))
+        self.assertFalse(estado.contem_caminho(str(self.pasta) + "_outra/manual.pdf"))
+        self.assertFalse(estado.contem_caminho(str(self.pasta.parent / "storage" / "indice.json")))
+
+    def test_ttl_expirado_rele_a_pasta(self) -> None:
+        estado = EstadoMemoria(str(self.pasta), ttl_s=0)
+        self.assertFalse(estado.tem_arquivos())
+        self.pasta.mkdir()
+        (self.pasta / "manual.txt").write_text("AIRLESS", encoding="utf-8")
+        self.assertTrue(estado.tem_arquivos())
+
+
+class BenchmarkRouterTest(unittest.TestCase):
+    def test_rotas_iguais_e_uma_consulta_ao_disco(self) -> None:
+        pasta = Path("tests/tmp_benchmark_router").resolve()
+        pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, pasta, True)
+        (pasta / "manual.txt").write_text("AIRLESS", encoding="utf-8")
+
+        for com_base in (True, False):
+            resultado = benchmark_router.run(memory_dir=str(pasta), repeats=5, has_query_engine=com_base)
+            self.assertEqual(resultado["divergencias"], [])
+            # Sem base carregada a pasta nem é consultada
+            self.assertEqual(resultado["consultas_disco_compilado"], 1 if com_base else 0)
+            self.assertGreater(resultado["compilado"]["us_mean"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
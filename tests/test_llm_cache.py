@@ -0,0 +1,59 @@
+import shutil
+import time
+import unittest
+from pathlib import Path
+
+import llm_cache
+
+
+class CacheGeracoesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = Path("tests/tmp_llm_cache").resolve()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.pasta, True)
+        self.cache = llm_cache.CacheGeracoes(str(self.pasta / "geracoes.sqlite"), max_entradas=4, tamanho_maximo_mb=1)
+
+    def test_prompt_repetido_nao_gera_de_novo(self) -> None:
+        chamadas = []
+
+        def gerar():
+            chamadas.append(1)
+            return "Pinte mais rápido com a AIRLESS 1095"
+
+        for _ in range(3):
+            self.assertEqual(self.cache.gerar("llava-llama3", "frase", gerar), "Pinte mais rápido com a AIRLESS 1095")
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual((self.cache.get_status()["hits"], self.cache.get_status()["misses"]), (2, 1))
+
+        # Outro modelo ou outras opções de geração são outra chave
+        self.assertIsNone(self.cache.get("llama3.2", "frase"))
+        self.assertIsNone(self.cache.get("llava-llama3", "frase", {"temperature": 0.9}))
+
+    def test_acumula_variantes_e_depois_sorteia(self) -> None:
+        frases = iter(["A", "B", "C", "D"])
+
+        respostas = [self.cache.gerar("m", "criativo", lambda: next(frases), variantes=3) for _ in range(20)]
+
+        self.assertEqual(respostas[:3], ["A", "B", "C"])
+        self.assertLessEqual(set(respostas[3:]), {"A", "B", "C"})
+        self.assertEqual(self.cache.get_status()["entradas"], 3)
+
+    def test_resposta_vazia_nao_e_guardada(self) -> None:
+        self.assertIsNone(self.cache.gerar("m", "p", lambda: None))
+        self.assertEqual(self.cache.get_status()["entradas"], 0)
+
+    def test_poda_remove_menos_usadas_e_persiste(self) -> None:
+        for i in range(4):
+            self.cache.put("m", f"p{i}", f"r{i}")
+            time.sleep(0.01)
+        self.cache.get("m", "p0")
+        self.cache.put("m", "p4", "r4")
+
+        reaberto = llm_cache.CacheGeracoes(self.cache.caminho, max_entradas=4)
+        self.assertEqual(reaberto.get("m", "p0"), "r0")
+        self.assertIsNone(reaberto.get("m", "p1"))
+        self.assertLessEqual(reaberto.get_status()["entradas"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import (PRIORIDADE_ESTUDIO, PRIORIDADE_INTERATIVA, PRIORIDADE_SEGUNDO_PLANO,
+                         ColapsadorGeracoes, GatewayLLM)
+
+
+class GatewayLLMTest(unittest.TestCase):
+    def criar_gateway(self, max_concorrencia: int, reservadas: int) -> GatewayLLM:
+        gateway = GatewayLLM(max_concorrencia, reservadas)
+        self.addCleanup(gateway.parar)
+        return gateway
+
+    def test_vaga_livre_vai_para_a_maior_prioridade(self) -> None:
+        gateway = self.criar_gateway(1, 0)
+        ordem = []
+
+        def pedir(prioridade, nome):
+            with gateway.vaga(prioridade, timeout=5):
+                ordem.append(nome)
+
+        with gateway.vaga(PRIORIDADE_SEGUNDO_PLANO):
+            threads = []
+            for prioridade, nome in [(PRIORIDADE_SEGUNDO_PLANO, "legenda"), (PRIORIDADE_ESTUDIO, "estudio"),
+                                     (PRIORIDADE_INTERATIVA, "chat")]:
+                threads.append(threading.Thread(target=pedir, args=(prioridade, nome)))
+                threads[-1].start()
+                time.sleep(0.05)
+            self.assertEqual(gateway.get_status()["prioridades"]["interativa"]["na_fila"], 1)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(ordem, ["chat", "estudio", "legenda"])
+        self.assertGreater(gateway.get_status()["prioridades"]["interativa"]["espera_s_p95"], 0)
+
+    def test_vaga_reservada_para_o_chat(self) -> None:
+        gateway = self.criar_gateway(2, 1)
+
+        with gateway.vaga(PRIORIDADE_SEGUNDO_PLANO):
+            with self.assertRaises(TimeoutError):
+                with gateway.vaga(PRIORIDADE_ESTUDIO, timeout=0.1):
+                    pass
+            with gateway.vaga(PRIORIDADE_INTERATIVA, timeout=0.1):
+                self.assertEqual(gateway.get_status()["em_uso"], 2)
+
+        status = gateway.get_status()
+        self.assertEqual(status["em_uso"], 0)
+        self.assertEqual(status["prioridades"]["estudio"]["canceladas"], 1)
+
+    def test_tarefa_cancelada_sai_da_fila(self) -> None:
+        gateway = self.criar_gateway(1, 0)
+
+        async def desistir():
+            tarefa = asyncio.ensure_future(gateway.gerar({"prompt": "oi"}, PRIORIDADE_ESTUDIO))
+            await asyncio.sleep(0.05)
+            tarefa.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarefa
+
+        with gateway.vaga(PRIORIDADE_INTERATIVA):
+            asyncio.run(desistir())
+        with gateway.vaga(PRIORIDADE_ESTUDIO, timeout=1):
+            pass
+
+        status = gateway.get_status()
+        self.assertEqual(status["prioridades"]["estudio"]["canceladas"], 1)
+        self.assertEqual(status["prioridades"]["estudio"]["concedidas"], 1)
+        self.assertEqual(status["em_uso"], 0)
+
+
+class ColapsadorGeracoesTest(unittest.TestCase):
+    def test_pedidos_identicos_simultaneos_geram_uma_vez(self) -> None:
+        coalescedor = ColapsadorGeracoes()
+        chamadas = []
+
+        def gerar():
+            chamadas.append(1)
+            time.sleep(0.2)
+            return "Pinte mais rápido"
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            respostas = list(executor.map(lambda _: coalescedor.executar("frase", gerar), range(5)))
+
+        self.assertEqual(respostas, ["Pinte mais rápido"] * 5)
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(coalescedor.get_status(), {"geracoes": 1, "coalescidas": 4, "em_andamento": 0})
+
+        # Terminada a geração, o próximo pedido gera de novo (quem guarda resultados é o cache)
+        coalescedor.executar("frase", gerar)
+        self.assertEqual(len(chamadas), 2)
+
+    def test_erro_chega_a_todos(self) -> None:
+        coalescedor = ColapsadorGeracoes()
+
+        def falhar():
+            time.sleep(0.1)
+            raise RuntimeError("Ollama fora")
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futuros = [executor.submit(coalescedor.executar, "k", falhar) for _ in range(3)]
+        for futuro in futuros:
+            self.assertIsInstance(futuro.exception(), RuntimeError)
+
+    def test_stream_compartilhado_inclusive_para_quem_chega_depois(self) -> None:
+        coalescedor = ColapsadorGeracoes()
+        chamadas = []
+
+        def trechos():
+            chamadas.append(1)
+            for trecho in ["A ", "AIRLESS ", "1095"]:
+                time.sleep(0.05)
+                yield trecho
+
+        primeiro = coalescedor.iterar("s", trechos)
+        self.assertEqual(next(primeiro), "A ")
+        segundo = coalescedor.iterar("s", trechos)
+
+        self.assertEqual("".join(segundo), "A AIRLESS 1095")
+        self.assertEqual("".join(primeiro), "AIRLESS 1095")
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(coalescedor.get_status()["coalescidas"], 1)
+
+    def test_stream_abandonado_por_todos_e_fechado(self) -> None:
+        coalescedor = ColapsadorGeracoes()
+        fechado = threading.Event()
+
+        def trechos():
+            try:
+                while True:
+                    time.sleep(0.01)
+                    yield "x"
+            finally:
+                fechado.set()
+
+        consumidor = coalescedor.iterar("s", trechos)
+        next(consumidor)
+        consumidor.close()
+
+        self.assertTrue(fechado.wait(2))
+
+
+
+class ChatEngineNoGatewayTest(unittest.TestCase):
+    def test_chat_engine_segura_vaga_ate_o_fim_do_stream(self) -> None:
+        import core_logic
+
+        gateway = GatewayLLM(1, 0)
+        self.addCleanup(gateway.parar)
+        em_uso = []
+
+        class ChatEngineFalso:
+            def stream_chat(self, prompt):
+                em_uso.append(gateway.get_status()["em_uso"])
+                resposta = mock.Mock()
+                resposta.response_gen = iter(["Pressão ", "de 3300 psi"])
+                return resposta
+
+            def chat(self, prompt):
+                em_uso.append(gateway.get_status()["em_uso"])
+                return "3300 psi"
+
+        with mock.patch.object(core_logic, "obter_gateway_llm", return_value=gateway):
+            trechos = core_logic.conversar(ChatEngineFalso(), "pressão?", stream=True)
+            self.assertEqual(next(trechos), "Pressão ")
+            self.assertEqual(gateway.get_status()["em_uso"], 1)
+            self.assertEqual("".join(trechos), "de 3300 psi")
+            self.assertEqual(gateway.get_status()["em_uso"], 0)
+
+            self.assertEqual(core_logic.conversar(ChatEngineFalso(), "pressão?"), "3300 psi")
+
+        self.assertEqual(em_uso, [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import time
+import unittest
+
+import llm_streaming
+
+
+def trechos_lentos():
+    time.sleep(0.02)
+    for trecho in ["A ", "AIRLESS ", "1095"]:
+        yield trecho
+
+
+class MedidorStreamTest(unittest.TestCase):
+    def test_mede_ttft_e_tokens(self) -> None:
+        relatorio = llm_streaming.RelatorioStreaming()
+        medidor = llm_streaming.MedidorStream(trechos_lentos(), relatorio)
+
+        self.assertEqual("".join(medidor), "A AIRLESS 1095")
+        self.assertEqual(medidor.tokens, 3)
+        self.assertGreaterEqual(medidor.ttft, 0.02)
+        self.assertGreaterEqual(medidor.segundos, medidor.ttft)
+        self.assertEqual(relatorio.get_status()["respostas"], 1)
+
+    def test_stream_vazio_nao_tem_ttft(self) -> None:
+        relatorio = llm_streaming.RelatorioStreaming()
+        medidor = llm_streaming.MedidorStream(iter([]), relatorio)
+
+        self.assertEqual(list(medidor), [])
+        self.assertIsNone(medidor.ttft)
+        self.assertEqual(medidor.tokens_por_segundo, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+
+import model_residency
+from config import MODEL_RESIDENCY_CONFIG, MODELS_CONFIG
+from llm_gateway import PRIORIDADE_INTERATIVA, obter_gateway_llm
+from llm_streaming import stream_ollama_generate
+from ollama_client import ClienteOllama
+from tools.fake_ollama import FakeOllama, FakeOllamaConfig
+
+
+class GerenciadorModelosTest(unittest.TestCase):
+    def setUp(self) -> None:
+        for patcher in (
+            mock.patch.dict(MODELS_CONFIG, {"chat": "modelo-chat", "rag": "modelo-rag"}),
+            mock.patch.dict(MODEL_RESIDENCY_CONFIG, {"keep_alive": "30m", "limiar_carga_fria_s": 0.05}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.servidor = FakeOllama(FakeOllamaConfig(models=("modelo-chat:latest", "modelo-rag:latest"),
+                                                    response="Resposta curta.", load_seconds=0.1)).start()
+        self.addCleanup(self.servidor.stop)
+        cliente = ClienteOllama(url=self.servidor.url, tentativas=1)
+        self.addCleanup(cliente.fechar)
+
+        self.gerenciador = model_residency.GerenciadorModelos(cliente, pre_carregar=["chat", "rag"], fixados=["chat"])
+        # O gateway e o streaming usam o cliente e o gerenciador compartilhados pelo processo
+        for patcher in (
+            mock.patch("ollama_client._cliente_global", cliente),
+            mock.patch("model_residency._gerenciador_global", self.gerenciador),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_keep_alive_fixa_o_modelo_do_chat(self) -> None:
+        self.assertEqual(self.gerenciador.preparar({"model": "modelo-chat"})["keep_alive"], -1)
+        self.assertEqual(self.gerenciador.preparar({"model": "modelo-rag:latest"})["keep_alive"], "30m")
+        self.assertEqual(self.gerenciador.preparar({"model": "modelo-rag", "keep_alive": 0})["keep_alive"], 0)
+
+    def test_pre_carga_e_registro_das_cargas_frias(self) -> None:
+        self.gerenciador.verificar()
+
+        self.assertEqual(self.servidor.stats.snapshot()["loads"], {"modelo-chat:latest": 1, "modelo-rag:latest": 1})
+        status = self.gerenciador.get_status()
+        self.assertEqual(status["cargas_frias"], 2)
+        self.assertEqual({c["origem"] for c in status["ultimas_cargas"]}, {"pré-carga"})
+
+        # Já na memória: a geração seguinte não paga carga
+        resposta = obter_gateway_llm().gerar_sync({"model": "modelo-chat", "prompt": "oi", "stream": False},
+                                                  PRIORIDADE_INTERATIVA)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.gerenciador.get_status()["cargas_frias"], 2)
+
+    def test_recarrega_fixado_que_saiu_da_memoria(self) -> None:
+        self.gerenciador.verificar()
+        # Ollama reiniciado: nada mais na memória
+        with self.servidor.stats.lock:
+            self.servidor.stats.loaded.clear()
+
+        self.gerenciador.verificar()
+
+        self.assertEqual(self.gerenciador.get_status()["recarregamentos"], 1)
+        self.assertEqual(self.servidor.stats.snapshot()["loads"]["modelo-chat:latest"], 2)
+        # Só o fixado volta; o do RAG carrega quando for pedido
+        self.assertEqual(self.servidor.stats.snapshot()["loads"]["modelo-rag:latest"], 1)
+        self.assertEqual(self.gerenciador.consultar_residentes(), ["modelo-chat:latest"])
+
+    def test_carga_fria_no_streaming(self) -> None:
+        trechos = list(stream_ollama_generate("oi"))
+
+        self.assertEqual("".join(trechos), "Resposta curta.")
+        ultima = self.gerenciador.get_status()["ultimas_cargas"][-1]
+        self.assertEqual((ultima["modelo"], ultima["origem"]), ("modelo-chat", "geração"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from config import OLLAMA_CONFIG
+from ollama_client import ClienteOllama, MonitorSaudeOllama
+
+
+class _OllamaFalho(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    falhas_restantes = 0
+    conexoes = set()
+    consultas_tags = 0
+
+    def do_GET(self):
+        type(self).consultas_tags += 1
+        corpo = json.dumps({"models": [{"name": "llava-llama3:latest"}, {"name": "llama3.2:latest"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        type(self).conexoes.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if type(self).falhas_restantes:
+            type(self).falhas_restantes -= 1
+            codigo, corpo = 503, b"{}"
+        else:
+            codigo, corpo = 200, json.dumps({"response": "ok", "done": True}).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ClienteOllamaTest(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict(OLLAMA_CONFIG, {"espera_base_s": 0.001, "espera_maxima_s": 0.01})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        _OllamaFalho.falhas_restantes = 0
+        _OllamaFalho.conexoes = set()
+        _OllamaFalho.consultas_tags = 0
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaFalho)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.cliente = ClienteOllama(url=f"http://127.0.0.1:{self.servidor.server_address[1]}", tentativas=3)
+        self.addCleanup(self.cliente.fechar)
+
+    def test_reaproveita_a_conexao(self) -> None:
+        for _ in range(5):
+            self.assertEqual(self.cliente.post("/api/generate", json={"prompt": "oi"}).json()["response"], "ok")
+
+        self.assertEqual(len(_OllamaFalho.conexoes), 1)
+        self.assertEqual(self.cliente.get_status()["/api/generate"]["requisicoes"], 5)
+
+    def test_repete_503_ate_o_limite(self) -> None:
+        _OllamaFalho.falhas_restantes = 2
+        self.assertEqual(self.cliente.post("/api/generate", json={}).status_code, 200)
+
+        _OllamaFalho.falhas_restantes = 5
+        self.assertEqual(self.cliente.post("/api/generate", json={}).status_code, 503)
+
+        status = self.cliente.get_status()["/api/generate"]
+        self.assertEqual((status["requisicoes"], status["erros"], status["repeticoes"]), (2, 1, 4))
+
+    def test_falha_de_conexao_levanta_a_excecao_do_requests(self) -> None:
+        cliente = ClienteOllama(url="http://127.0.0.1:1", tentativas=2)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            cliente.get("/api/tags")
+        self.assertEqual(cliente.get_status()["/api/tags"]["erros"], 1)
+
+
+    def test_monitor_responde_do_cache(self) -> None:
+        monitor = MonitorSaudeOllama(self.cliente, iniciar=False)
+
+        for _ in range(10):
+            self.assertTrue(monitor.esta_online())
+        status = monitor.get_status()
+        self.assertEqual(status["modelos"], ["llava-llama3:latest", "llama3.2:latest"])
+        self.assertEqual(_OllamaFalho.consultas_tags, 1)
+
+        with mock.patch.dict(OLLAMA_CONFIG, {"ttl_saude_s": 0}):
+            monitor.esta_online()
+        self.assertEqual(_OllamaFalho.consultas_tags, 2)
+
+    def test_monitor_em_segundo_plano_nota_a_queda(self) -> None:
+        with mock.patch.dict(OLLAMA_CONFIG, {"intervalo_saude_s": 0.05, "intervalo_saude_offline_s": 0.05}):
+            monitor = MonitorSaudeOllama(ClienteOllama(url="http://127.0.0.1:1"))
+            self.addCleanup(monitor.parar)
+            time.sleep(0.3)
+
+            status = monitor.get_status()
+        self.assertFalse(status["online"])
+        self.assertIn("ConnectionError", status["erro"])
+        self.assertGreater(status["verificacoes"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
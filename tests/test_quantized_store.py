@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+
+import quantized_store
+
+
+def _vetores(linhas: int, dimensao: int = 64, semente: int = 7):
+    return np.random.default_rng(semente).standard_normal((linhas, dimensao)).astype(np.float32)
+
+
+def _top_exato(matriz, consulta, k):
+    cossenos = (matriz @ consulta) / (np.linalg.norm(matriz, axis=1) * np.linalg.norm(consulta))
+    return list(np.argsort(-cossenos)[:k])
+
+
+class MatrizQuantizadaTest(unittest.TestCase):
+    def test_int8_ocupa_um_quarto_e_aproxima_o_cosseno(self) -> None:
+        vetores = _vetores(1000)
+        matriz = quantized_store.MatrizQuantizada(64, "int8")
+        matriz.adicionar(vetores)
+        consulta = vetores[10]
+
+        self.assertLess(matriz.bytes, vetores.nbytes / 3)
+        exatos = (vetores @ consulta) / (np.linalg.norm(vetores, axis=1) * np.linalg.norm(consulta))
+        self.assertLess(np.abs(matriz.similaridades(consulta) - exatos).max(), 0.02)
+
+    def test_remover_traz_a_ultima_linha(self) -> None:
+        vetores = _vetores(3)
+        matriz = quantized_store.MatrizQuantizada(64, "float16")
+        matriz.adicionar(vetores)
+
+        self.assertEqual(matriz.remover(0), 2)
+        self.assertEqual(matriz.linhas, 2)
+        self.assertAlmostEqual(float(matriz.similaridades(vetores[2])[0]), 1.0, places=2)
+
+
+@unittest.skipUnless(quantized_store.LLAMA_INDEX_AVAILABLE, "llama_index não instalado")
+class VectorStoreQuantizadoTest(unittest.TestCase):
+    def test_rerank_mantem_o_recall_do_float32(self) -> None:
+        from llama_index.core.schema import TextNode
+        from llama_index.core.vector_stores.types import VectorStoreQuery
+
+        vetores = _vetores(2000)
+        for formato in quantized_store.FORMATOS:
+            store = quantized_store.VectorStoreQuantizado(formato=formato, fator_rerank=4)
+            store.add([TextNode(id_=str(i), text="", embedding=v.tolist()) for i, v in enumerate(vetores)])
+
+            acertos = 0
+            consultas = _vetores(50, semente=11)
+            for consulta in consultas:
+                resultado = store.query(VectorStoreQuery(query_embedding=consulta.tolist(), similarity_top_k=5))
+                acertos += len(set(map(int, resultado.ids)) & set(_top_exato(vetores, consulta, 5)))
+
+            self.assertGreaterEqual(acertos / (5 * len(consultas)), 0.99, formato)
+
+    def test_exportar_e_usar_originais(self) -> None:
+        from llama_index.core.schema import TextNode
+
+        vetores = _vetores(4)
+        store = quantized_store.VectorStoreQuantizado(formato="int8")
+        store.add([TextNode(id_=f"n{i}", text="", embedding=v.tolist()) for i, v in enumerate(vetores)])
+        store.delete_nodes(["n1"])
+
+        ids, matriz = store.exportar()
+        store.usar_originais(ids, matriz)
+
+        self.assertEqual(sorted(ids), ["n0", "n2", "n3"])
+        np.testing.assert_allclose(store.get("n3"), vetores[3], rtol=1e-6)
+
+    def test_store_nao_salvo_nao_guarda_copias_float32(self) -> None:
+        from llama_index.core.schema import TextNode
+        from llama_index.core.vector_stores.types import VectorStoreQuery
+
+        vetores = _vetores(500)
+        store = quantized_store.VectorStoreQuantizado(formato="int8", guardar_originais=False)
+        store.add([TextNode(id_=str(i), text="", embedding=v.tolist()) for i, v in enumerate(vetores)])
+
+        self.assertEqual(store._pendentes, {})
+        resultado = store.query(VectorStoreQuery(query_embedding=vetores[42].tolist(), similarity_top_k=3))
+        self.assertEqual(resultado.ids[0], "42")
+        np.testing.assert_allclose(store.get("7"), vetores[7], atol=np.abs(vetores[7]).max() / 100)
+
+    def test_copias_pendentes_limitadas(self) -> None:
+        from llama_index.core.schema import TextNode
+
+        vetores = _vetores(5)
+        store = quantized_store.VectorStoreQuantizado(formato="float16", max_pendentes=2)
+        store.add([TextNode(id_=f"n{i}", text="", embedding=v.tolist()) for i, v in enumerate(vetores)])
+
+        # As mais recentes ficam na RAM; as outras vão para o arquivo temporário, ainda exatas
+        self.assertEqual(list(store._pendentes), ["n3", "n4"])
+        ids, matriz = store.exportar()
+        self.assertEqual(ids, [f"n{i}" for i in range(5)])
+        np.testing.assert_array_equal(matriz, vetores)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+import json
+import os
+import shutil
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import MockLLM
+
+import quantized_store
+import rag_index
+from config import VECTOR_STORE_CONFIG
+
+
+class EmbeddingPalavras(BaseEmbedding):
+    """Embedding determinístico por palavras (hashing), sem modelo"""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "EmbeddingPalavras"
+
+    def _vetor(self, texto: str):
+        vetor = [0.0] * 64
+        for palavra in "".join(c if c.isalnum() else " " for c in texto.lower()).split():
+            vetor[zlib.crc32(palavra.encode("utf-8")) % 64] += 1.0
+        return vetor
+
+    def _get_query_embedding(self, query: str):
+        return self._vetor(query)
+
+    async def _aget_query_embedding(self, query: str):
+        return self._vetor(query)
+
+    def _get_text_embedding(self, text: str):
+        return self._vetor(text)
+
+
+class ManifestoIncrementalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_root = Path("tests/tmp_rag_index").resolve()
+        if self.tmp_root.exists():
+            shutil.rmtree(self.tmp_root)
+        (self.tmp_root / "docs" / "sub").mkdir(parents=True)
+        self.addCleanup(shutil.rmtree, self.tmp_root, True)
+
+    def _escrever(self, nome: str, conteudo: str) -> str:
+        caminho = self.tmp_root / "docs" / nome
+        caminho.write_text(conteudo, encoding="utf-8")
+        return str(caminho.resolve())
+
+    def _manifesto_de(self, arquivos):
+        manifesto = {}
+        for arquivo in arquivos:
+            stat = os.stat(arquivo)
+            manifesto[arquivo] = {
+                "tamanho": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": rag_index.calcular_hash_arquivo(arquivo),
+                "doc_ids": [arquivo],
+                "node_ids": [],
+            }
+        return manifesto
+
+    def test_listagem_recursiva_ignora_extensoes_invalidas(self) -> None:
+        self._escrever("manual.txt", "a")
+        self._escrever("sub/tabela.md", "b")
+        self._escrever("video.mp4", "c")
+
+        arquivos = rag_index.listar_arquivos_referencia(str(self.tmp_root / "docs"))
+
+        self.assertEqual([Path(a).name for a in arquivos], ["manual.txt", "tabela.md"])
+
+    def test_classifica_novos_alterados_removidos(self) -> None:
+        inalterado = self._escrever("inalterado.txt", "mesmo conteudo")
+        alterado = self._escrever("alterado.txt", "versao 1")
+        removido = self._escrever("removido.txt", "sai do indice")
+        manifesto = self._manifesto_de([inalterado, alterado, removido])
+
+        os.remove(removido)
+        Path(alterado).write_text("versao 2 maior", encoding="utf-8")
+        novo = self._escrever("novo.txt", "entra no indice")
+
+        novos, alterados, removidos, inalterados = rag_index.comparar_com_manifesto(
+            [inalterado, alterado, novo], manifesto
+        )
+
+        self.assertEqual(novos, [novo])
+        self.assertEqual(alterados, [alterado])
+        self.assertEqual(removidos, [removido])
+        self.assertEqual(list(inalterados), [inalterado])
+
+    def test_arquivo_que_sumiu_apos_a_listagem_e_removido(self) -> None:
+        arquivo = self._escrever("apagado.txt", "conteudo")
+        manifesto = self._manifesto_de([arquivo])
+        os.remove(arquivo)
+
+        novos, alterados, removidos, inalterados = rag_index.comparar_com_manifesto([arquivo], manifesto)
+
+        self.assertEqual((novos, alterados, removidos, inalterados), ([], [], [arquivo], {}))
+
+    def test_mtime_diferente_com_mesmo_conteudo_nao_reindexa(self) -> None:
+        arquivo = self._escrever("copiado.txt", "conteudo identico")
+        manifesto = self._manifesto_de([arquivo])
+        stat = os.stat(arquivo)
+        os.utime(arquivo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+        novos, alterados, _, inalterados = rag_index.comparar_com_manifesto([arquivo], manifesto)
+
+        self.assertEqual((novos, alterados), ([], []))
+        self.assertEqual(inalterados[arquivo]["mtime_ns"], os.stat(arquivo).st_mtime_ns)
+
+    def test_manifesto_ida_e_volta(self) -> None:
+        arquivo = self._escrever("manual.txt", "conteudo")
+        manifesto = self._manifesto_de([arquivo])
+
+        rag_index.salvar_manifesto(str(self.tmp_root), manifesto)
+
+        self.assertEqual(rag_index.carregar_manifesto(str(self.tmp_root)), manifesto)
+
+
+class PersistenciaNpyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_root = Path("tests/tmp_rag_index_npy").resolve()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.tmp_root, True)
+        for nome in ("_llm", "_embed_model"):
+            patcher = mock.patch.object(Settings, nome, getattr(Settings, nome))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        Settings.llm = MockLLM()
+        Settings.embed_model = EmbeddingPalavras(model_name="palavras-64")
+
+    def _indice(self):
+        documentos = [
+            Document(text="A bomba AIRLESS 1095 trabalha com pressão de 3300 psi.", id_="airless"),
+            Document(text="O compressor de ar tem reservatório de 50 litros.", id_="compressor"),
+            Document(text="A pistola HVLP usa bico de 1,3 mm para verniz.", id_="pistola"),
+        ]
+        vector_store = quantized_store.criar_vector_store()
+        storage_context = StorageContext.from_defaults(vector_store=vector_store) if vector_store else None
+        return VectorStoreIndex.from_documents(documentos, storage_context=storage_context)
+
+    def _ida_e_volta(self, formato: str) -> None:
+        persist_dir = str(self.tmp_root / formato)
+        with mock.patch.dict(VECTOR_STORE_CONFIG, formato=formato):
+            rag_index.salvar_indice(self._indice(), persist_dir, "assinatura", "palavras-64", 3)
+            self.assertEqual(rag_index.ler_metadados(persist_dir)["formato"], "npy")
+
+            index = rag_index.carregar_indice(persist_dir)
+
+        self.assertIsNotNone(index)
+        vector_store = index.vector_store
+        if formato == "float32":
+            vetores = list(vector_store.data.embedding_dict.values())
+        else:
+            self.assertIsInstance(vector_store, quantized_store.VectorStoreQuantizado)
+            vetores = [vector_store._originais]
+        self.assertTrue(all(isinstance(v, np.memmap) or isinstance(v.base, np.memmap) for v in vetores))
+
+        resultado = index.as_retriever(similarity_top_k=1).retrieve("pressão da bomba airless")
+        self.assertEqual(resultado[0].node.ref_doc_id, "airless")
+
+    def test_float32_carrega_com_memory_map(self) -> None:
+        self._ida_e_volta("float32")
+
+    def test_int8_rerank_le_o_memory_map(self) -> None:
+        self._ida_e_volta("int8")
+
+    def test_vetores_salvos_sao_exatos_acima_de_max_pendentes(self) -> None:
+        persist_dir = str(self.tmp_root / "exatos")
+        with mock.patch.dict(VECTOR_STORE_CONFIG, formato="int8", max_pendentes=1):
+            index = self._indice()
+            vector_store = index.vector_store
+            self.assertEqual(len(vector_store._pendentes), 1)
+            esperado = {node_id: np.asarray(Settings.embed_model.get_text_embedding(node.get_content()),
+                                            dtype=np.float32)
+                        for node_id, node in index.docstore.docs.items()}
+
+            rag_index.salvar_indice(index, persist_dir, "assinatura", "palavras-64", 3)
+
+        pasta = rag_index.pasta_versao_atual(persist_dir)
+        matriz = np.load(os.path.join(pasta, rag_index.ARQUIVO_VETORES))
+        with open(os.path.join(pasta, rag_index.ARQUIVO_VETORES_IDS), encoding="utf-8") as f:
+            ids = json.load(f)["ids"]
+        self.assertEqual(sorted(ids), sorted(esperado))
+        np.testing.assert_array_equal(matriz, np.stack([esperado[node_id] for node_id in ids]))
+
+    def test_incremental_sem_indice_usa_o_store_configurado(self) -> None:
+        docs = self.tmp_root / "docs"
+        docs.mkdir(parents=True)
+        (docs / "manual.txt").write_text("A bomba AIRLESS 1095 trabalha com 3300 psi.", encoding="utf-8")
+        arquivos = rag_index.listar_arquivos_referencia(str(docs))
+
+        with mock.patch.dict(VECTOR_STORE_CONFIG, formato="int8"):
+            index, estatisticas = rag_index.atualizar_indice_incremental(
+                arquivos, "palavras-64", persist_dir=str(self.tmp_root / "incremental")
+            )
+
+        self.assertEqual(estatisticas["novos"], 1)
+        self.assertIsInstance(index.vector_store, quantized_store.VectorStoreQuantizado)
+
+    def test_incremental_nao_registra_arquivo_sem_documento_nem_apagado(self) -> None:
+        docs = self.tmp_root / "docs"
+        docs.mkdir(parents=True)
+        caminhos = {}
+        for nome in ("bom.txt", "quarentena.pdf", "apagado.txt"):
+            (docs / nome).write_text(f"conteudo de {nome}", encoding="utf-8")
+            caminhos[nome] = str((docs / nome).resolve())
+
+        def ler(arquivos, filename_as_id=False):
+            # O PDF não gera documento; o "apagado" some depois de lido
+            for nome in ("bom.txt", "apagado.txt"):
+                yield Document(text=f"conteudo de {nome}", id_=caminhos[nome],
+                               metadata={"file_path": caminhos[nome]})
+            os.remove(caminhos["apagado.txt"])
+
+        persist_dir = str(self.tmp_root / "incremental")
+        with mock.patch.object(rag_index, "ler_documentos_em_paralelo", ler):
+            index, _ = rag_index.atualizar_indice_incremental(list(caminhos.values()), "palavras-64", persist_dir)
+
+        self.assertIsNotNone(index)
+        manifesto = rag_index.carregar_manifesto(persist_dir)
+        self.assertEqual(sorted(manifesto), sorted([caminhos["bom.txt"], caminhos["apagado.txt"]]))
+        self.assertIsNone(manifesto[caminhos["apagado.txt"]]["sha256"])
+
+        novos, _, removidos, _ = rag_index.comparar_com_manifesto(
+            [caminhos["bom.txt"], caminhos["quarentena.pdf"]], manifesto
+        )
+        self.assertEqual((novos, removidos), ([caminhos["quarentena.pdf"]], [caminhos["apagado.txt"]]))
+
+    def test_nova_versao_troca_o_ponteiro_e_apaga_a_anterior(self) -> None:
+        persist_dir = str(self.tmp_root / "versoes")
+        index = self._indice()
+        rag_index.salvar_indice(index, persist_dir, "a1", "palavras-64", 3)
+        primeira = rag_index.pasta_versao_atual(persist_dir)
+        # Versão antiga ainda aberta por outro processo: continua servindo até a troca
+        leitor = rag_index.carregar_indice(persist_dir)
+
+        rag_index.salvar_indice(index, persist_dir, "a2", "palavras-64", 3)
+        segunda = rag_index.pasta_versao_atual(persist_dir)
+
+        self.assertNotEqual(primeira, segunda)
+        self.assertEqual(rag_index.ler_metadados(persist_dir)["assinatura"], "a2")
+        self.assertEqual([n for n in os.listdir(persist_dir) if n.startswith(rag_index.PREFIXO_VERSAO)],
+                         [os.path.basename(segunda)])
+        self.assertIsNotNone(leitor)
+
+    def test_indice_no_formato_antigo_continua_carregando(self) -> None:
+        persist_dir = str(self.tmp_root / "antigo")
+        rag_index.salvar_indice(self._indice(), persist_dir, "a1", "palavras-64", 3, manifesto={"x": {}})
+        # Layout antigo: arquivos direto na pasta, sem ponteiro
+        versao = rag_index.pasta_versao_atual(persist_dir)
+        os.remove(os.path.join(persist_dir, rag_index.ARQUIVO_VERSAO_ATUAL))
+        for nome in os.listdir(versao):
+            shutil.move(os.path.join(versao, nome), persist_dir)
+        os.rmdir(versao)
+
+        self.assertEqual(rag_index.carregar_manifesto(persist_dir), {"x": {}})
+        self.assertIsNotNone(rag_index.carregar_indice(persist_dir))
+
+        rag_index.salvar_indice(self._indice(), persist_dir, "a2", "palavras-64", 3)
+        self.assertEqual(sorted(os.listdir(persist_dir)),
+                         sorted([rag_index.ARQUIVO_VERSAO_ATUAL,
+                                 os.path.basename(rag_index.pasta_versao_atual(persist_dir))]))
+
+
+if __name__ == "__main__":
+    unittest.main()
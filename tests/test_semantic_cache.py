@@ -0,0 +1,65 @@
+import unittest
+
+import semantic_cache
+from bm25_index import tokenizar
+
+
+def embedder_bag_of_words(texto):
+    """Embedding determinístico: contagem de termos em 64 posições"""
+    vetor = [0.0] * 64
+    for termo in tokenizar(texto):
+        vetor[sum(map(ord, termo)) % 64] += 1.0
+    return vetor
+
+
+class CacheSemanticoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = semantic_cache.CacheSemantico(
+            embedder_bag_of_words, limiar=0.8, max_entradas=3, ttl_segundos=60, tabelas=8, bits=4
+        )
+        self.geracoes = 0
+
+    def _gerar(self, resposta, pode_guardar=True):
+        def gerar():
+            self.geracoes += 1
+            return resposta, pode_guardar
+        return gerar
+
+    def test_parafrase_reaproveita_resposta(self) -> None:
+        self.cache.responder("preço da airless 1095?", self._gerar("R$ 10.000"))
+        resposta = self.cache.responder("qual o preço da AIRLESS 1095", self._gerar("outra"))
+
+        self.assertEqual(resposta, "R$ 10.000")
+        self.assertEqual(self.geracoes, 1)
+        self.assertEqual(self.cache.get_status()["hits"], 1)
+
+    def test_pergunta_diferente_e_outro_escopo_nao_casam(self) -> None:
+        self.cache.responder("preço da airless 1095", self._gerar("R$ 10.000"), escopo="rag:v1")
+
+        self.assertEqual(self.cache.responder("formas de pagamento", self._gerar("pix")), "pix")
+        self.assertEqual(self.cache.responder("preço da airless 1095", self._gerar("novo"), escopo="rag:v2"), "novo")
+        self.assertEqual(self.geracoes, 3)
+
+    def test_erros_nao_sao_guardados(self) -> None:
+        self.cache.responder("preço da airless 1095", self._gerar("Erro na API", pode_guardar=False))
+
+        self.assertEqual(self.cache.responder("preço da airless 1095", self._gerar("R$ 10.000")), "R$ 10.000")
+        self.assertEqual(self.geracoes, 2)
+
+    def test_limite_descarta_mais_antiga(self) -> None:
+        for pergunta in ["bico ft-210", "mangueira 15 metros", "pistola airless", "filtro de tinta"]:
+            self.cache.responder(pergunta, self._gerar(pergunta))
+
+        self.assertEqual(self.cache.get_status()["entradas"], 3)
+        self.assertEqual(self.cache.responder("bico ft-210", self._gerar("regerada")), "regerada")
+
+    def test_stream_guarda_resposta_completa(self) -> None:
+        gerador = self.cache.responder_stream("preço da airless 1095", lambda: iter(["R$ ", "10.000"]))
+
+        self.assertEqual("".join(gerador), "R$ 10.000")
+        self.assertEqual(self.cache.responder_stream("qual o preço da airless 1095?", lambda: iter(["x"])), "R$ 10.000")
+
+
+
+if __name__ == "__main__":
+    unittest.main()
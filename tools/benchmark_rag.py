@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Retrieval quality and latency benchmark over the shipped knowledge files.
+
+Builds the knowledge base the same way the app does (parallel parsing, the
+RAG_CONFIG chunker, the configured vector store and the hybrid BM25 + vector
+retriever) over the repo's own corpus, then runs the checked-in question set
+and reports recall@k, MRR, build time, query latency and peak RSS. The LLM is
+LlamaIndex's MockLLM, so no Ollama is needed; ``--embedding hash`` also
+removes the embedding model download for fully offline runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from llama_index.core import Settings  # noqa: E402
+from llama_index.core.base.embeddings.base import BaseEmbedding  # noqa: E402
+from llama_index.core.bridge.pydantic import PrivateAttr  # noqa: E402
+from llama_index.core.llms import MockLLM  # noqa: E402
+
+from config import ANSWER_CACHE_CONFIG, HYBRID_CONFIG, RAG_CONFIG, VECTOR_STORE_CONFIG  # noqa: E402
+
+DEFAULT_QUESTIONS = Path(__file__).with_name("benchmark_rag_perguntas.json")
+
+# One shard per group, as the index manager does per folder
+CORPUS = {
+    "produtos": ["finiti_produtos.txt", "Procedimentos_Vendas_Airless.txt", "AIRLESS_1095_Manual_Tecnico.txt"],
+    "docs": ["docs"],
+}
+
+
+class HashEmbedding(BaseEmbedding):
+    """Deterministic bag-of-words embedding (words + 4-grams, feature hashing).
+
+    Lexical only, but fast and dependency-free: good enough to compare
+    chunking and retrieval changes against each other offline.
+    """
+
+    _dim: int = PrivateAttr()
+
+    def __init__(self, dim: int = 512, **kwargs):
+        super().__init__(model_name=f"hash-{dim}", **kwargs)
+        self._dim = dim
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _embed(self, text: str) -> list[float]:
+        normalized = unicodedata.normalize("NFKD", text.lower())
+        normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+        vector = [0.0] * self._dim
+        for word in "".join(c if c.isalnum() else " " for c in normalized).split():
+            features = [word] + [f"#{word[i:i + 4]}" for i in range(max(1, len(word) - 3))]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                vector[h % self._dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5
+        return [v / norm for v in vector] if norm else vector
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process in MB (None when not measurable)."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+def corpus_files(root: Path = ROOT_DIR) -> dict[str, list[str]]:
+    from rag_index import listar_arquivos_referencia
+
+    groups: dict[str, list[str]] = {}
+    for name, entries in CORPUS.items():
+        files: list[str] = []
+        for entry in entries:
+            path = root / entry
+            if path.is_dir():
+                files.extend(listar_arquivos_referencia(str(path)))
+            elif path.is_file():
+                files.append(str(path))
+        if files:
+            groups[name] = files
+    return groups
+
+
+def load_questions(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        questions = json.load(f)
+    for item in questions:
+        if not item.get("pergunta") or not item.get("fontes"):
+            raise ValueError(f"Pergunta sem 'pergunta' ou 'fontes': {item}")
+    return questions
+
+
+def configure(embedding: str, chunk_size: int | None, chunk_overlap: int | None, top_k: int) -> None:
+    from chunker import criar_chunker
+
+    if chunk_size:
+        RAG_CONFIG["chunk_size"] = chunk_size
+    if chunk_overlap is not None:
+        RAG_CONFIG["chunk_overlap"] = chunk_overlap
+    HYBRID_CONFIG["top_k"] = max(HYBRID_CONFIG["top_k"], top_k)
+    # Every query must reach the retriever
+    ANSWER_CACHE_CONFIG["habilitado"] = False
+
+    # Fixed-size canned answer (the default MockLLM echoes the whole prompt back)
+    Settings.llm = MockLLM(max_tokens=64)
+    Settings.node_parser = criar_chunker()
+    if embedding == "hash":
+        Settings.embed_model = HashEmbedding()
+    else:
+        # No disk cache: build time must reflect real embedding work
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        from embedding_engine import EmbeddingEmLotes
+
+        Settings.embed_model = EmbeddingEmLotes(
+            HuggingFaceEmbedding(model_name=RAG_CONFIG["model_name"], embed_batch_size=RAG_CONFIG["embed_batch_size"]),
+            tamanho_lote=RAG_CONFIG["embed_batch_size"],
+            janela_ordenacao=RAG_CONFIG["embed_janela_ordenacao"],
+            ordenar_por_tamanho=RAG_CONFIG["embed_ordenar_por_tamanho"],
+        )
+
+
+def build_indexes(groups: dict[str, list[str]], shards: bool) -> tuple[list, float]:
+    from document_parser import construir_indice_streaming
+
+    start = time.perf_counter()
+    if shards:
+        indexes = [construir_indice_streaming(files) for files in groups.values()]
+    else:
+        indexes = [construir_indice_streaming([f for files in groups.values() for f in files])]
+    return [index for index in indexes if index is not None], time.perf_counter() - start
+
+
+def ranked_sources(source_nodes) -> list[str]:
+    """File names in retrieval order, each counted once."""
+    ranked: list[str] = []
+    for item in source_nodes:
+        name = item.node.metadata.get("file_name") or Path(item.node.metadata.get("file_path", "")).name
+        if name and name not in ranked:
+            ranked.append(name)
+    return ranked
+
+
+def evaluate(query_engine, questions: list[dict], ks: list[int], repeats: int) -> dict:
+    # Warm-up: lazy BM25 construction and first-call overheads stay out of the percentiles
+    query_engine.query(questions[0]["pergunta"])
+
+    latencies: list[float] = []
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = 0.0
+    misses: list[str] = []
+    for item in questions:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = query_engine.query(item["pergunta"])
+            latencies.append(time.perf_counter() - start)
+        ranked = ranked_sources(response.source_nodes)
+        expected = set(item["fontes"])
+        rank = next((i + 1 for i, name in enumerate(ranked) if name in expected), None)
+        if rank is None:
+            misses.append(item["pergunta"])
+            continue
+        reciprocal_ranks += 1.0 / rank
+        for k in ks:
+            if rank <= k:
+                hits[k] += 1
+
+    total = len(questions)
+    return {
+        "perguntas": total,
+        "recall": {f"@{k}": round(hits[k] / total, 3) for k in ks},
+        "mrr": round(reciprocal_ranks / total, 3),
+        "consulta_ms_p50": round(percentile(latencies, 0.5) * 1000, 1),
+        "consulta_ms_p95": round(percentile(latencies, 0.95) * 1000, 1),
+        "sem_fonte_esperada": misses,
+    }
+
+
+def run(questions_path: Path = DEFAULT_QUESTIONS, ks: list[int] | None = None, embedding: str = "hf",
+        shards: bool = False, chunk_size: int | None = None, chunk_overlap: int | None = None,
+        repeats: int = 1) -> dict:
+    from bm25_index import criar_query_engine_hibrido
+
+    ks = sorted(set(ks or [1, 3, HYBRID_CONFIG["top_k"]]))
+    questions = load_questions(questions_path)
+    configure(embedding, chunk_size, chunk_overlap, max(ks))
+
+    groups = corpus_files()
+    indexes, build_seconds = build_indexes(groups, shards)
+    if not indexes:
+        raise RuntimeError("Nenhum documento do corpus foi indexado")
+    rss_after_build = peak_rss_mb()
+
+    results = evaluate(criar_query_engine_hibrido(indexes), questions, ks, repeats)
+    return {
+        "embedding": Settings.embed_model.model_name,
+        "chunk_size": RAG_CONFIG["chunk_size"],
+        "chunk_overlap": RAG_CONFIG["chunk_overlap"],
+        "vector_store": VECTOR_STORE_CONFIG["formato"],
+        "shards": len(indexes),
+        "arquivos": sum(len(files) for files in groups.values()),
+        "chunks": sum(len(index.index_struct.nodes_dict) for index in indexes),
+        "construcao_s": round(build_seconds, 2),
+        "rss_pico_mb_construcao": rss_after_build,
+        **results,
+        "rss_pico_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency of the AFI knowledge base.")
+    parser.add_argument("--perguntas", type=Path, default=DEFAULT_QUESTIONS, help="Question/expected-source JSON file.")
+    parser.add_argument("--k", default=None, help="Comma-separated cutoffs for recall@k (default: 1,3,top_k).")
+    parser.add_argument("--embedding", choices=("hf", "hash"), default="hf",
+                        help="hf = RAG_CONFIG model; hash = offline lexical embedding.")
+    parser.add_argument("--shards", action="store_true", help="One index per corpus group (fan-out retrieval).")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    parser.add_argument("--repeticoes", type=int, default=3, help="Timed runs per question.")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON.")
+    parser.add_argument("--saida", type=Path, default=None, help="Also write the JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    ks = [int(k) for k in args.k.split(",")] if args.k else None
+    data = run(args.perguntas, ks, args.embedding, args.shards, args.chunk_size, args.chunk_overlap,
+               max(1, args.repeticoes))
+
+    if args.saida:
+        args.saida.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.json:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+        return 0
+
+    print("AFI retrieval benchmark")
+    print("-" * 40)
+    print(f"Embedding:       {data['embedding']}")
+    print(f"Chunking:        {data['chunk_size']} / overlap {data['chunk_overlap']}")
+    print(f"Vector store:    {data['vector_store']} ({data['shards']} shard(s))")
+    print(f"Corpus:          {data['arquivos']} files, {data['chunks']} chunks")
+    print(f"Build time:      {data['construcao_s']} s")
+    print(f"Questions:       {data['perguntas']}")
+    for label, value in data["recall"].items():
+        print(f"Recall{label:<10} {value}")
+    print(f"MRR:             {data['mrr']}")
+    print(f"Query p50/p95:   {data['consulta_ms_p50']} / {data['consulta_ms_p95']} ms")
+    print(f"Peak RSS:        {data['rss_pico_mb']} MB (after build: {data['rss_pico_mb_construcao']} MB)")
+    if data["sem_fonte_esperada"]:
+        print("-" * 40)
+        print("Expected source not retrieved:")
+        for question in data["sem_fonte_esperada"]:
+            print(f"  - {question}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Per-prompt routing cost of the chat intent router.
+
+Times the routing step of ``processar_prompt_geral`` on a set of typical
+chat prompts, two ways: the old keyword scans (``any(palavra in prompt_lower
+...)`` per intent plus ``os.listdir`` of the memory folder on every call)
+and the compiled router (one regex pass plus the cached memory flag). It
+also checks that both pick the same intent for every prompt. No model or
+Ollama is involved.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from intent_router import (INTENCAO_GERAL, INTENCAO_PRODUTOS, PALAVRAS_INTENCOES,  # noqa: E402
+                           EstadoMemoria, RoteadorIntencoes)
+
+DEFAULT_PROMPTS = [
+    "Qual o preço da AIRLESS 1095?",
+    "Transcreva o áudio do vídeo de demonstração",
+    "Desenhe um pulverizador em uso numa obra",
+    "Pesquise sobre tintas epóxi para piso industrial",
+    "O que é uma bomba de pistão?",
+    "Como limpar o bico depois de pintar?",
+    "Quais equipamentos a Finiti recomenda para fachadas?",
+    "Me ajuda a montar um orçamento para 500 m² de parede",
+    "Qual a pressão ideal para esmalte sintético?",
+    "Notícias de lançamentos em pintura airless",
+    "Obrigado, era isso!",
+    "Explique a diferença entre bico 517 e 619 considerando rendimento, acabamento e o tipo de tinta, "
+    "para um cliente que vai pintar um galpão de 2 mil metros quadrados com tinta acrílica",
+]
+
+
+def legacy_route(prompt: str, memory_dir: str, has_query_engine: bool = True) -> str:
+    """The routing decisions exactly as ``processar_prompt_geral`` made them before the compiled router."""
+    prompt_lower = prompt.lower()
+    intents = list(PALAVRAS_INTENCOES.items())
+    for intent, words in intents[:3]:
+        if any(word in prompt_lower for word in words):
+            return intent
+    has_memory_files = os.path.exists(memory_dir) and len(os.listdir(memory_dir)) > 0
+    if has_query_engine and (any(word in prompt_lower for word in intents[3][1]) or has_memory_files):
+        return INTENCAO_PRODUTOS
+    return INTENCAO_GERAL
+
+
+def compiled_route(router: RoteadorIntencoes, memory: EstadoMemoria, prompt: str,
+                   has_query_engine: bool = True) -> str:
+    intent = router.rotear(prompt).intencao
+    if intent in (INTENCAO_PRODUTOS, INTENCAO_GERAL):
+        if has_query_engine and (intent == INTENCAO_PRODUTOS or memory.tem_arquivos()):
+            return INTENCAO_PRODUTOS
+        return INTENCAO_GERAL
+    return intent
+
+
+def _time_per_prompt(route, prompts: list[str], repeats: int) -> list[float]:
+    """Mean microseconds per call for each prompt."""
+    results = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            route(prompt)
+        results.append((time.perf_counter() - start) / repeats * 1e6)
+    return results
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "us_mean": round(statistics.fmean(ordered), 2),
+        "us_p50": round(ordered[len(ordered) // 2], 2),
+        "us_p95": round(ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))], 2),
+    }
+
+
+def run(prompts: list[str] | None = None, memory_dir: str | None = None, repeats: int = 2000,
+        has_query_engine: bool = True) -> dict:
+    prompts = prompts or DEFAULT_PROMPTS
+    memory_dir = memory_dir or str(ROOT_DIR / "memoria")
+    router = RoteadorIntencoes()
+    memory = EstadoMemoria(memory_dir)
+
+    mismatches = [
+        prompt for prompt in prompts
+        if legacy_route(prompt, memory_dir, has_query_engine) != compiled_route(router, memory, prompt, has_query_engine)
+    ]
+    legacy = _time_per_prompt(lambda p: legacy_route(p, memory_dir, has_query_engine), prompts, repeats)
+    compiled = _time_per_prompt(lambda p: compiled_route(router, memory, p, has_query_engine), prompts, repeats)
+    legacy_summary, compiled_summary = _summary(legacy), _summary(compiled)
+    return {
+        "prompts": len(prompts),
+        "repeticoes": repeats,
+        "pasta_memoria": memory_dir,
+        "antigo": legacy_summary,
+        "compilado": compiled_summary,
+        "ganho": round(legacy_summary["us_mean"] / compiled_summary["us_mean"], 1) if compiled_summary["us_mean"] else None,
+        "consultas_disco_compilado": memory.consultas_disco,
+        "divergencias": mismatches,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the per-prompt cost of the chat intent router.")
+    parser.add_argument("--prompts", type=Path, default=None, help="JSON list of prompts (default: built-in set).")
+    parser.add_argument("--memoria", default=None, help="Memory folder checked by the router (default: memoria/).")
+    parser.add_argument("--repeticoes", type=int, default=2000, help="Timed calls per prompt.")
+    parser.add_argument("--sem-base", action="store_true", help="Route as if the knowledge base were not loaded yet.")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON.")
+    args = parser.parse_args(argv)
+
+    prompts = json.loads(args.prompts.read_text(encoding="utf-8")) if args.prompts else None
+    data = run(prompts, args.memoria, max(1, args.repeticoes), not args.sem_base)
+
+    if args.json:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+        return 0 if not data["divergencias"] else 1
+
+    print("AFI intent router benchmark")
+    print("-" * 40)
+    print(f"Prompts:         {data['prompts']} x {data['repeticoes']} calls")
+    print(f"Memory folder:   {data['pasta_memoria']}")
+    for label, key in (("Keyword scans:", "antigo"), ("Compiled:", "compilado")):
+        summary = data[key]
+        print(f"{label:<16} mean {summary['us_mean']} us, p50 {summary['us_p50']} us, p95 {summary['us_p95']} us")
+    print(f"Speed-up:        {data['ganho']}x")
+    print(f"Disk checks:     {data['consultas_disco_compilado']} (compiled router)")
+    if data["divergencias"]:
+        print("-" * 40)
+        print("Different routes:")
+        for prompt in data["divergencias"]:
+            print(f"  - {prompt}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
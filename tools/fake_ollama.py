@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""Ollama-compatible stand-in server for offline load and latency tests.
+
+Implements the endpoints AFI uses: ``GET /api/tags`` and ``POST /api/generate``,
+in both streaming (NDJSON) and non-streaming modes, plus ``GET /api/ps``.
+Timing is configurable: time to first token is drawn from a latency
+distribution, tokens then arrive at a fixed rate, and a parallelism limit
+reproduces Ollama queueing requests behind the ones it is already
+generating. Models not currently loaded pay ``--load-seconds`` first and
+stay resident for their ``keep_alive`` (reported as ``load_duration``, like
+Ollama). Errors can be injected as HTTP statuses or as connections dropped
+mid-stream.
+
+Point the app, the guardião or a test at it with ``AFI_OLLAMA_URL``::
+
+    python tools/fake_ollama.py --port 11500 --ttft lognormal:-1.2,0.5 --tokens-per-second 30
+    AFI_OLLAMA_URL=http://127.0.0.1:11500 python guardiao.py
+
+``GET /__stats`` reports request counts, injected errors and the peak
+number of concurrent generations.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DEFAULT_MODELS = ("llava-llama3:latest", "llama3.2:latest")
+DEFAULT_RESPONSE = (
+    "A AIRLESS 1095 entrega alta pressão e acabamento uniforme para obras de grande porte, "
+    "com rendimento até três vezes maior que o rolo."
+)
+DEFAULT_KEEP_ALIVE_S = 300.0  # Ollama unloads idle models after 5 minutes
+
+
+def model_key(name: str) -> str:
+    """Ollama treats ``llama3.2`` and ``llama3.2:latest`` as the same model."""
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_keep_alive(value: Any) -> float:
+    """Seconds from a ``keep_alive`` value (``300``, ``"30m"``, ``"-1"``); negative = forever."""
+    if value is None or value == "":
+        return DEFAULT_KEEP_ALIVE_S
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        for suffix in ("ms", "h", "m", "s"):
+            if text.endswith(suffix):
+                seconds = float(text[: -len(suffix)]) * units[suffix]
+                break
+        else:
+            seconds = float(text)
+    return float("inf") if seconds < 0 else seconds
+
+
+class Distribution:
+    """Latency distribution parsed from ``kind:params`` (seconds).
+
+    ``fixed:0.2``, ``uniform:0.1,0.5``, ``normal:0.3,0.05`` and
+    ``lognormal:mu,sigma`` (of the underlying normal) are supported.
+    Samples are clamped at zero.
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str):
+        kind, _, raw = spec.partition(":")
+        params = [float(p) for p in raw.split(",") if p.strip()]
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Invalid distribution {spec!r}; expected one of "
+                             "fixed:s, uniform:a,b, normal:mean,std, lognormal:mu,sigma")
+        self.spec = spec
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            value = rng.lognormvariate(*self.params)
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return f"Distribution({self.spec!r})"
+
+
+@dataclass
+class FakeOllamaConfig:
+    models: tuple[str, ...] = DEFAULT_MODELS
+    response: str = DEFAULT_RESPONSE
+    ttft: Distribution = field(default_factory=lambda: Distribution("fixed:0"))
+    tokens_per_second: float = 0.0  # 0 = all tokens at once
+    parallel: int = 0  # Concurrent generations (0 = unlimited); extra requests wait
+    error_rate: float = 0.0
+    error_status: int = 500
+    drop_rate: float = 0.0  # Streaming only: close the connection halfway through
+    load_seconds: float = 0.0  # Cost of loading a model that is not resident
+    seed: int | None = None
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: dict[str, int] = {}
+        self.errors = 0
+        self.drops = 0
+        self.active = 0
+        self.peak_active = 0
+        self.loads: dict[str, int] = {}
+        self.loaded: dict[str, float] = {}  # model -> monotonic expiry
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "drops": self.drops,
+                "loads": dict(self.loads),
+                "active": self.active,
+                "peak_active": self.peak_active,
+            }
+
+
+def split_tokens(text: str) -> list[str]:
+    """Word-sized chunks that join back to ``text`` (roughly one token each)."""
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+
+def _make_handler(config: FakeOllamaConfig, stats: _Stats, rng: random.Random, slots: threading.Semaphore | None):
+    rng_lock = threading.Lock()
+
+    def draw(fn):
+        with rng_lock:
+            return fn(rng)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+            pass
+
+        def _count(self):
+            with stats.lock:
+                stats.requests[self.path] = stats.requests.get(self.path, 0) + 1
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._count()
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": name, "model": name} for name in config.models]})
+            elif self.path == "/api/ps":
+                now = time.monotonic()
+                with stats.lock:
+                    loaded = [(name, expiry) for name, expiry in stats.loaded.items() if expiry > now]
+                self._send_json(200, {"models": [
+                    {"name": name, "model": name, "expires_at": "forever" if expiry == float("inf") else
+                     datetime.fromtimestamp(time.time() + expiry - now, timezone.utc).isoformat()}
+                    for name, expiry in loaded
+                ]})
+            elif self.path == "/__stats":
+                self._send_json(200, stats.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            self._count()
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": "invalid JSON"})
+                return
+            if self.path != "/api/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+            model = request.get("model", "")
+            if config.models and model_key(model) not in {model_key(name) for name in config.models}:
+                self._send_json(404, {"error": f"model '{model}' not found, try pulling it first"})
+                return
+            if draw(lambda r: r.random()) < config.error_rate:
+                with stats.lock:
+                    stats.errors += 1
+                self._send_json(config.error_status, {"error": "injected failure"})
+                return
+
+            if slots is not None:
+                slots.acquire()
+            with stats.lock:
+                stats.active += 1
+                stats.peak_active = max(stats.peak_active, stats.active)
+            try:
+                self._generate(request, model)
+            finally:
+                with stats.lock:
+                    stats.active -= 1
+                if slots is not None:
+                    slots.release()
+
+        def _load(self, model: str, keep_alive: float) -> float:
+            """Load ``model`` if it is not resident and renew its expiry; returns the load time."""
+            key = model_key(model)
+            with stats.lock:
+                resident = stats.loaded.get(key, 0.0) > time.monotonic()
+            load_time = 0.0 if resident else config.load_seconds
+            time.sleep(load_time)
+            with stats.lock:
+                if not resident:
+                    stats.loads[key] = stats.loads.get(key, 0) + 1
+                if keep_alive == 0:
+                    stats.loaded.pop(key, None)
+                else:
+                    stats.loaded[key] = time.monotonic() + keep_alive
+            return load_time
+
+        def _generate(self, request: dict, model: str):
+            start = time.perf_counter()
+            keep_alive = parse_keep_alive(request.get("keep_alive"))
+            created = datetime.now(timezone.utc).isoformat()
+            if not request.get("prompt"):
+                # Empty prompt: Ollama only loads (or, with keep_alive 0, unloads) the model
+                if keep_alive == 0:
+                    with stats.lock:
+                        stats.loaded.pop(model_key(model), None)
+                    self._send_json(200, {"model": model, "created_at": created, "response": "",
+                                          "done": True, "done_reason": "unload"})
+                    return
+                load_time = self._load(model, keep_alive)
+                self._send_json(200, {"model": model, "created_at": created, "response": "", "done": True,
+                                      "done_reason": "load", "load_duration": int(load_time * 1e9)})
+                return
+
+            load_time = self._load(model, keep_alive)
+            tokens = split_tokens(config.response)
+            time.sleep(draw(config.ttft.sample))
+            interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+            def final(text: str) -> dict:
+                return {
+                    "model": model, "created_at": created, "response": text, "done": True,
+                    "done_reason": "stop", "eval_count": len(tokens), "load_duration": int(load_time * 1e9),
+                    "total_duration": int((time.perf_counter() - start) * 1e9),
+                }
+
+            if not request.get("stream", True):
+                time.sleep(interval * max(0, len(tokens) - 1))
+                self._send_json(200, final(config.response))
+                return
+
+            drop_at = len(tokens) // 2 if draw(lambda r: r.random()) < config.drop_rate else None
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if drop_at is not None and i == drop_at:
+                    with stats.lock:
+                        stats.drops += 1
+                    self.close_connection = True
+                    return
+                if i:
+                    time.sleep(interval)
+                self._write_chunk({"model": model, "created_at": created, "response": token, "done": False})
+            self._write_chunk(final(""))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, payload: dict):
+            line = json.dumps(payload).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class FakeOllama:
+    """Threaded fake Ollama server; ``port=0`` picks a free port."""
+
+    def __init__(self, config: FakeOllamaConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self.stats = _Stats()
+        slots = threading.Semaphore(self.config.parallel) if self.config.parallel > 0 else None
+        handler = _make_handler(self.config, self.stats, random.Random(self.config.seed), slots)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=5)
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run an Ollama-compatible fake server for offline tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--model", action="append", dest="models", default=None,
+                        help="Model name served by /api/tags (repeatable). Default: llava-llama3, llama3.2.")
+    parser.add_argument("--response", default=DEFAULT_RESPONSE, help="Text returned for every prompt.")
+    parser.add_argument("--ttft", type=Distribution, default=Distribution("fixed:0"),
+                        help="Time-to-first-token distribution, e.g. fixed:0.2, uniform:0.1,0.5, "
+                             "normal:0.3,0.05, lognormal:-1.2,0.5.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Token rate after the first (0 = instant).")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Concurrent generations before requests queue, like OLLAMA_NUM_PARALLEL (0 = unlimited).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of generate calls answered with an error.")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status for injected errors.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of streams cut off halfway.")
+    parser.add_argument("--load-seconds", type=float, default=0.0,
+                        help="Cold-load cost for a model that is not resident (it then stays for its keep_alive).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latency and error draws.")
+    args = parser.parse_args(argv)
+
+    config = FakeOllamaConfig(
+        models=tuple(args.models) if args.models else DEFAULT_MODELS,
+        response=args.response,
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        drop_rate=args.drop_rate,
+        load_seconds=args.load_seconds,
+        seed=args.seed,
+    )
+    server = FakeOllama(config, args.host, args.port)
+    print(f"Fake Ollama on {server.url} (ttft {args.ttft.spec}, {args.tokens_per_second or 'instant'} tok/s, "
+          f"parallel {args.parallel or 'unlimited'}). Set AFI_OLLAMA_URL={server.url}")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())